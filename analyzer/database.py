@@ -1,7 +1,7 @@
 import subprocess
 import socket
 import time
-import matplotlib.pyplot as plt
+from utils.plot import charts_enabled, new_figure
 import platform
 import shutil
 from statistics import mean
@@ -14,51 +14,60 @@ import dns.name
 import requests
 import json
 import os
-import gzip
 from datetime import datetime
 from geopy.geocoders import Nominatim
+from scanner.dns_benchmark import (DNS_SERVERS, benchmark_resolvers, log_benchmark, log_cache_profile,
+                                   profile_cache_latency)
 
-# Path to results database file
+from analyzer.result_store import get_store
+from utils.network_context import get_network_context
+from utils.storage import SegmentedArchive
+
+# Legacy JSON-lines results file; compress_old_results moves it into the archive
 RESULT_FILE = "results.json"
 
 # Smart result saving with extended metadata
 def save_result(data, report, category="general"):
-    entry = {
-        "timestamp": datetime.now().isoformat(),
-        "category": category,
-        "ip": get_public_ip(),
-        "location": get_geolocation(),
-        "data": data,
-        "report": report
-    }
-    with open(RESULT_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    save_results([(data, report)], category)
+
+# Several results of one test as a single run, written in one transaction
+def save_results(items, category="general"):
+    store = get_store()
+    context = get_network_context().snapshot()  # In memory; no network round-trip per save
+    run_id = store.start_run(category, ip=context["ip"], location=context["location"])
+    store.add_probes(run_id, [{"category": category, "data": data, "report": report} for data, report in items])
+    store.finish_run(run_id)
 
 # Get public IP address
 def get_public_ip():
-    try:
-        return requests.get("https://api.ipify.org").text
-    except:
-        return "Unknown"
+    return get_network_context().snapshot()["ip"]
 
 # Get user geolocation
 def get_geolocation():
-    try:
-        ip = get_public_ip()
-        geo = requests.get(f"https://ipapi.co/{ip}/json").json()
-        return f"{geo.get('country_name', '')} - {geo.get('city', '')}"
-    except:
-        return "Unknown"
-
-# Archive old results
-def compress_old_results():
+    return get_network_context().snapshot()["location"]
+
+# Archive old results: move stored probes older than `days` (and any legacy results.json)
+# into the segmented archive. Hourly history rollups are brought up to date first so
+# long-range history queries still cover the archived period.
+def compress_old_results(days=30, archive=None):
+    from analyzer.history import refresh_rollups
+    archive = archive or SegmentedArchive()
+    store = get_store()
+    cutoff = time.time() - days * 24 * 3600
+
+    refresh_rollups(store)
+    old = store.probes(until=cutoff)
+    archived = archive.append([{k: v for k, v in probe.items() if k != "time"} for probe in old])
+    store.delete_probes(cutoff)
+
     if os.path.exists(RESULT_FILE):
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        gzip_path = f"archive_results_{timestamp}.json.gz"
-        with open(RESULT_FILE, 'rb') as f_in:
-            with gzip.open(gzip_path, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
+        with open(RESULT_FILE, "r", encoding="utf-8") as f:
+            legacy = [json.loads(line) for line in f if line.strip()]
+        for entry in legacy:
+            entry["timestamp"] = datetime.fromisoformat(entry["timestamp"]).timestamp()
+        archived += archive.append(legacy)
         os.remove(RESULT_FILE)
+    return archived
 
 # Latency alert threshold
 def check_latency_alert(latency):
@@ -81,45 +90,43 @@ def check_ipv6(log):
 # Run full DNS tests
 def run_all_dns_tests(log):
     log("🧪 Running DNS tests...")
-    dns_servers = [
-        ("1.1.1.1", "Cloudflare"),
-        ("8.8.8.8", "Google"),
-        ("9.9.9.9", "Quad9"),
-        ("208.67.222.222", "OpenDNS"),
-        ("76.76.2.0", "Control D"),
-        ("94.140.14.14", "AdGuard"),
-        ("2606:4700:4700::1111", "Cloudflare IPv6"),
-        ("2001:4860:4860::8888", "Google IPv6"),
-        ("2620:fe::fe", "Quad9 IPv6")
-    ]
-
     times = []
-    for ip, name in dns_servers:
-        try:
-            start = time.time()
-            resolver = dns.resolver.Resolver()
-            resolver.nameservers = [ip]
-            answer = resolver.resolve("example.com", "A")
-            elapsed = (time.time() - start) * 1000
-            alert = " 🚨" if check_latency_alert(elapsed) else ""
-            log(f"✅ {name} DNS ({ip}) responded. IP: {answer[0]} ⏱ {elapsed:.1f} ms{alert}")
-            times.append((name, elapsed))
-            save_result({"server": ip, "latency": elapsed}, f"Response from {name}", category="dns")
-        except Exception as e:
-            log(f"❌ {name} DNS ({ip}) failed to respond: {e}")
-            save_result({"server": ip}, f"No response: {e}", category="dns")
-
-    if times:
+
+    def on_result(stats):
+        log_benchmark(log, stats)
+        if stats["received"]:
+            if check_latency_alert(stats["median"]):
+                log(f"🚨 {stats['name']} median latency is above the alert threshold")
+            times.append((stats["name"], stats["median"]))
+
+    results = benchmark_resolvers(DNS_SERVERS, on_result=on_result)
+    rows = []
+    for stats in results.values():
+        if stats["received"]:
+            summary = {k: stats[k] for k in ("min", "median", "p95", "p99", "jitter", "loss")}
+            rows.append(({"server": stats["ip"], "latency": stats["median"], **summary},
+                         f"Response from {stats['name']}"))
+        else:
+            rows.append(({"server": stats["ip"], "loss": 100.0}, f"No response from {stats['name']}"))
+    save_results(rows, category="dns")
+
+    log("\n🧊 Cold-cache vs warm-cache latency:")
+    profiles = profile_cache_latency(DNS_SERVERS, on_result=lambda profile: log_cache_profile(log, profile))
+    save_results([({"server": profile["ip"], "cold_median": profile["cold"]["median"],
+                    "warm_median": profile["warm"]["median"], "miss_penalty": profile["miss_penalty"]},
+                   f"Cache profile for {profile['name']}") for profile in profiles.values()], category="dns_cache")
+
+    if times and charts_enabled():
         labels, values = zip(*times)
-        plt.figure()
-        plt.bar(labels, values)
-        plt.ylabel("ms")
-        plt.title("DNS Response Times")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
+        fig = new_figure()
+        ax = fig.subplots()
+        ax.bar(labels, values)
+        ax.set_ylabel("ms")
+        ax.set_title("DNS Response Times")
+        ax.tick_params(axis="x", labelrotation=45)
+        fig.tight_layout()
         chart_path = "/mnt/data/dns_response_times.png"
-        plt.savefig(chart_path)
-        plt.close()
+        fig.savefig(chart_path)
         log(f"📊 DNS response time chart saved to: {chart_path}")
 
     log("\n🔍 DNS response validity analysis:")
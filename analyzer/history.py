@@ -0,0 +1,300 @@
+import json
+import math
+import time
+
+from analyzer.result_store import get_store
+
+# Queries over stored results: a time window, one metric, a grouping and aggregates.
+# Completed hours are folded into the `rollups` table (count/sum/min/max plus a
+# log-bucket histogram), so long windows read a few rows per hour instead of every
+# sample; only the hours that have not been rolled up yet are read raw. Samples saved
+# late with an older timestamp are merged into their hour's rollup on the next refresh.
+
+# Friendly metric name -> (result category, sample metric)
+METRICS = {
+    "download": ("speed", "download"),
+    "upload": ("speed", "upload"),
+    "latency": ("speed", "latency"),
+    "loaded_latency": ("speed", "latency_download"),
+    "bufferbloat": ("speed", "bufferbloat_download"),
+    "dns_latency": ("dns", "median"),
+    "dns_p95": ("dns", "p95"),
+    "dns_jitter": ("dns", "jitter"),
+    "dns_loss": ("dns", "loss"),
+    "dns_miss_penalty": ("dns_cache", "miss_penalty"),
+    "open_ports": ("ports", "open_count"),
+    "scan_duration": ("ports", "duration")
+}
+GROUPINGS = ("hour", "day", "resolver", "target", "all")
+DEFAULT_AGGREGATES = ("mean", "p50", "p95", "max")
+HOUR = 3600
+DAY = 24 * HOUR
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    category TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    target TEXT NOT NULL,
+    hour REAL NOT NULL,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    histogram TEXT NOT NULL,
+    PRIMARY KEY (category, metric, hour, target)
+);
+CREATE TABLE IF NOT EXISTS rollup_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    rolled_until REAL NOT NULL,
+    rolled_rowid INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+class Sketch:
+    """Mergeable summary of a set of values: exact count/sum/min/max and a log-bucket
+    histogram whose percentiles are within GAMMA - 1 (2%) relative error."""
+
+    GAMMA = 1.02
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.bins = {}  # bucket index (or "z" for values <= 0) -> count
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        key = str(math.ceil(math.log(value, self.GAMMA))) if value > 0 else "z"
+        self.bins[key] = self.bins.get(key, 0) + 1
+
+    def merge(self, other):
+        if not other.count:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.bins, key=lambda k: -math.inf if k == "z" else int(k)):
+            seen += self.bins[key]
+            if seen > rank:
+                if key == "z":
+                    return min(0.0, self.max)
+                value = 2 * self.GAMMA ** int(key) / (self.GAMMA + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def aggregate(self, name):
+        if name == "count":
+            return self.count
+        if not self.count:
+            return None
+        if name == "mean":
+            return self.total / self.count
+        if name == "min":
+            return self.min
+        if name == "max":
+            return self.max
+        if name.startswith("p"):
+            return self.quantile(float(name[1:]) / 100)
+        raise ValueError(f"Unknown aggregate: {name}")
+
+    @classmethod
+    def from_row(cls, count, total, low, high, histogram):
+        sketch = cls()
+        sketch.count, sketch.total, sketch.min, sketch.max = count, total, low, high
+        sketch.bins = json.loads(histogram)
+        return sketch
+
+def refresh_rollups(store=None, now=None):
+    """Fold every completed hour since the last refresh into `rollups`; returns the new watermark
+
+    Samples inserted since the last refresh (rowid above `rolled_rowid`) but stamped
+    before the watermark are merged into the rollups of the hours they belong to. Those
+    rows are merged rather than rebuilt because the raw samples of old hours may
+    already have been archived.
+    """
+    store = store or get_store()
+    until = math.floor((now or time.time()) / HOUR) * HOUR
+    with store.lock, store.conn:
+        store.conn.executescript(ROLLUP_SCHEMA)
+        columns = [column[1] for column in store.conn.execute("PRAGMA table_info(rollup_state)")]
+        if "rolled_rowid" not in columns:  # Databases from before late samples were tracked
+            store.conn.execute("ALTER TABLE rollup_state ADD COLUMN rolled_rowid INTEGER NOT NULL DEFAULT 0")
+            store.conn.execute("UPDATE rollup_state SET rolled_rowid = (SELECT IFNULL(MAX(rowid), 0) FROM samples)")
+        row = store.conn.execute("SELECT rolled_until, rolled_rowid FROM rollup_state WHERE id = 1").fetchone()
+        if row is None:
+            first = store.conn.execute("SELECT MIN(timestamp) FROM samples").fetchone()[0]
+            row = (math.floor(first / HOUR) * HOUR if first is not None else until, 0)
+        rolled_until, rolled_rowid = row
+        last_rowid = store.conn.execute("SELECT IFNULL(MAX(rowid), 0) FROM samples").fetchone()[0]
+
+        late = _sketch_samples(store.conn.execute(
+            "SELECT category, metric, target, timestamp, value FROM samples "
+            "WHERE rowid > ? AND rowid <= ? AND timestamp < ?", (rolled_rowid, last_rowid, rolled_until)))
+        for key, sketch in late.items():
+            existing = store.conn.execute(
+                "SELECT count, total, min, max, histogram FROM rollups "
+                "WHERE category = ? AND metric = ? AND target = ? AND hour = ?", key).fetchone()
+            if existing:
+                sketch.merge(Sketch.from_row(*existing))
+        fresh = {}
+        if rolled_until < until:
+            fresh = _sketch_samples(store.conn.execute(
+                "SELECT category, metric, target, timestamp, value FROM samples "
+                "WHERE timestamp >= ? AND timestamp < ?", (rolled_until, until)))
+            rolled_until = until
+        store.conn.executemany(
+            "INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [key + (s.count, s.total, s.min, s.max, json.dumps(s.bins))
+             for sketches in (late, fresh) for key, s in sketches.items()])
+        store.conn.execute("INSERT OR REPLACE INTO rollup_state (id, rolled_until, rolled_rowid) VALUES (1, ?, ?)",
+                           (rolled_until, last_rowid))
+    return rolled_until
+
+# (category, metric, target, hour) -> Sketch over (category, metric, target, timestamp, value) rows
+def _sketch_samples(rows):
+    sketches = {}
+    for category, metric, target, timestamp, value in rows:
+        key = (category, metric, target or "", math.floor(timestamp / HOUR) * HOUR)
+        sketches.setdefault(key, Sketch()).add(value)
+    return sketches
+
+def query_history(metric, since=None, until=None, group="day", aggregates=DEFAULT_AGGREGATES, target=None,
+                  store=None):
+    """Aggregates of `metric` over [since, until) (default: the last 7 days), one dict per group.
+
+    `metric` is a METRICS name or a (category, sample metric) pair; `group` is one of
+    GROUPINGS ("resolver" and "target" both group by the probed address).
+    """
+    store = store or get_store()
+    category, sample_metric = METRICS[metric] if isinstance(metric, str) else metric
+    if group not in GROUPINGS:
+        raise ValueError(f"Unknown grouping: {group}")
+    until = until or time.time()
+    since = since if since is not None else until - 7 * DAY
+
+    rolled_until = refresh_rollups(store)
+    first_hour = math.ceil(since / HOUR) * HOUR
+    last_hour = min(math.floor(until / HOUR) * HOUR, rolled_until)
+    if first_hour >= last_hour:
+        first_hour = last_hour = since  # Nothing rolled up in range; read it all raw
+
+    sketches = {}
+    target_clause = " AND target = ?" if target is not None else ""
+    target_param = [target] if target is not None else []
+    with store.lock:
+        for target_name, hour, count, total, low, high, histogram in store.conn.execute(
+                "SELECT target, hour, count, total, min, max, histogram FROM rollups "
+                f"WHERE category = ? AND metric = ? AND hour >= ? AND hour < ?{target_clause}",
+                [category, sample_metric, first_hour, last_hour] + target_param):
+            key = _group_key(group, hour, target_name)
+            sketches.setdefault(key, Sketch()).merge(Sketch.from_row(count, total, low, high, histogram))
+        for start, end in ((since, first_hour), (max(last_hour, since), until)):
+            if start >= end:
+                continue
+            for timestamp, target_name, value in store.conn.execute(
+                    "SELECT timestamp, target, value FROM samples "
+                    f"WHERE category = ? AND metric = ? AND timestamp >= ? AND timestamp < ?{target_clause}",
+                    [category, sample_metric, start, end] + target_param):
+                sketches.setdefault(_group_key(group, timestamp, target_name), Sketch()).add(value)
+
+    rows = []
+    for key in sorted(sketches):
+        row = {"group": key, "count": sketches[key].count}
+        row.update({name: sketches[key].aggregate(name) for name in aggregates})
+        rows.append(row)
+    return rows
+
+def _group_key(group, timestamp, target):
+    if group == "hour":
+        return time.strftime("%Y-%m-%d %H:00", time.localtime(timestamp))
+    if group == "day":
+        return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+    if group in ("resolver", "target"):
+        return target or "-"
+    return "all"
+
+# Per-test extraction of what is worth keeping from a test's return value
+def history_rows(test_type, result):
+    if not result:
+        return []
+    if test_type == "speed":
+        if result.get("latency", -1) < 0:
+            return []  # Failed run; zeros would drag every aggregate down
+        return [(dict(result), "Speed test")]
+    if test_type == "ports":
+        # A multi-host sweep stores one row per host that could be scanned
+        scans = [scan for scan in result["hosts"].values() if not scan["error"]] if "hosts" in result else [result]
+        return [({"host": scan["host"], "open": scan["open"], "open_count": len(scan["open"]),
+                  "closed_count": len(scan["closed"]), "filtered_count": len(scan["filtered"]),
+                  "duration": scan["duration"]}, f"Port scan of {scan['host']}") for scan in scans]
+    if test_type == "dns":
+        return [({"server": ip, "latency": stats["median"], "median": stats["median"], "p95": stats["p95"],
+                  "jitter": stats["jitter"], "loss": stats["loss"]}, f"DNS {stats['name']}")
+                for ip, stats in result.get("resolvers", {}).items()]
+    return []
+
+def record_test_result(test_type, result):
+    """Save the history-relevant part of a finished test; returns the number of rows written"""
+    from analyzer.database import save_results
+    rows = history_rows(test_type, result)
+    if rows:
+        save_results(rows, category=test_type)
+    return len(rows)
+
+def record_results(results, log):
+    """record_test_result for every {test_type: result} of a run, reporting to log"""
+    try:
+        saved = sum(record_test_result(test_type, result) for test_type, result in results.items())
+        if saved:
+            log(f"[✔] {saved} result(s) saved to history.")
+    except Exception as e:
+        log(f"[!] Database error: {e}")
+
+def analysis_input(days=7, store=None):
+    """Results dict for predictor.analyze_results built from the stored history"""
+    store = store or get_store()
+    since = time.time() - days * DAY
+    results = {}
+
+    speed = {}
+    for metric in ("download", "upload", "latency"):
+        rows = query_history(metric, since=since, group="all", aggregates=("p50",), store=store)
+        if rows and rows[0]["p50"] is not None:
+            speed[metric] = round(rows[0]["p50"], 2)
+    if len(speed) == 3:
+        results["speed"] = speed
+
+    resolvers = query_history("dns_latency", since=since, group="resolver", aggregates=("p50",), store=store)
+    resolvers = [row for row in resolvers if row["p50"] is not None]
+    if resolvers:
+        from scanner.dns_benchmark import DNS_SERVERS
+        names = dict(DNS_SERVERS)
+        best = min(resolvers, key=lambda row: row["p50"])
+        results["dns"] = {"best": {"name": names.get(best["group"], best["group"]), "ip": best["group"],
+                                   "latency": round(best["p50"], 1)}}
+
+    latest = store.probes(limit=1)
+    if latest and latest[0]["location"]:
+        results["location"] = latest[0]["location"]
+    return results
+
+def format_history(rows, unit=""):
+    lines = []
+    for row in rows:
+        values = " | ".join(f"{name} {value:.1f}{unit}" for name, value in row.items()
+                            if name not in ("group", "count") and value is not None)
+        lines.append(f" - {row['group']}: {values} ({row['count']} samples)")
+    return lines
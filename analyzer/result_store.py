@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from config import SETTINGS
+
+# One row per test run, one per probed target within it, and every numeric value of a
+# probe's data as a sample so history queries never have to parse JSON.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    category TEXT NOT NULL,
+    ip TEXT,
+    location TEXT
+);
+CREATE TABLE IF NOT EXISTS probes (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    timestamp REAL NOT NULL,
+    category TEXT NOT NULL,
+    target TEXT,
+    report TEXT,
+    data TEXT
+);
+CREATE TABLE IF NOT EXISTS samples (
+    probe_id INTEGER NOT NULL REFERENCES probes(id),
+    timestamp REAL NOT NULL,
+    category TEXT NOT NULL,
+    target TEXT,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS probes_timestamp ON probes(timestamp);
+CREATE INDEX IF NOT EXISTS probes_category ON probes(category, timestamp);
+CREATE INDEX IF NOT EXISTS probes_target ON probes(target, timestamp);
+CREATE INDEX IF NOT EXISTS samples_metric ON samples(category, metric, timestamp);
+CREATE INDEX IF NOT EXISTS samples_target ON samples(target, metric, timestamp);
+"""
+
+class ResultStore:
+    """SQLite (WAL mode) store for test results, shared by all threads of the process.
+
+    add_probes() writes a whole batch of probes and their samples in one transaction,
+    so a test that produces many rows pays for a single commit.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or SETTINGS["database"]["path"]
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def start_run(self, category, ip=None, location=None):
+        with self.lock, self.conn:
+            cursor = self.conn.execute("INSERT INTO runs (started, category, ip, location) VALUES (?, ?, ?, ?)",
+                                       (time.time(), category, ip, location))
+            return cursor.lastrowid
+
+    def finish_run(self, run_id):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE runs SET finished = ? WHERE id = ?", (time.time(), run_id))
+
+    def add_probes(self, run_id, probes):
+        """Insert probes ({category, data, report, target?, timestamp?}) in a single transaction"""
+        with self.lock, self.conn:
+            for probe in probes:
+                timestamp = probe.get("timestamp") or time.time()
+                data = probe.get("data") or {}
+                target = probe.get("target") or _target_of(data)
+                cursor = self.conn.execute(
+                    "INSERT INTO probes (run_id, timestamp, category, target, report, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    (run_id, timestamp, probe["category"], target, probe.get("report"),
+                     json.dumps(data, ensure_ascii=False, default=str)))
+                self.conn.executemany(
+                    "INSERT INTO samples (probe_id, timestamp, category, target, metric, value) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(cursor.lastrowid, timestamp, probe["category"], target, metric, value)
+                     for metric, value in flatten_metrics(data)])
+
+    def probes(self, category=None, target=None, since=None, until=None, limit=None):
+        """Stored probes, newest first, with data decoded and run metadata attached"""
+        where, params = _filters(category=category, target=target, since=since, until=until, prefix="p.")
+        sql = ("SELECT p.*, r.ip, r.location FROM probes p JOIN runs r ON r.id = p.run_id"
+               f"{where} ORDER BY p.timestamp DESC")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [dict(row, data=json.loads(row["data"] or "{}"),
+                     time=datetime.fromtimestamp(row["timestamp"]).isoformat()) for row in rows]
+
+    def samples(self, metric, category=None, target=None, since=None, until=None):
+        """(timestamp, target, value) tuples for one metric, oldest first"""
+        where, params = _filters(category=category, target=target, since=since, until=until)
+        where = f"{where} AND metric = ?" if where else " WHERE metric = ?"
+        with self.lock:
+            rows = self.conn.execute(f"SELECT timestamp, target, value FROM samples{where} ORDER BY timestamp",
+                                     params + [metric]).fetchall()
+        return [tuple(row) for row in rows]
+
+    def delete_probes(self, until):
+        """Drop probes (and their samples and emptied runs) older than `until`; returns the count"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM samples WHERE timestamp < ?", (until,))
+            deleted = self.conn.execute("DELETE FROM probes WHERE timestamp < ?", (until,)).rowcount
+            self.conn.execute("DELETE FROM runs WHERE finished IS NOT NULL AND id NOT IN (SELECT run_id FROM probes)")
+        return deleted
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def _filters(category=None, target=None, since=None, until=None, prefix=""):
+    clauses, params = [], []
+    for column, op, value in (("category", "=", category), ("target", "=", target),
+                              ("timestamp", ">=", since), ("timestamp", "<", until)):
+        if value is not None:
+            clauses.append(f"{prefix}{column} {op} ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def _target_of(data):
+    for key in ("server", "host", "target", "address"):
+        if isinstance(data.get(key), str):
+            return data[key]
+    return None
+
+# Numeric leaves of a result dict as ("speed.download", 93.1) pairs
+def flatten_metrics(data, prefix=""):
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, (bool, int, float)):
+            yield name, float(value)
+        elif isinstance(value, dict):
+            yield from flatten_metrics(value, f"{name}.")
+
+_default_store = None
+_default_lock = threading.Lock()
+
+def get_store():
+    """Process-wide store at SETTINGS["database"]["path"], opened on first use"""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ResultStore()
+        return _default_store
@@ -0,0 +1,222 @@
+import argparse
+import random
+import sys
+import threading
+import time
+
+from utils.metrics import METRICS_PORT, record_task, start_metrics_server
+from utils.plot import disable_charts
+from utils.scheduler import TEST_ENTRY_POINTS, log_schedule, run_scheduled, test_tasks
+
+try:
+    import fcntl
+except ImportError:  # Windows: overlap protection stays within one process
+    fcntl = None
+
+# Headless entry point for probes: same test modules as the GUI, no tkinter and no
+# matplotlib. `run` executes tests once, `daemon` repeats them on a schedule.
+
+LOCK_FILE = "isp_tester.lock"
+CONTEXT_WAIT_SECONDS = 12  # Public IP plus geolocation lookup, each with its own timeout
+
+def console_log(text):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {text}", flush=True)
+
+def run_tests(test_types, log, save=True, max_parallel=3, options=None):
+    """Run the given tests through the scheduler and store their results; returns the schedule"""
+    start = time.time()
+    log(f"Starting tests: {', '.join(test_types)}")
+    schedule = run_scheduled(test_tasks(test_types, options), log, max_parallel=max_parallel, on_done=record_task)
+    log_schedule(log, schedule)
+    if save:
+        from analyzer.history import record_results
+        from utils.network_context import get_network_context
+        # Results are stamped with the public IP/location; don't store "Unknown" just
+        # because the first lookup is still running
+        if not get_network_context().ready.wait(CONTEXT_WAIT_SECONDS):
+            log("⚠ Public IP lookup still pending; saving results without it")
+        record_results(schedule["results"], log)
+    log(f"All tests completed. Total time: {time.time() - start:.2f} seconds")
+    return schedule
+
+class RunLock:
+    """Non-blocking lock held while tests run; with fcntl it also excludes other processes"""
+
+    def __init__(self, path=LOCK_FILE):
+        self.path = path
+        self.local = threading.Lock()
+        self.file = None
+
+    def acquire(self):
+        if not self.local.acquire(blocking=False):
+            return False
+        if fcntl is None:
+            return True
+        self.file = open(self.path, "a")
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.file.close()
+            self.file = None
+            self.local.release()
+            return False
+        return True
+
+    def release(self):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+        self.local.release()
+
+def run_daemon(test_types, interval, jitter=0.0, log=console_log, save=True, stop=None, lock=None, options=None):
+    """Run tests every `interval` seconds, each start delayed by up to `jitter` seconds.
+
+    A cycle that finds the previous one (or another process) still running is skipped,
+    and slots missed because a run overran are dropped rather than run back to back.
+    """
+    stop = stop or threading.Event()
+    lock = lock or RunLock()
+    next_slot = time.monotonic()
+    log(f"🛰 Monitoring {', '.join(test_types)} every {interval:g} s (jitter up to {jitter:g} s)")
+    while not stop.is_set():
+        if stop.wait(max(0.0, next_slot + random.uniform(0, jitter) - time.monotonic())):
+            break
+        if lock.acquire():
+            try:
+                run_tests(test_types, log, save=save, options=options)
+            except Exception as e:
+                log(f"[!] Error: {e}")
+            finally:
+                lock.release()
+        else:
+            log("⏭ Previous run still in progress; skipping this cycle")
+
+        next_slot += interval
+        missed = int((time.monotonic() - next_slot) // interval) + 1 if time.monotonic() > next_slot else 0
+        if missed:
+            log(f"⚠ Run overran the interval; skipping {missed} slot(s)")
+            next_slot += missed * interval
+
+def parse_duration(text):
+    """Seconds from '90', '90s', '15m', '2h' or '1d'"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+def parse_tests(names):
+    tests = []
+    for name in ",".join(names).split(","):
+        name = name.strip()
+        if name == "all":
+            tests.extend(TEST_ENTRY_POINTS)
+        elif name:
+            if name not in TEST_ENTRY_POINTS:
+                raise argparse.ArgumentTypeError(f"unknown test {name!r} (choose from {', '.join(TEST_ENTRY_POINTS)}, all)")
+            tests.append(name)
+    return list(dict.fromkeys(tests))
+
+def add_scan_options(parser):
+    parser.add_argument("--targets", help="port scan targets: hosts, CIDRs or ranges, e.g. 10.0.0.0/24,10.0.1.5-20")
+    parser.add_argument("--ports", help="ports to scan, e.g. 22,80,443,8000-8100 (default from settings)")
+    parser.add_argument("--incremental", action=argparse.BooleanOptionalAction, default=None,
+                        help="re-check known-open ports plus a rotating slice and report changes "
+                             "(default: on for daemon, settings for run)")
+
+def scan_options(args):
+    """test_tasks options from the scan flags; validated here so typos fail before any test runs"""
+    from scanner.targets import expand_targets, parse_ports
+    ports = {}
+    if args.targets:
+        if not expand_targets(args.targets):
+            raise argparse.ArgumentTypeError(f"no hosts in --targets {args.targets!r}")
+        ports["targets"] = args.targets
+    if args.ports:
+        parse_ports(args.ports)
+        ports["ports"] = args.ports
+    # Repeated daemon cycles only need to find what changed since the last one
+    incremental = args.incremental if args.incremental is not None else (True if args.command == "daemon" else None)
+    if incremental is not None:
+        ports["incremental"] = incremental
+    return {"ports": ports} if ports else {}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="ISP Tester Pro - headless runner")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run tests once")
+    run.add_argument("tests", nargs="+", help=f"tests to run: {', '.join(TEST_ENTRY_POINTS)} or all")
+    run.add_argument("--no-save", action="store_true", help="do not write results to the database")
+    add_scan_options(run)
+
+    daemon = sub.add_parser("daemon", help="run tests on a schedule")
+    daemon.add_argument("tests", nargs="+", help=f"tests to run: {', '.join(TEST_ENTRY_POINTS)} or all")
+    daemon.add_argument("--every", default="15m", help="interval between runs, e.g. 300, 15m, 1h (default 15m)")
+    daemon.add_argument("--jitter", default="30s", help="random start delay added to each run (default 30s)")
+    daemon.add_argument("--lock-file", default=LOCK_FILE, help="file used to keep runs from overlapping")
+    daemon.add_argument("--no-save", action="store_true", help="do not write results to the database")
+    daemon.add_argument("--metrics-port", type=int, nargs="?", const=METRICS_PORT,
+                        help=f"serve Prometheus metrics on this port (default {METRICS_PORT} when given without a value)")
+    daemon.add_argument("--metrics-host", default="127.0.0.1", help="address for the metrics endpoint")
+    add_scan_options(daemon)
+
+    serve = sub.add_parser("serve", help="run a throughput server for native speed tests")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=5201)
+
+    history = sub.add_parser("history", help="print stored history for a metric")
+    history.add_argument("metric", help="download, upload, latency, dns_latency, dns_p95, ...")
+    history.add_argument("--days", type=float, default=7)
+    history.add_argument("--group", default="day", help="hour, day, resolver, target or all")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    disable_charts()
+
+    if args.command == "serve":
+        from tests.performance.throughput import run_throughput_server
+        try:
+            run_throughput_server(args.host, args.port, log=console_log)
+        except KeyboardInterrupt:
+            console_log("Stopped.")
+        return 0
+
+    if args.command == "history":
+        from analyzer.history import format_history, query_history
+        rows = query_history(args.metric, since=time.time() - args.days * 86400, group=args.group)
+        for line in format_history(rows) or [" - no data"]:
+            print(line)
+        return 0
+
+    try:
+        tests = parse_tests(args.tests)
+        options = scan_options(args)
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    if not args.no_save:
+        # Look up the public IP/location while the tests run
+        from utils.network_context import get_network_context
+        get_network_context()
+    if args.command == "run":
+        run_tests(tests, console_log, save=not args.no_save, options=options)
+        return 0
+
+    if args.metrics_port:
+        try:
+            start_metrics_server(args.metrics_port, args.metrics_host)
+            console_log(f"📈 Metrics at http://{args.metrics_host}:{args.metrics_port}/metrics")
+        except OSError as e:
+            console_log(f"⚠ Metrics endpoint not started on {args.metrics_host}:{args.metrics_port}: {e}")
+    try:
+        run_daemon(tests, parse_duration(args.every), parse_duration(args.jitter), save=not args.no_save,
+                   lock=RunLock(args.lock_file), options=options)
+    except KeyboardInterrupt:
+        console_log("Stopped.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,48 @@
+import json
+
 SETTINGS = {
     "speed_test": {
-        "timeout": 10
+        "timeout": 10,
+        "server": "",
+        "streams": 4,
+        "duration": 10,
+        "loaded_latency": False
+    },
+    "port_scan": {
+        "targets": "127.0.0.1",
+        "ports": "0-1023",
+        "incremental": False
+    },
+    "dns": {
+        "cache_zone": "google.com"
     },
     "database": {
         "path": "results.db"
+    },
+    "ip_intel": {
+        "path": "database/ip2asn-combined.tsv.gz"
+    },
+    "metrics": {
+        "enabled": False,
+        "host": "127.0.0.1",
+        "port": 9105
     }
 }
+SETTINGS_FILE = "settings.json"
+
+# Overlay settings.json (edited from the GUI's Settings window) on the defaults above,
+# section by section; a missing or malformed file leaves the defaults in place
+def load_settings(path=SETTINGS_FILE):
+    try:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+    except (OSError, ValueError):
+        return SETTINGS
+    for section, values in overrides.items():
+        if isinstance(values, dict) and isinstance(SETTINGS.get(section), dict):
+            SETTINGS[section].update(values)
+        else:
+            SETTINGS[section] = values
+    return SETTINGS
+
+load_settings()
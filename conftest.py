@@ -0,0 +1,116 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+from scanner import dns_wire
+
+# Shared fixtures for tests/: loopback TCP services and a fake DNS server. Keeping this
+# file at the repository root also puts the project packages on sys.path for pytest.
+
+@pytest.fixture
+def tcp_service():
+    """Factory for loopback TCP servers: start(greeting=b"", reply=b"") -> port.
+
+    Each connection gets `greeting` right away; if `reply` is set, the server waits
+    for a request first and answers with it. stop(port) closes a server early.
+    """
+    servers = {}
+
+    def start(greeting=b"", reply=b"", host="127.0.0.1"):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((host, 0))
+        server.listen(64)
+
+        def serve():
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except OSError:
+                    return
+                with conn:
+                    try:
+                        if greeting:
+                            conn.sendall(greeting)
+                        if reply:
+                            conn.settimeout(2)
+                            if conn.recv(1024):
+                                conn.sendall(reply)
+                    except OSError:
+                        pass
+
+        threading.Thread(target=serve, daemon=True).start()
+        port = server.getsockname()[1]
+        servers[port] = server
+        return port
+
+    def stop(port):
+        server = servers.pop(port)
+        try:
+            server.shutdown(socket.SHUT_RDWR)  # Wakes the accept() in serve()
+        except OSError:
+            pass
+        server.close()
+
+    start.stop = stop
+    yield start
+    for port in list(servers):
+        stop(port)
+
+@pytest.fixture
+def closed_port():
+    """A loopback port with nothing listening on it (connections are refused)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def _question_name(data):
+    labels, offset = [], 12
+    while data[offset]:
+        length = data[offset]
+        labels.append(data[offset + 1:offset + 1 + length].decode("ascii"))
+        offset += 1 + length
+    return ".".join(labels), offset + 5
+
+@pytest.fixture
+def fake_dns(monkeypatch):
+    """Factory for fake UDP resolvers on loopback addresses: start(address, respond).
+
+    respond(name) returns (rcode, [IPv4 answers]) or None to stay silent. All fake
+    resolvers share one port, which dns_wire is pointed at for the test.
+    """
+    sockets = []
+
+    def start(address, respond):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((address, sockets[0].getsockname()[1] if sockets else 0))
+        sockets.append(sock)
+        monkeypatch.setattr(dns_wire, "DNS_PORT", sockets[0].getsockname()[1])
+
+        def serve():
+            while True:
+                try:
+                    data, addr = sock.recvfrom(512)
+                except OSError:
+                    return
+                name, end = _question_name(data)
+                answer = respond(name)
+                if answer is None:
+                    continue
+                rcode, addresses = answer
+                txid = struct.unpack_from("!H", data)[0]
+                reply = struct.pack("!HHHHHH", txid, 0x8180 | rcode, 1, len(addresses), 0, 0) + data[12:end]
+                for ip in addresses:
+                    reply += struct.pack("!HHHIH", 0xC00C, 1, 1, 60, 4) + socket.inet_aton(ip)
+                sock.sendto(reply, addr)
+
+        threading.Thread(target=serve, daemon=True).start()
+        return address
+
+    yield start
+    for sock in sockets:
+        sock.close()
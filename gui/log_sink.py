@@ -0,0 +1,51 @@
+import queue
+import tkinter as tk
+
+class LogSink:
+    """Thread-safe log pipeline between test workers and a Tk text widget.
+
+    Workers call log() which only puts the line on a queue, so they never touch Tk
+    or wait for a redraw. The Tk main loop drains the queue every `interval_ms`
+    and hands each batch to `write` (by default a single insert into `widget`).
+    """
+
+    def __init__(self, widget, interval_ms=50, max_batch=5000, write=None):
+        self.widget = widget
+        self.write = write or self._insert
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+        self.queue = queue.SimpleQueue()
+        self.closed = False
+        self.on_flushed = None
+        self._job = widget.after(interval_ms, self._drain)
+
+    def log(self, text):
+        self.queue.put(f"{text}\n")
+
+    def close(self, on_flushed=None):
+        """Stop after the queue is empty; on_flushed then runs on the Tk thread"""
+        self.on_flushed = on_flushed
+        self.closed = True
+
+    def _drain(self):
+        lines = []
+        try:
+            while len(lines) < self.max_batch:
+                lines.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        try:
+            if lines:
+                self.write("".join(lines))
+            if self.closed and self.queue.empty():
+                if self.on_flushed:
+                    self.on_flushed()
+                return
+            self._job = self.widget.after(self.interval_ms, self._drain)
+        except tk.TclError:
+            return  # Window was closed while a test was still running
+
+    def _insert(self, text):
+        self.widget.insert(tk.END, text)
+        self.widget.see(tk.END)
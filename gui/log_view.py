@@ -0,0 +1,171 @@
+import os
+import tkinter as tk
+from array import array
+from tkinter import ttk, font as tkfont
+
+class LogRecordStore:
+    """Append-only on-disk log with a sparse line index.
+
+    Lines go straight to `path` (which doubles as the saved report), and only the
+    byte offset of every BLOCK-th line is kept in memory, so a run of a million
+    lines costs a few kilobytes of index instead of the text itself.
+    """
+
+    BLOCK = 256
+
+    def __init__(self, path, read_only=False):
+        self.path = path
+        self.block_offsets = array("Q", [0])
+        self.count = 0
+        self.size = 0
+        self._writer = None
+        if read_only:
+            self._index_existing()
+        else:
+            self._writer = self._create(path)
+        self._reader = open(self.path, "rb")
+
+    def _create(self, path):
+        # Never reuse a report another window may still be writing: take the first
+        # free name among path, path-2, path-3, ...
+        root, ext = os.path.splitext(path)
+        attempt = 1
+        while True:
+            try:
+                writer = open(path, "xb")
+                self.path = path
+                return writer
+            except FileExistsError:
+                attempt += 1
+                path = f"{root}-{attempt}{ext}"
+
+    def _index_existing(self):
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(1 << 20)
+                if not chunk:
+                    break
+                self._count_lines(chunk)
+
+    def _count_lines(self, data):
+        pos = data.find(b"\n")
+        while pos != -1:
+            self.count += 1
+            if self.count % self.BLOCK == 0:
+                self.block_offsets.append(self.size + pos + 1)
+            pos = data.find(b"\n", pos + 1)
+        self.size += len(data)
+
+    def append(self, text):
+        if self._writer is None or self._writer.closed:
+            return
+        data = text.encode("utf-8")
+        self._writer.write(data)
+        self._writer.flush()
+        self._count_lines(data)
+
+    def lines(self, start, count):
+        start = max(0, min(start, self.count))
+        count = max(0, min(count, self.count - start))
+        if not count or self._reader.closed:
+            return []
+        block = start // self.BLOCK
+        self._reader.seek(self.block_offsets[block])
+        for _ in range(start - block * self.BLOCK):
+            self._reader.readline()
+        return [self._reader.readline().decode("utf-8", errors="replace").rstrip("\n") for _ in range(count)]
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader.close()
+
+class VirtualLogView:
+    """Text view over a LogRecordStore that only ever holds the lines on screen.
+
+    While scrolled to the bottom it follows new lines; scrolling up freezes the
+    window on the requested position.
+    """
+
+    def __init__(self, parent, store, font=("Consolas", 10)):
+        self.store = store
+        self.first = 0
+        self.follow = True
+        self.frame = ttk.Frame(parent)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scrollbar)
+        self.text = tk.Text(self.frame, wrap=tk.WORD, font=font)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text.pack(side="left", expand=True, fill="both")
+        self.line_height = tkfont.Font(font=font).metrics("linespace")
+
+        self.text.bind("<Configure>", lambda e: self.render())
+        self.text.bind("<MouseWheel>", lambda e: self._scroll_by(-3 if e.delta > 0 else 3))
+        self.text.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.text.bind("<Button-5>", lambda e: self._scroll_by(3))
+        self.text.bind("<Key>", self._on_key)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def rows(self):
+        return max(1, self.text.winfo_height() // max(1, self.line_height))
+
+    def append(self, text):
+        self.store.append(text)
+        if self.follow:
+            self.render()
+        else:
+            self._update_scrollbar()
+
+    def render(self):
+        rows = self.rows()
+        if self.follow:
+            self.first = max(0, self.store.count - rows)
+        lines = self.store.lines(self.first, rows)
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", "\n".join(lines))
+        if self.follow:
+            self.text.see(tk.END)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = max(1, self.store.count)
+        self.scrollbar.set(self.first / total, min(1.0, (self.first + self.rows()) / total))
+
+    def _scroll_to(self, first):
+        rows = self.rows()
+        last_page = max(0, self.store.count - rows)
+        self.first = max(0, min(int(first), last_page))
+        self.follow = self.first >= last_page
+        self.render()
+
+    def _scroll_by(self, lines):
+        self._scroll_to(self.first + lines)
+        return "break"
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(float(amount) * self.store.count)
+        elif action == "scroll":
+            step = self.rows() if unit == "pages" else 1
+            self._scroll_to(self.first + int(amount) * step)
+
+    def _on_key(self, event):
+        keys = {"Up": -1, "Down": 1, "Prior": -self.rows(), "Next": self.rows()}
+        if event.keysym in keys:
+            return self._scroll_by(keys[event.keysym])
+        if event.keysym == "End":
+            return self._scroll_by(self.store.count)
+        if event.keysym == "Home":
+            return self._scroll_by(-self.store.count)
+        # Read-only: allow copy shortcuts, swallow everything else
+        if not (event.state & 0x4):
+            return "break"
+
+# A new report file (or an existing one with read_only=True) shown in `parent`
+def open_report_view(parent, path, read_only=False):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    store = LogRecordStore(path, read_only=read_only)
+    view = VirtualLogView(parent, store)
+    parent.bind("<Destroy>", lambda e: store.close() if e.widget is parent else None, add="+")
+    return view
@@ -1,15 +1,17 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, Toplevel, messagebox, filedialog
-import time, json, threading, os
-from config import SETTINGS
-from tests.performance.speed_test import run_speed_test
-from scanner.port_scanner import run_port_scan
-from scanner.ipv6_checker import check_ipv6
-from scanner.dns_tester import run_all_dns_tests
-from analyzer.predictor import analyze_results
-from analyzer.database import save_result
-from utils.network_status import get_status_summary
-from security.security_tester import run_security_tests
+import time, json, threading, os, importlib
+from config import SETTINGS, SETTINGS_FILE, load_settings
+from utils.network_status import StatusRefresher
+from utils.scheduler import TEST_ENTRY_POINTS, load_test, log_schedule, run_scheduled, test_tasks
+from utils.metrics import record_result, record_task
+from gui.log_sink import LogSink
+from gui.log_view import open_report_view
+
+# Keep finished test results in the result store so Smart Analysis has real history
+def save_history(results, log):
+    from analyzer.history import record_results
+    record_results(results, log)
 
 class MainWindow:
     def __init__(self, root):
@@ -23,9 +25,22 @@ class MainWindow:
         title = ttk.Label(root, text="ISP Tester Pro", font=("Helvetica", 20, "bold"))
         title.pack(pady=10)
 
-        # Status Bar
+        # Status Bar: last known value right away, refreshed in the background
+        self.status_refresher = StatusRefresher().start()
         self.status_label = ttk.Label(root, text=self.get_network_status(), relief="sunken", anchor="w")
         self.status_label.pack(fill="x", side="bottom")
+        self.root.after(1000, self.update_status_bar)
+        # Optional Prometheus endpoint fed by the tests run from this window
+        if SETTINGS.get("metrics", {}).get("enabled"):
+            from utils.metrics import start_metrics_server
+            host, port = SETTINGS["metrics"].get("host", "127.0.0.1"), SETTINGS["metrics"].get("port", 9105)
+            try:
+                start_metrics_server(port, host)
+            except OSError as e:
+                messagebox.showwarning("Metrics", f"Could not start the metrics endpoint on {host}:{port}:\n{e}")
+        # Resolve public IP / location once for the session so saving results never waits on it
+        threading.Thread(target=lambda: importlib.import_module("utils.network_context").get_network_context(),
+                         daemon=True).start()
 
         # Buttons
         button_frame = ttk.Frame(root)
@@ -39,6 +54,24 @@ class MainWindow:
         ttk.Button(button_frame, text="Run All Tests", command=self.run_all_tests_window).grid(row=0, column=5, padx=5)
         ttk.Button(button_frame, text="Smart Analysis", command=self.run_analysis).grid(row=0, column=6, padx=5)
 
+        # Port scan scope: hosts/CIDRs/ranges and a port spec, defaulting to the settings
+        scan_frame = ttk.Frame(root)
+        scan_frame.pack(pady=5)
+        scan_settings = SETTINGS.get("port_scan", {})
+        self.scan_targets = tk.StringVar(value=scan_settings.get("targets", "127.0.0.1"))
+        self.scan_ports = tk.StringVar(value=scan_settings.get("ports", "0-1023"))
+        ttk.Label(scan_frame, text="Scan targets:").grid(row=0, column=0, padx=5)
+        ttk.Entry(scan_frame, textvariable=self.scan_targets, width=40).grid(row=0, column=1, padx=5)
+        ttk.Label(scan_frame, text="Ports:").grid(row=0, column=2, padx=5)
+        ttk.Entry(scan_frame, textvariable=self.scan_ports, width=20).grid(row=0, column=3, padx=5)
+        self.scan_incremental = tk.BooleanVar(value=scan_settings.get("incremental", False))
+        ttk.Checkbutton(scan_frame, text="Only changes", variable=self.scan_incremental).grid(row=0, column=4, padx=5)
+
+    def test_options(self):
+        """Keyword arguments per test type taken from the input fields"""
+        return {"ports": {"targets": self.scan_targets.get().strip(), "ports": self.scan_ports.get().strip(),
+                          "incremental": self.scan_incremental.get()}}
+
     def create_menu(self):
         menubar = tk.Menu(self.root)
         filemenu = tk.Menu(menubar, tearoff=0)
@@ -66,20 +99,24 @@ class MainWindow:
         style.theme_use("clam")
 
     def get_network_status(self):
-        status = get_status_summary()
-        return f"🌐 Status: Internet={status['internet']} | IPv6={'Enabled' if status['ipv6'] else 'Disabled'} | DNS Hijack={'⚠️' if status['dns_hijack'] else 'Safe'}"
+        status = self.status_refresher.status
+        if status is None:
+            return "🌐 Status: checking..."
+        age = "" if self.status_refresher.fresh else " (last known, checking...)"
+        return f"🌐 Status: Internet={status['internet']} | IPv6={'Enabled' if status['ipv6'] else 'Disabled'} | DNS Hijack={'⚠️' if status['dns_hijack'] else 'Safe'}{age}"
+
+    def update_status_bar(self):
+        self.status_label.config(text=self.get_network_status())
+        self.root.after(1000, self.update_status_bar)
 
     def open_old_report(self):
         filepath = filedialog.askopenfilename(filetypes=[("Log Files", "*.log")])
         if filepath:
-            with open(filepath, "r", encoding="utf-8") as f:
-                content = f.read()
             win = Toplevel(self.root)
             win.title("Previous Report")
             win.geometry("600x400")
-            text_area = scrolledtext.ScrolledText(win, wrap=tk.WORD, font=("Consolas", 10))
-            text_area.insert("1.0", content)
-            text_area.pack(expand=True, fill='both')
+            view = open_report_view(win, filepath, read_only=True)
+            view.pack(expand=True, fill='both')
 
     def run_analysis(self):
         win = Toplevel(self.root)
@@ -89,58 +126,60 @@ class MainWindow:
         log_area = scrolledtext.ScrolledText(win, wrap=tk.WORD, font=("Consolas", 10))
         log_area.pack(expand=True, fill='both', padx=10, pady=10)
 
-        fake_results = {
-            "speed": {"download": 35, "upload": 4, "latency": 150},
-            "ports": {"open": 28, "closed": 100},
-            "dns": {"working": 3, "failed": 2},
-            "ipv6": {"supported": False}
-        }
+        from analyzer.predictor import analyze_results
+        from analyzer.history import analysis_input, format_history, query_history
 
-        report = analyze_results(fake_results)
-        log_area.insert(tk.END, report + "\n")
-        log_area.see(tk.END)
+        def show(text):
+            log_area.insert(tk.END, text + "\n")
+            log_area.see(tk.END)
 
         try:
-            save_result(fake_results, report)
-            log_area.insert(tk.END, "[✔] Result saved to database.\n")
+            results = analysis_input(days=7)
+            if not results:
+                show("ℹ No stored results from the last 7 days yet. Run some tests first.")
+                return
+            show(analyze_results(results))
+
+            show("\n📈 Last 7 days:")
+            for title, metric, group, unit in (("Download (Mbps)", "download", "day", ""),
+                                               ("Latency (ms)", "latency", "day", " ms"),
+                                               ("DNS latency per resolver", "dns_latency", "resolver", " ms")):
+                rows = query_history(metric, group=group)
+                if rows:
+                    show(f"{title}:")
+                    for line in format_history(rows, unit):
+                        show(line)
         except Exception as e:
-            log_area.insert(tk.END, f"[!] Database error: {e}\n")
+            show(f"[!] Database error: {e}")
 
     def run_test_window(self, test_type):
         win = Toplevel(self.root)
         win.title(f"Running Test: {test_type}")
         win.geometry("700x500")
 
-        log_area = scrolledtext.ScrolledText(win, wrap=tk.WORD, font=("Consolas", 10))
-        log_area.pack(expand=True, fill='both', padx=10, pady=10)
+        timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
+        view = open_report_view(win, f"reports/{timestamp}_{test_type}.log")
+        view.pack(expand=True, fill='both', padx=10, pady=10)
 
-        def log(text):
-            log_area.insert(tk.END, f"{text}\n")
-            log_area.see(tk.END)
-            win.update()
+        sink = LogSink(view.text, write=view.append)
+        log = sink.log
+        options = self.test_options().get(test_type, {})
 
         def run():
             start = time.time()
+            failed = False
             log(f"Test started: {test_type}")
             try:
-                if test_type == "speed":
-                    run_speed_test(log)
-                elif test_type == "ports":
-                    run_port_scan(log)
-                elif test_type == "ipv6":
-                    check_ipv6(log)
-                elif test_type == "dns":
-                    run_all_dns_tests(log)
-                elif test_type == "security":
-                    run_security_tests(log)
+                result = load_test(test_type)(log, **options)
+                save_history({test_type: result}, log)
             except Exception as e:
                 log(f"[!] Error: {e}")
+                result, failed = None, True
             duration = time.time() - start
+            record_result(test_type, result, duration, failed)
             log(f"Execution Time: {duration:.2f} seconds")
-            timestamp = time.strftime("%Y-%m-%d_%H-%M")
-            os.makedirs("reports", exist_ok=True)
-            with open(f"reports/{timestamp}_{test_type}.log", "w", encoding="utf-8") as f:
-                f.write(log_area.get("1.0", tk.END))
+            # The report has been streamed to disk line by line; nothing to copy out
+            sink.close()
 
         threading.Thread(target=run).start()
 
@@ -149,31 +188,28 @@ class MainWindow:
         win.title("Running All Tests")
         win.geometry("700x500")
 
-        log_area = scrolledtext.ScrolledText(win, wrap=tk.WORD, font=("Consolas", 10))
-        log_area.pack(expand=True, fill='both', padx=10, pady=10)
+        timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
+        view = open_report_view(win, f"reports/{timestamp}_full.log")
+        view.pack(expand=True, fill='both', padx=10, pady=10)
 
-        def log(text):
-            log_area.insert(tk.END, f"{text}\n")
-            log_area.see(tk.END)
-            win.update()
+        sink = LogSink(view.text, write=view.append)
+        log = sink.log
+        options = self.test_options()
 
         def run_all():
             start = time.time()
             log("Starting Full ISP Test...\n")
+            tasks = test_tasks(list(TEST_ENTRY_POINTS), options)
             try:
-                run_speed_test(log)
-                run_port_scan(log)
-                check_ipv6(log)
-                run_all_dns_tests(log)
-                run_security_tests(log)
+                schedule = run_scheduled(tasks, log, on_done=record_task)
+                log_schedule(log, schedule)
+                save_history(schedule["results"], log)
             except Exception as e:
                 log(f"[!] Error: {e}")
             duration = time.time() - start
             log(f"All tests completed. Total time: {duration:.2f} seconds")
-            timestamp = time.strftime("%Y-%m-%d_%H-%M")
-            os.makedirs("reports", exist_ok=True)
-            with open(f"reports/{timestamp}_full.log", "w", encoding="utf-8") as f:
-                f.write(log_area.get("1.0", tk.END))
+            # The report has been streamed to disk line by line; nothing to copy out
+            sink.close()
 
         threading.Thread(target=run_all).start()
 
@@ -182,7 +218,7 @@ class MainWindow:
         win.title("Settings")
         win.geometry("600x400")
 
-        with open("settings.json", "r", encoding="utf-8") as f:
+        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
             content = f.read()
 
         text_area = scrolledtext.ScrolledText(win, wrap=tk.WORD, font=("Consolas", 10))
@@ -193,8 +229,9 @@ class MainWindow:
             try:
                 new_content = text_area.get("1.0", tk.END)
                 json.loads(new_content)
-                with open("settings.json", "w", encoding="utf-8") as f:
+                with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
                     f.write(new_content)
+                load_settings()
                 messagebox.showinfo("Settings", "Saved successfully.")
                 win.destroy()
             except Exception as e:
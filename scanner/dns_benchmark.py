@@ -0,0 +1,120 @@
+import secrets
+
+from config import SETTINGS
+from scanner.dns_wire import NOERROR, NXDOMAIN, RCODES, run_queries
+from utils.ip_intel import describe_ip
+from utils.measure import summarize
+
+DNS_SERVERS = [
+    ("1.1.1.1", "Cloudflare"),
+    ("8.8.8.8", "Google"),
+    ("9.9.9.9", "Quad9"),
+    ("208.67.222.222", "OpenDNS"),
+    ("76.76.2.0", "Control D"),
+    ("94.140.14.14", "AdGuard"),
+    ("2606:4700:4700::1111", "Cloudflare IPv6"),
+    ("2001:4860:4860::8888", "Google IPv6"),
+    ("2620:fe::fe", "Quad9 IPv6")
+]
+
+BENCHMARK_DOMAINS = ("example.com", "google.com", "wikipedia.org")
+BENCHMARK_TYPES = ("A", "AAAA")
+# Zone for cache-busting names (SETTINGS["dns"]["cache_zone"] overrides it). It must be
+# unsigned: in a DNSSEC-signed zone resolvers with aggressive NSEC caching (RFC 8198)
+# answer random names from cache, and the "cold" samples would really be warm.
+CACHE_ZONE = "google.com"
+
+# RTT of a reply that resolved the name, else why it didn't: a quick SERVFAIL or REFUSED
+# is reported by its rcode and counts as lost, so it can't make a broken resolver look fast
+def _outcome(reply):
+    if reply["error"] or reply["rtt"] is None:
+        return reply["error"] or "timeout"
+    if reply["rcode"] not in (NOERROR, NXDOMAIN):
+        return RCODES.get(reply["rcode"], f"rcode {reply['rcode']}")
+    return reply["rtt"]
+
+def benchmark_resolvers(servers=DNS_SERVERS, domains=BENCHMARK_DOMAINS, record_types=BENCHMARK_TYPES,
+                        samples=3, timeout=2.0, deadline=8.0, spacing=0.02, on_result=None):
+    """Query every resolver at once and summarize its latency distribution.
+
+    Each resolver gets `samples` rounds over every domain x record type, sent `spacing`
+    seconds apart without waiting for earlier answers, so a dead resolver only costs
+    its own timeouts. The whole run is cut off at `deadline` seconds; queries still
+    outstanding at that point count as lost.
+    """
+    plan = [(domain, rdtype) for _ in range(samples) for domain in domains for rdtype in record_types]
+    # Interleave servers so each one sees a query every `spacing` seconds
+    queries = [(ip, domain, rdtype) for domain, rdtype in plan for ip, _ in servers]
+    replies = run_queries(queries, timeout=timeout, spacing=spacing / max(1, len(servers)), deadline=deadline)
+
+    by_server = {ip: [] for ip, _ in servers}
+    for reply in replies:
+        by_server[reply["server"]].append(reply)
+
+    results = {}
+    for ip, name in servers:
+        outcomes = [_outcome(r) for r in by_server[ip]]
+        stats = summarize(outcomes, len(plan))
+        stats.update({"ip": ip, "name": name,
+                      "errors": sorted({o for o in outcomes if isinstance(o, str)} - {"timeout", "deadline"})})
+        stats["latencies"] = [o for o in outcomes if isinstance(o, float)]
+        results[ip] = stats
+        if on_result:
+            on_result(stats)
+    return results
+
+def profile_cache_latency(servers=DNS_SERVERS, zone=None, samples=10, timeout=2.0, deadline=10.0,
+                          spacing=0.05, on_result=None):
+    """Measure cold-miss and warm-hit latency separately for every resolver.
+
+    Cold samples ask for a fresh random subdomain of `zone` each time, so the resolver
+    has to go upstream; warm samples repeat `zone` itself after it has been primed.
+    """
+    zone = zone or SETTINGS.get("dns", {}).get("cache_zone") or CACHE_ZONE
+    # Prime the repeated name first so warm samples really are cache hits
+    run_queries([(ip, zone, "A") for ip, _ in servers], timeout=timeout, deadline=timeout)
+
+    queries = []
+    for _ in range(samples):
+        for ip, _ in servers:
+            queries.append((ip, f"{secrets.token_hex(6)}.{zone}", "A", "cold"))
+            queries.append((ip, zone, "A", "warm"))
+    replies = run_queries(queries, timeout=timeout, spacing=spacing / max(1, 2 * len(servers)), deadline=deadline)
+
+    outcomes = {(ip, kind): [] for ip, _ in servers for kind in ("cold", "warm")}
+    for query, reply in zip(queries, replies):
+        outcomes[(query[0], query[3])].append(_outcome(reply))
+
+    results = {}
+    for ip, name in servers:
+        cold = summarize(outcomes[(ip, "cold")], samples)
+        warm = summarize(outcomes[(ip, "warm")], samples)
+        penalty = cold["median"] - warm["median"] if cold["received"] and warm["received"] else None
+        results[ip] = {"ip": ip, "name": name, "cold": cold, "warm": warm, "miss_penalty": penalty}
+        if on_result:
+            on_result(results[ip])
+    return results
+
+def log_benchmark(log, stats):
+    if not stats["received"]:
+        reason = f": {stats['errors'][0]}" if stats["errors"] else " (timeout)"
+        log(f"❌ DNS {stats['name']} ({stats['ip']}) failed to respond{reason}")
+        return
+    network = describe_ip(stats["ip"])
+    log(f"✅ DNS {stats['name']} ({stats['ip']}{', ' + network if network else ''}) ⏱ min {stats['min']:.1f} | median {stats['median']:.1f} | "
+        f"p95 {stats['p95']:.1f} | p99 {stats['p99']:.1f} ms | jitter {stats['jitter']:.1f} ms | "
+        f"loss {stats['loss']:.0f}% ({stats['received']}/{stats['sent']})")
+
+def log_cache_profile(log, profile):
+    cold, warm = profile["cold"], profile["warm"]
+    if not cold["received"] and not warm["received"]:
+        log(f"❌ DNS {profile['name']} ({profile['ip']}) did not answer cache probes")
+        return
+    parts = []
+    for label, stats in (("cold", cold), ("warm", warm)):
+        if stats["received"]:
+            parts.append(f"{label} median {stats['median']:.1f} / p95 {stats['p95']:.1f} ms")
+        else:
+            parts.append(f"{label} no answers")
+    penalty = f" | miss penalty {profile['miss_penalty']:.1f} ms" if profile["miss_penalty"] is not None else ""
+    log(f"🧊 DNS {profile['name']} ({profile['ip']}) {' | '.join(parts)}{penalty}")
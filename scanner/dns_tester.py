@@ -1,7 +1,7 @@
 import subprocess
 import socket
 import time
-import matplotlib.pyplot as plt
+from utils.plot import charts_enabled, new_figure
 import platform
 import shutil
 from statistics import mean
@@ -12,6 +12,8 @@ import dns.query
 import dns.dnssec
 import dns.name
 import requests
+from scanner.dns_benchmark import (DNS_SERVERS, benchmark_resolvers, log_benchmark, log_cache_profile,
+                                   profile_cache_latency)
 
 
 def check_ipv6(log):
@@ -32,41 +34,28 @@ def check_ipv6(log):
 
 def run_all_dns_tests(log):
     log("🧪 Running DNS Tests...")
-    dns_servers = [
-        ("1.1.1.1", "Cloudflare"),
-        ("8.8.8.8", "Google"),
-        ("9.9.9.9", "Quad9"),
-        ("208.67.222.222", "OpenDNS"),
-        ("76.76.2.0", "Control D"),
-        ("94.140.14.14", "AdGuard"),
-        ("2606:4700:4700::1111", "Cloudflare IPv6"),
-        ("2001:4860:4860::8888", "Google IPv6"),
-        ("2620:fe::fe", "Quad9 IPv6")
-    ]
-
     times = []
-    for ip, name in dns_servers:
-        try:
-            start = time.time()
-            resolver = dns.resolver.Resolver()
-            resolver.nameservers = [ip]
-            answer = resolver.resolve("example.com", "A")
-            elapsed = (time.time() - start) * 1000
-            log(f"✅ DNS {name} ({ip}) responded. IP: {answer[0]} ⏱ {elapsed:.1f} ms")
-            times.append((name, elapsed))
-        except Exception as e:
-            log(f"❌ DNS {name} ({ip}) failed to respond: {e}")
-
-    if times:
+
+    def on_result(stats):
+        log_benchmark(log, stats)
+        if stats["received"]:
+            times.append((stats["name"], stats["median"]))
+
+    resolvers = benchmark_resolvers(DNS_SERVERS, on_result=on_result)
+
+    log("\n🧊 Cold-cache vs warm-cache latency:")
+    cache = profile_cache_latency(DNS_SERVERS, on_result=lambda profile: log_cache_profile(log, profile))
+
+    if times and charts_enabled():
         labels, values = zip(*times)
-        plt.figure()
-        plt.bar(labels, values)
-        plt.ylabel("ms")
-        plt.title("DNS Response Times")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig("/mnt/data/dns_response_times.png")
-        plt.close()
+        fig = new_figure()
+        ax = fig.subplots()
+        ax.bar(labels, values)
+        ax.set_ylabel("ms")
+        ax.set_title("DNS Response Times")
+        ax.tick_params(axis="x", labelrotation=45)
+        fig.tight_layout()
+        fig.savefig("/mnt/data/dns_response_times.png")
         log("📊 DNS response time chart saved: /mnt/data/dns_response_times.png")
 
     log("\n🔍 DNS Response Validation:")
@@ -123,3 +112,5 @@ def run_all_dns_tests(log):
             log(res.stdout.strip())
     except Exception as e:
         log(f"⚠ Error fetching DNS settings: {e}")
+
+    return {"resolvers": resolvers, "cache": cache}
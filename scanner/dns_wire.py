@@ -0,0 +1,248 @@
+import random
+import selectors
+import socket
+import struct
+import time
+
+# Minimal DNS wire-format engine: queries are encoded once, sent over reusable
+# non-blocking UDP sockets and matched to replies by transaction ID.
+
+QTYPES = {"A": 1, "NS": 2, "CNAME": 5, "SOA": 6, "PTR": 12, "MX": 15, "TXT": 16, "AAAA": 28, "ANY": 255}
+RCODES = {0: "NOERROR", 1: "FORMERR", 2: "SERVFAIL", 3: "NXDOMAIN", 4: "NOTIMP", 5: "REFUSED"}
+NOERROR = 0
+NXDOMAIN = 3
+DNS_PORT = 53
+
+_HEADER = struct.Struct("!HHHHHH")
+_RR_FIXED = struct.Struct("!HHIH")
+
+def encode_question(name, rdtype="A"):
+    """Wire-format question section; prepended with a header per query by build_query"""
+    qname = b""
+    for label in name.rstrip(".").split("."):
+        raw = label.encode("idna") if label else b""
+        if not raw or len(raw) > 63:
+            raise ValueError(f"Invalid DNS label in {name!r}")
+        qname += bytes([len(raw)]) + raw
+    if len(qname) > 254:
+        raise ValueError(f"DNS name too long: {name!r}")
+    qtype = QTYPES.get(rdtype) if isinstance(rdtype, str) else rdtype
+    if not isinstance(qtype, int) or not 0 < qtype < 65536:
+        raise ValueError(f"Unknown record type: {rdtype!r}")
+    return qname + b"\x00" + struct.pack("!HH", qtype, 1)
+
+def build_query(question, txid, recursion=True):
+    return _HEADER.pack(txid, 0x0100 if recursion else 0, 1, 0, 0, 0) + question
+
+def parse_response(data):
+    """Header fields and the A/AAAA/CNAME answers of a reply; enough for latency and hijack checks"""
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated DNS header")
+    txid, flags, qdcount, ancount, nscount, arcount = _HEADER.unpack_from(data)
+    offset = _HEADER.size
+    for _ in range(qdcount):
+        offset = _skip_name(data, offset) + 4
+    answers = []
+    for _ in range(ancount):
+        offset = _skip_name(data, offset)
+        rtype, _, ttl, rdlength = _RR_FIXED.unpack_from(data, offset)
+        offset += _RR_FIXED.size
+        rdata = data[offset:offset + rdlength]
+        if rtype == 1 and rdlength == 4:
+            answers.append(("A", socket.inet_ntop(socket.AF_INET, rdata), ttl))
+        elif rtype == 28 and rdlength == 16:
+            answers.append(("AAAA", socket.inet_ntop(socket.AF_INET6, rdata), ttl))
+        elif rtype == 5:
+            answers.append(("CNAME", None, ttl))
+        offset += rdlength
+    return {
+        "txid": txid,
+        "rcode": flags & 0x000F,
+        "truncated": bool(flags & 0x0200),
+        "answer_count": ancount,
+        "authority_count": nscount,
+        "answers": answers
+    }
+
+def _skip_name(data, offset):
+    while True:
+        length = data[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:  # Compression pointer ends the name
+            return offset + 2
+        offset += length + 1
+
+class UDPQueryEngine:
+    """Send many DNS queries over a few reusable UDP sockets and time them with a monotonic clock.
+
+    Every query gets a random 16-bit transaction ID; replies are matched by
+    (server, txid) so answers from the wrong source or with a stale ID are ignored.
+    Timestamps are taken with perf_counter_ns immediately around sendto/recvfrom.
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.sockets = {}
+        self.question_cache = {}
+
+    def _socket(self, family):
+        sock = self.sockets.get(family)
+        if sock is None:
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            except OSError:
+                pass
+            self.selector.register(sock, selectors.EVENT_READ)
+            self.sockets[family] = sock
+        return sock
+
+    def question(self, name, rdtype="A"):
+        key = (name, rdtype)
+        question = self.question_cache.get(key)
+        if question is None:
+            question = self.question_cache[key] = encode_question(name, rdtype)
+        return question
+
+    def run(self, queries, timeout=2.0, spacing=0.0, deadline=None, on_result=None):
+        """Send (server, name, rdtype) queries and collect one result dict per query, in order.
+
+        `spacing` seconds separate consecutive sends, `timeout` bounds each query and
+        `deadline` (seconds from now) bounds the whole batch.
+        """
+        start = time.perf_counter_ns()
+        end = start + int(deadline * 1e9) if deadline is not None else None
+        timeout_ns = int(timeout * 1e9)
+        spacing_ns = int(spacing * 1e9)
+
+        results = [_new_result(query) for query in queries]
+        pending = {}  # (server, txid) -> (index, sent_at), in send order
+        next_index = 0
+        next_send = start
+
+        while next_index < len(queries) or pending:
+            now = time.perf_counter_ns()
+            if end is not None and now >= end:
+                break
+
+            # Send everything that is due
+            while next_index < len(queries) and now >= next_send:
+                self._send(queries[next_index], next_index, results, pending, on_result)
+                next_index += 1
+                next_send += spacing_ns
+                now = time.perf_counter_ns()
+
+            # Timeouts are uniform, so only the oldest outstanding queries can have expired
+            expired = []
+            for key, (index, sent_at) in pending.items():
+                if now - sent_at < timeout_ns:
+                    break
+                expired.append(key)
+            for key in expired:
+                self._finish(results, pending.pop(key)[0], on_result, error="timeout")
+
+            if not pending and next_index >= len(queries):
+                break
+            wake_times = []
+            if pending:
+                wake_times.append(next(iter(pending.values()))[1] + timeout_ns)
+            if next_index < len(queries):
+                wake_times.append(next_send)
+            if end is not None:
+                wake_times.append(end)
+            wait = max(0, min(wake_times, default=now) - now) / 1e9
+            for key, _ in self.selector.select(wait):
+                self._receive(key.fileobj, results, pending, on_result)
+
+        for index, _ in pending.values():
+            self._finish(results, index, on_result, error="deadline")
+        for index in range(next_index, len(queries)):
+            self._finish(results, index, on_result, error="deadline")
+        return results
+
+    def _send(self, query, index, results, pending, on_result):
+        server, name, rdtype = query[:3]
+        family = socket.AF_INET6 if ":" in server else socket.AF_INET
+        try:
+            question = self.question(name, rdtype)
+        except ValueError as e:  # Also UnicodeError from IDNA; fails this query only
+            self._finish(results, index, on_result, error=f"Invalid query: {e}")
+            return
+        try:
+            sock = self._socket(family)
+            server_key = _normalize(server)
+            while True:
+                txid = random.getrandbits(16)
+                if (server_key, txid) not in pending:
+                    break
+            packet = build_query(question, txid)
+            sent_at = time.perf_counter_ns()
+            sock.sendto(packet, (server, DNS_PORT))
+            pending[(server_key, txid)] = (index, sent_at)
+        except OSError as e:
+            self._finish(results, index, on_result, error=f"{type(e).__name__}: {e}")
+
+    def _receive(self, sock, results, pending, on_result):
+        while True:
+            try:
+                data, addr = sock.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # ICMP port unreachable surfaces here on some platforms; the query will time out
+                return
+            received_at = time.perf_counter_ns()
+            if len(data) < 2:
+                continue
+            key = (_normalize(addr[0]), struct.unpack_from("!H", data)[0])
+            entry = pending.pop(key, None)
+            if entry is None:
+                continue  # Late, duplicate or spoofed reply
+            index, sent_at = entry
+            result = results[index]
+            result["rtt"] = (received_at - sent_at) / 1e6  # milliseconds
+            try:
+                result.update({k: v for k, v in parse_response(data).items() if k != "txid"})
+            except (ValueError, IndexError, struct.error) as e:
+                result["error"] = f"Malformed reply: {e}"
+            self._finish(results, index, on_result)
+
+    def _finish(self, results, index, on_result, error=None):
+        if error and results[index]["error"] is None:
+            results[index]["error"] = error
+        if on_result:
+            on_result(results[index])
+
+    def close(self):
+        for sock in self.sockets.values():
+            self.selector.unregister(sock)
+            sock.close()
+        self.sockets.clear()
+        self.selector.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _new_result(query):
+    server, name, rdtype = query[:3]
+    return {"server": server, "name": name, "rdtype": rdtype, "rtt": None, "rcode": None,
+            "answers": [], "answer_count": 0, "error": None}
+
+def _normalize(address):
+    # IPv4-mapped and scoped IPv6 source addresses must match the configured server string
+    address = address.split("%", 1)[0]
+    if address.startswith("::ffff:") and "." in address:
+        return address[7:]
+    try:
+        return socket.inet_ntop(socket.AF_INET6, socket.inet_pton(socket.AF_INET6, address))
+    except OSError:
+        return address
+
+def run_queries(queries, timeout=2.0, spacing=0.0, deadline=None, on_result=None):
+    with UDPQueryEngine() as engine:
+        return engine.run(queries, timeout, spacing, deadline, on_result)
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import re
+import ssl
+from collections import defaultdict
+
+# ---------------- PROBES ----------------
+# Services that talk first (SSH, SMTP, FTP, ...) are caught by the null probe;
+# everything else gets a probe picked by port, falling back to HTTP.
+PROBES = {
+    "null": b"",
+    "http": b"HEAD / HTTP/1.0\r\n\r\n",
+    "tls": b"HEAD / HTTP/1.0\r\n\r\n",
+    "rtsp": b"OPTIONS / RTSP/1.0\r\nCSeq: 1\r\n\r\n",
+    "redis": b"*1\r\n$4\r\nPING\r\n"
+}
+
+PORT_PROBES = {
+    80: "http", 81: "http", 3000: "http", 5000: "http", 8000: "http", 8008: "http", 8080: "http",
+    8081: "http", 8888: "http", 443: "tls", 465: "tls", 636: "tls", 853: "tls", 993: "tls",
+    995: "tls", 8443: "tls", 554: "rtsp", 6379: "redis"
+}
+
+# How long to wait for an unsolicited greeting before sending anything
+GREETING_WAIT = 0.3
+READ_SIZE = 2048
+
+# ---------------- SIGNATURES ----------------
+# (service, regex, index token). Anchored patterns are indexed by their literal
+# prefix automatically; unanchored ones need a token that appears in the banner.
+SIGNATURES = [
+    ("ssh", r"^SSH-[\d.]+-(?P<product>[A-Za-z]+)[_-]?(?P<version>[\w.]*)", None),
+    ("ftp", r"^220[ -]\(?(?P<product>ProFTPD|vsFTPd|FileZilla Server|Pure-FTPd)[ /]?(?P<version>[\w.]*)", None),
+    ("ftp", r"^220[ -].*\bFTP\b", None),
+    ("smtp", r"^220[ -]\S+ E?SMTP (?P<product>Postfix|Exim|Sendmail|Microsoft ESMTP MAIL Service)"
+             r"[ /]?(?P<version>[\w.]*)", None),
+    ("smtp", r"^220[ -].*\bE?SMTP\b", None),
+    ("pop3", r"^\+OK (?P<product>Dovecot)?", None),
+    ("imap", r"^\* OK .*?(?P<product>Dovecot|Cyrus|Courier)", None),
+    ("imap", r"^\* OK .*IMAP", None),
+    ("mysql", r"^.\x00\x00\x00\x0a(?P<version>[\d.]+[\w.-]*)\x00", None),
+    ("redis", r"^\+PONG", None),
+    ("redis", r"^-NOAUTH", None),
+    ("rtsp", r"^RTSP/1\.0 \d{3}", None),
+    ("http", r"(?im)^Server: (?P<product>nginx)(?:/(?P<version>[\d.]+))?", "nginx"),
+    ("http", r"(?im)^Server: (?P<product>Apache)(?:/(?P<version>[\d.]+))?", "apache"),
+    ("http", r"(?im)^Server: (?P<product>Microsoft-IIS)(?:/(?P<version>[\d.]+))?", "microsoft-iis"),
+    ("http", r"(?im)^Server: (?P<product>lighttpd)(?:/(?P<version>[\d.]+))?", "lighttpd"),
+    ("http", r"(?im)^Server: (?P<product>SimpleHTTP)(?:/(?P<version>[\d.]+))?", "simplehttp"),
+    ("http", r"(?im)^Server: (?P<product>cloudflare)", "cloudflare"),
+    ("http", r"^HTTP/(?P<version>[\d.]+) \d{3}", None),
+    ("vnc", r"^RFB (?P<version>\d{3}\.\d{3})", None),
+    ("telnet", r"^\xff[\xfb-\xfe]", None),
+    ("mongodb", r"MongoDB", "mongodb"),
+    ("memcached", r"^(?:ERROR|VERSION (?P<version>[\d.]+))\r\n", None)
+]
+
+PREFIX_LEN = 3
+_TOKEN_RE = re.compile(r"[a-z0-9-]+")
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+class SignatureIndex:
+    """Pre-compiled signature set that only runs the regexes a banner can possibly match.
+
+    Anchored signatures are bucketed by the first bytes of their literal prefix and
+    unanchored ones by a lowercase word token, so a lookup costs one dict probe plus
+    a tokenization of the banner instead of one regex pass per signature.
+    """
+
+    def __init__(self, signatures=SIGNATURES):
+        self.by_prefix = defaultdict(list)
+        self.by_token = defaultdict(list)
+        self.unindexed = []
+        self.size = 0
+        for order, (service, pattern, token) in enumerate(signatures):
+            entry = (order, service, re.compile(pattern, re.DOTALL))
+            prefix = _literal_prefix(pattern)
+            if token:
+                self.by_token[token.lower()].append(entry)
+            elif len(prefix) >= PREFIX_LEN:
+                self.by_prefix[prefix[:PREFIX_LEN]].append(entry)
+            elif prefix:
+                self.by_prefix[prefix].append(entry)
+            else:
+                self.unindexed.append(entry)
+            self.size += 1
+        self._short_prefixes = sorted({p for p in self.by_prefix if len(p) < PREFIX_LEN}, key=len)
+
+    def candidates(self, banner):
+        found = list(self.unindexed)
+        found.extend(self.by_prefix.get(banner[:PREFIX_LEN], ()))
+        for prefix in self._short_prefixes:
+            if banner.startswith(prefix):
+                found.extend(self.by_prefix[prefix])
+        for token in set(_TOKEN_RE.findall(banner.lower())):
+            found.extend(self.by_token.get(token, ()))
+        found.sort(key=lambda entry: entry[0])
+        return found
+
+    # First match in declaration order wins, so specific signatures go before generic ones
+    def match(self, banner):
+        for _, service, regex in self.candidates(banner):
+            m = regex.search(banner)
+            if m:
+                groups = m.groupdict()
+                return {"service": service, "product": groups.get("product"), "version": groups.get("version")}
+        return None
+
+def _literal_prefix(pattern):
+    if not pattern.startswith("^"):
+        return ""
+    prefix = []
+    i = 1
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            prefix.append(pattern[i + 1])
+            i += 2
+            continue
+        if ch in _REGEX_META:
+            # A quantifier makes the previous character optional
+            if ch in "*?{" and prefix:
+                prefix.pop()
+            break
+        prefix.append(ch)
+        i += 1
+    return "".join(prefix)
+
+# Load extra signatures from a JSON-lines file: {"service": ..., "pattern": ..., "token": ...}
+def load_signatures(path, include_builtin=True):
+    signatures = list(SIGNATURES) if include_builtin else []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                sig = json.loads(line)
+                signatures.append((sig["service"], sig["pattern"], sig.get("token")))
+    return SignatureIndex(signatures)
+
+DEFAULT_INDEX = SignatureIndex()
+
+# ---------------- PIPELINE ----------------
+def fingerprint_ports(host, ports, timeout=1.5, concurrency=200, index=None):
+    return asyncio.run(fingerprint_ports_async(host, ports, timeout, concurrency, index))
+
+async def fingerprint_ports_async(host, ports, timeout=1.5, concurrency=200, index=None):
+    """Identify the services on already-known open ports, all ports concurrently"""
+    semaphore = asyncio.Semaphore(concurrency)
+    index = index or DEFAULT_INDEX
+
+    async def run(port):
+        async with semaphore:
+            return await fingerprint_port(host, port, timeout, index)
+
+    results = await asyncio.gather(*(run(port) for port in ports))
+    return {r["port"]: r for r in results}
+
+async def fingerprint_port(host, port, timeout=1.5, index=None):
+    index = index or DEFAULT_INDEX
+    result = {"port": port, "service": None, "product": None, "version": None, "banner": None, "probe": None}
+    probe = PORT_PROBES.get(port)
+
+    # Talk-first services: listen before sending anything unless the port is known to wait for us
+    if probe is None:
+        data = await _exchange(host, port, b"", min(GREETING_WAIT, timeout), timeout)
+        if data:
+            return _describe(result, "null", data, index)
+        probe = "http"
+
+    data = await _exchange(host, port, PROBES[probe], timeout, timeout, use_tls=(probe == "tls"))
+    if data is None and probe == "tls":
+        # Plain-text service on a TLS-looking port
+        probe = "http"
+        data = await _exchange(host, port, PROBES[probe], timeout, timeout)
+    if data:
+        return _describe(result, probe, data, index)
+    return result
+
+def _describe(result, probe, data, index):
+    banner = data.decode("latin-1")
+    result["probe"] = probe
+    result["banner"] = data.decode(errors="ignore").strip()
+    match = index.match(banner)
+    if match:
+        result.update(match)
+    if probe == "tls" and result["service"] == "http":
+        result["service"] = "https"
+    return result
+
+async def _exchange(host, port, payload, read_timeout, connect_timeout, use_tls=False):
+    context = None
+    if use_tls:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context, server_hostname=host if use_tls else None),
+            connect_timeout)
+        if payload:
+            writer.write(payload)
+            await writer.drain()
+        return await asyncio.wait_for(reader.read(READ_SIZE), read_timeout)
+    except (OSError, asyncio.TimeoutError, ssl.SSLError):
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+
+def describe_service(fp):
+    if not fp or not fp.get("banner"):
+        return None
+    if not fp.get("service"):
+        return fp["banner"].splitlines()[0][:120]
+    parts = [fp["service"]]
+    if fp.get("product"):
+        parts.append(fp["product"])
+    if fp.get("version"):
+        parts.append(fp["version"])
+    return " ".join(parts)
@@ -1,11 +1,30 @@
-import subprocess
+import ipaddress
+import shutil
 import socket
+import subprocess
 import time
-import matplotlib.pyplot as plt
-import platform
-import shutil
-from statistics import mean
-import re
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from scanner.pinger import log_ping, ping_hosts
+from utils.measure import SampleBuffer
+from utils.plot import charts_enabled, new_figure
+
+# The check is a set of independent sub-probes (DNS, NAT64, ping, traceroute, firewall,
+# RA, ::1 ports, IPsec) that run side by side under one shared deadline, so it takes
+# about as long as the slowest of them. Local address data is read once from
+# /proc/net/if_inet6 and shared by every section that needs it.
+
+DEADLINE = 12.0
+CONNECT_TIMEOUT = 3.0
+TEST_HOSTS = [
+    ("ipv6.google.com", "[2607:f8b0:4005:805::200e]"),
+    ("one.one.one.one", "[2606:4700:4700::1111]")
+]
+
+IF_INET6 = "/proc/net/if_inet6"
+SCOPES = {0x00: "global", 0x10: "host", 0x20: "link", 0x40: "site"}
+IFA_F_TEMPORARY = 0x01
+IFA_F_PERMANENT = 0x80
 
 
 def check_ipv6(log):
@@ -23,209 +42,281 @@ def check_ipv6(log):
     if result["firewall"]:
         log("\n🔥 Initial IPv6 Firewall Status:")
         log(result["firewall"])
+    return result
 
 
-def check_ipv6_support():
-    logs = []
-    chart_path = None
-    traceroute_output = ""
-    firewall_status = ""
-    latency_results = []
+def read_ipv6_addresses(path=IF_INET6):
+    """[{address, prefix, scope, flags, interface}] from /proc/net/if_inet6, or None where it doesn't exist"""
+    try:
+        with open(path, "r") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    addresses = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) < 6:
+            continue
+        scope = int(parts[3], 16)
+        addresses.append({
+            "address": str(ipaddress.IPv6Address(bytes.fromhex(parts[0]))),
+            "prefix": int(parts[2], 16),
+            "scope": SCOPES.get(scope, hex(scope)),
+            "flags": int(parts[4], 16),
+            "interface": parts[5]
+        })
+    return addresses
 
-    logs.append("🔍 Checking IPv6 support...")
 
-    test_hosts = [
-        ("ipv6.google.com", "[2607:f8b0:4005:805::200e]"),
-        ("one.one.one.one", "[2606:4700:4700::1111]")
-    ]
-    supported = False
+# Both test hosts are tried at once; the first one to accept a connection proves IPv6 works
+def _connect(hostname, fallback_ip, timeout):
+    try:
+        addrinfo = socket.getaddrinfo(hostname, 80, socket.AF_INET6)
+        address = addrinfo[0][4][0] if addrinfo else fallback_ip.strip("[]")
+    except:
+        address = fallback_ip.strip("[]")
+    try:
+        with socket.socket(socket.AF_INET6, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect((address, 80))
+        return f"✔ Successful connection to {hostname} via IPv6 ({address})", True
+    except Exception as e:
+        return f"✖ Failed to connect to {hostname} via IPv6: {e}", False
 
-    for hostname, fallback_ip in test_hosts:
-        try:
-            addrinfo = socket.getaddrinfo(hostname, 80, socket.AF_INET6)
-            address = addrinfo[0][4][0] if addrinfo else fallback_ip.strip("[]")
-        except:
-            address = fallback_ip.strip("[]")
 
-        try:
-            sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
-            sock.settimeout(3)
-            sock.connect((address, 80))
-            sock.close()
-            logs.insert(1, "🟢 IPv6 Connectivity: Active ✅")
-            logs.append(f"✔ Successful connection to {hostname} via IPv6 ({address})")
-            supported = True
-            break
-        except Exception as e:
-            logs.append(f"✖ Failed to connect to {hostname} via IPv6: {e}")
+def _remaining(deadline, cap=None):
+    left = max(0.1, deadline - time.monotonic())
+    return min(left, cap) if cap else left
+
+
+def _run(cmd, deadline, cap=None):
+    return subprocess.run(cmd, capture_output=True, text=True, timeout=_remaining(deadline, cap))
 
-    if not supported:
-        logs.insert(1, "🔴 IPv6 Connectivity: Inactive ❌")
-        logs.append("❌ IPv6 is not supported.")
-        return {"logs": logs, "chart_path": None, "traceroute": "", "firewall": ""}
 
-    logs.append("\n📥 Local IPv6 Addresses:")
+def _local_addresses(addresses):
+    logs = []
+    if addresses is not None:
+        for a in addresses:
+            logs.append(f"→ {a['address']}/{a['prefix']} ({a['scope']}, {a['interface']})")
+        return logs
     try:
         for res in socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET6):
             logs.append(f"→ {res[4][0]}")
     except:
         logs.append("⚠ Failed to retrieve local IPv6 addresses.")
+    return logs
 
-    logs.append("\n🔎 Checking DNS Leak over IPv6:")
-    try:
-        res = subprocess.run(["nslookup", "ipv6.google.com"], capture_output=True, text=True)
-        if "Address" in res.stdout:
-            logs.append("✔ DNS query completed successfully.")
-        else:
-            logs.append("⚠ DNS response issue detected.")
-    except Exception as e:
-        logs.append(f"⚠ nslookup error: {e}")
 
-    logs.append("\n📊 Detecting Static vs Dynamic Addresses:")
+def _address_types(addresses):
+    if addresses is None:
+        return ["⚠ Unable to detect address types."]
+    # Kernel-configured (SLAAC/DHCPv6) addresses lack IFA_F_PERMANENT; manually added ones have it
+    return [f"→ {a['address']}/{a['prefix']} on {a['interface']} "
+            f"({'Static' if a['flags'] & IFA_F_PERMANENT else 'Dynamic'})"
+            for a in addresses if a["scope"] == "global"]
+
+
+def _slaac_enabled(interface):
     try:
-        res = subprocess.run(["ip", "-6", "addr"], capture_output=True, text=True)
-        lines = res.stdout.splitlines()
-        for line in lines:
-            if "scope global dynamic" in line:
-                logs.append(f"→ {line.strip()} (Dynamic)")
-            elif "scope global" in line:
-                logs.append(f"→ {line.strip()} (Static)")
-    except:
-        logs.append("⚠ Unable to detect address types.")
+        with open(f"/proc/sys/net/ipv6/conf/{interface}/autoconf") as f:
+            autoconf = f.read().strip() == "1"
+        with open(f"/proc/sys/net/ipv6/conf/{interface}/accept_ra") as f:
+            return autoconf and f.read().strip() != "0"
+    except OSError:
+        return False
+
+
+def _security_check(addresses):
+    if addresses is None:
+        return ["⚠ Address inspection error: /proc/net/if_inet6 is not available"]
+    logs = [f"🌐 Number of public addresses: {sum(a['scope'] == 'global' for a in addresses)}",
+            f"🔗 Number of link-local addresses: {sum(a['scope'] == 'link' for a in addresses)}"]
+    if any(a["flags"] & IFA_F_TEMPORARY for a in addresses):
+        logs.append("⚠ Temporary address (privacy extension) is enabled.")
+    else:
+        logs.append("✅ Temporary address is disabled.")
+    interfaces = {a["interface"] for a in addresses} - {"lo"}
+    if any(_slaac_enabled(interface) for interface in sorted(interfaces)):
+        logs.append("⚠ SLAAC (Stateless Address Autoconfiguration) is enabled.")
+    else:
+        logs.append("✅ SLAAC is disabled.")
+    return logs
+
 
-    logs.append("\n📡 Sending ICMPv6 Pings:")
+# ---------------- SUB-PROBES ----------------
+# Each takes the shared deadline and returns {"logs": [...]} plus any extra result keys
+
+def _probe_dns(deadline):
     try:
-        cmd = ["ping", "-6", "-c", "2", "ipv6.google.com"]
-        res = subprocess.run(cmd, capture_output=True, text=True)
-        logs.append(res.stdout.strip())
+        res = _run(["nslookup", "ipv6.google.com"], deadline)
+        if "Address" in res.stdout:
+            return {"logs": ["✔ DNS query completed successfully."]}
+        return {"logs": ["⚠ DNS response issue detected."]}
     except Exception as e:
-        logs.append(f"⚠ ICMPv6 error: {e}")
+        return {"logs": [f"⚠ nslookup error: {e}"]}
 
-    logs.append("\n🚧 NAT64 Detection:")
+
+def _probe_nat64(deadline):
+    test_domain = "ipv4only.arpa"
     try:
-        test_domain = "ipv4only.arpa"
-        res = subprocess.run(["dig", test_domain, "AAAA"], capture_output=True, text=True)
+        res = _run(["dig", test_domain, "AAAA"], deadline)
         if "AAAA" in res.stdout:
-            logs.append(f"✔ AAAA record for {test_domain} found; NAT64 is active.")
-        else:
-            logs.append("⚠ No AAAA record; NAT64 might be inactive or unavailable.")
+            return {"logs": [f"✔ AAAA record for {test_domain} found; NAT64 is active."]}
+        return {"logs": ["⚠ No AAAA record; NAT64 might be inactive or unavailable."]}
     except Exception as e:
-        logs.append(f"⚠ NAT64 detection error: {e}")
+        return {"logs": [f"⚠ NAT64 detection error: {e}"]}
+
 
-    logs.append("\n📶 IPv6 Connection Quality (Ping Test)...")
+def _probe_ping(deadline):
+    logs = []
     try:
-        is_windows = platform.system().lower() == "windows"
-        for i in range(5):
-            cmd = ["ping", "-n", "1", "ipv6.google.com"] if is_windows else ["ping", "-6", "-c", "1", "ipv6.google.com"]
-            res = subprocess.run(cmd, capture_output=True, text=True)
-            output = res.stdout
-            if "time=" in output or "زمان=" in output:
-                match = re.search(r"time[=<]\s*(\d+(\.\d+)?)", output)
-                if match:
-                    time_ms = float(match.group(1))
-                    latency_results.append(time_ms)
-                    logs.append(f"✅ Reply received: {time_ms:.2f} ms")
-            else:
-                logs.append("❌ No reply received.")
-        if latency_results:
-            avg_latency = mean(latency_results)
-            logs.append(f"📊 Average Latency: {avg_latency:.2f} ms")
-            plt.figure()
-            plt.plot(latency_results, marker='o', label="Latency (ms)")
-            plt.title("IPv6 Latency")
-            plt.xlabel("Attempt")
-            plt.ylabel("ms")
-            plt.legend()
-            chart_path = "/mnt/data/ipv6_latency_chart.png"
-            plt.savefig(chart_path)
-            plt.close()
+        # Both test hosts at once; the first one's packets go into the log and the chart
+        pings = ping_hosts([hostname for hostname, _ in TEST_HOSTS], count=5, interval=0.2,
+                           timeout=_remaining(deadline, 1.0), family=socket.AF_INET6)
+        for hostname, _ in TEST_HOSTS:
+            log_ping(logs.append, pings[hostname], packets=hostname == TEST_HOSTS[0][0])
+        primary = pings[TEST_HOSTS[0][0]]
+        return {"logs": logs, "latency": primary["stats"],
+                "latencies": [p["rtt"] for p in primary["packets"] if p["rtt"] is not None]}
     except Exception as e:
-        logs.append(f"⚠ Ping error: {e}")
+        return {"logs": logs + [f"⚠ Ping error: {e}"]}
 
-    logs.append("\n🔉 Running IPv6 Traceroute:")
-    if shutil.which("traceroute"):
-        try:
-            res = subprocess.run(["traceroute", "-6", "ipv6.google.com"], capture_output=True, text=True, timeout=10)
-            traceroute_output = res.stdout.strip()
-        except Exception as e:
-            traceroute_output = f"⚠ Traceroute error: {e}"
-    else:
-        traceroute_output = "⚠ 'traceroute' is not installed on this system."
 
-    logs.append("\n🛡 IPv6 Firewall Status:")
-    if shutil.which("ip6tables"):
-        try:
-            res = subprocess.run(["ip6tables", "-L"], capture_output=True, text=True, timeout=5)
-            firewall_status = res.stdout.strip()
-        except Exception as e:
-            firewall_status = f"⚠ ip6tables error: {e}"
-    else:
-        firewall_status = "⚠ ip6tables is not available on this system."
+def _probe_traceroute(deadline):
+    if not shutil.which("traceroute"):
+        return {"logs": [], "traceroute": "⚠ 'traceroute' is not installed on this system."}
+    try:
+        return {"logs": [], "traceroute": _run(["traceroute", "-6", "ipv6.google.com"], deadline, 10).stdout.strip()}
+    except Exception as e:
+        return {"logs": [], "traceroute": f"⚠ Traceroute error: {e}"}
+
 
-    logs.append("\n🔐 IPv6 Security Check:")
+def _probe_firewall(deadline):
+    if not shutil.which("ip6tables"):
+        return {"logs": [], "firewall": "⚠ ip6tables is not available on this system."}
     try:
-        res = subprocess.run(["ip", "-6", "addr", "show"], capture_output=True, text=True)
-        public_count = len(re.findall(r'inet6 ([0-9a-f:]+)/(?:\d+)\s+scope global', res.stdout))
-        link_local_count = len(re.findall(r'inet6 ([0-9a-f:]+)/(?:\d+)\s+scope link', res.stdout))
-        logs.append(f"🌐 Number of public addresses: {public_count}")
-        logs.append(f"🔗 Number of link-local addresses: {link_local_count}")
-
-        if "temporary" in res.stdout:
-            logs.append("⚠ Temporary address (privacy extension) is enabled.")
-        else:
-            logs.append("✅ Temporary address is disabled.")
+        return {"logs": [], "firewall": _run(["ip6tables", "-L"], deadline, 5).stdout.strip()}
+    except Exception as e:
+        return {"logs": [], "firewall": f"⚠ ip6tables error: {e}"}
+
 
-        if "autoconf" in res.stdout:
-            logs.append("⚠ SLAAC (Stateless Address Autoconfiguration) is enabled.")
+def _probe_radvdump(deadline):
+    if not shutil.which("radvdump"):
+        return {"logs": ["⚠ radvdump is not installed."]}
+    logs = ["🔎 Checking RA via radvdump..."]
+    try:
+        if _run(["radvdump", "-n", "-p"], deadline, 5).stdout.strip():
+            logs.append("⚠ Router Advertisements (RA) detected. Security review recommended.")
         else:
-            logs.append("✅ SLAAC is disabled.")
+            logs.append("✅ No suspicious RA found.")
     except Exception as e:
-        logs.append(f"⚠ Address inspection error: {e}")
+        logs.append(f"⚠ radvdump error: {e}")
+    return {"logs": logs}
 
-    if shutil.which("radvdump"):
-        try:
-            logs.append("🔎 Checking RA via radvdump...")
-            res = subprocess.run(["radvdump", "-n", "-p"], capture_output=True, text=True, timeout=5)
-            if res.stdout.strip():
-                logs.append("⚠ Router Advertisements (RA) detected. Security review recommended.")
-            else:
-                logs.append("✅ No suspicious RA found.")
-        except Exception as e:
-            logs.append(f"⚠ radvdump error: {e}")
-    else:
-        logs.append("⚠ radvdump is not installed.")
 
-    logs.append("🧪 Scanning open ports on IPv6 localhost (::1):")
+def _probe_local_ports(deadline):
     open_ports = []
     for port in [22, 80, 443, 8080, 8443]:
         try:
             with socket.socket(socket.AF_INET6, socket.SOCK_STREAM) as s:
-                s.settimeout(0.5)
+                s.settimeout(_remaining(deadline, 0.5))
                 if s.connect_ex(("::1", port)) == 0:
                     open_ports.append(port)
         except:
             continue
     if open_ports:
-        logs.append(f"⚠ Open ports detected on ::1: {open_ports}")
-    else:
-        logs.append("✅ No suspicious ports found on ::1.")
+        return {"logs": [f"⚠ Open ports detected on ::1: {open_ports}"]}
+    return {"logs": ["✅ No suspicious ports found on ::1."]}
 
-    logs.append("🔐 Checking IPsec Configuration:")
-    if shutil.which("ipsec"):
+
+def _probe_ipsec(deadline):
+    if not shutil.which("ipsec"):
+        return {"logs": ["ℹ IPsec tool is not installed."]}
+    try:
+        res = _run(["ipsec", "status"], deadline, 5)
+        if "INSTALLED" in res.stdout or "ESTABLISHED" in res.stdout:
+            return {"logs": ["✔ IPsec connection is active."]}
+        return {"logs": ["ℹ IPsec is installed but no active connection found."]}
+    except Exception as e:
+        return {"logs": [f"⚠ IPsec status error: {e}"]}
+
+
+def _plot_latency(latencies):
+    fig = new_figure()
+    ax = fig.subplots()
+    ax.plot(latencies, marker='o', label="Latency (ms)")
+    ax.set_title("IPv6 Latency")
+    ax.set_xlabel("Attempt")
+    ax.set_ylabel("ms")
+    ax.legend()
+    chart_path = "/mnt/data/ipv6_latency_chart.png"
+    fig.savefig(chart_path)
+    return chart_path
+
+
+def check_ipv6_support(deadline=DEADLINE):
+    start = time.monotonic()
+    deadline_at = start + deadline
+    logs = ["🔍 Checking IPv6 support..."]
+
+    with ThreadPoolExecutor(max_workers=len(TEST_HOSTS)) as pool:
+        attempts = [pool.submit(_connect, hostname, fallback_ip, CONNECT_TIMEOUT) for hostname, fallback_ip in TEST_HOSTS]
+        attempts = [attempt.result() for attempt in attempts]
+    supported = any(ok for _, ok in attempts)
+    logs.append("🟢 IPv6 Connectivity: Active ✅" if supported else "🔴 IPv6 Connectivity: Inactive ❌")
+    logs += [line for line, _ in attempts]
+
+    if not supported:
+        logs.append("❌ IPv6 is not supported.")
+        return {"logs": logs, "chart_path": None, "traceroute": "", "firewall": "", "supported": False,
+                "latencies": [], "latency": SampleBuffer().stats()}
+
+    # Log sections in their usual order; the network-bound ones are filled in by the pool
+    addresses = read_ipv6_addresses()
+    sections = [
+        ("\n📥 Local IPv6 Addresses:", _local_addresses(addresses)),
+        ("\n🔎 Checking DNS Leak over IPv6:", _probe_dns),
+        ("\n📊 Detecting Static vs Dynamic Addresses:", _address_types(addresses)),
+        ("\n🚧 NAT64 Detection:", _probe_nat64),
+        ("\n📶 IPv6 Connection Quality (Ping Test)...", _probe_ping),
+        ("\n🔉 Running IPv6 Traceroute:", _probe_traceroute),
+        ("\n🛡 IPv6 Firewall Status:", _probe_firewall),
+        ("\n🔐 IPv6 Security Check:", _security_check(addresses)),
+        (None, _probe_radvdump),
+        ("🧪 Scanning open ports on IPv6 localhost (::1):", _probe_local_ports),
+        ("🔐 Checking IPsec Configuration:", _probe_ipsec)
+    ]
+    probes = [probe for _, probe in sections if callable(probe)]
+    pool = ThreadPoolExecutor(max_workers=len(probes))
+    futures = {probe: pool.submit(probe, deadline_at) for probe in probes}
+    wait(futures.values(), timeout=max(0.0, deadline_at - time.monotonic()) + 0.25)  # Let subprocess timeouts report
+    pool.shutdown(wait=False)
+
+    result = {"traceroute": "", "firewall": "", "latencies": [], "latency": SampleBuffer().stats()}
+    for title, probe in sections:
+        if title:
+            logs.append(title)
+        if not callable(probe):
+            logs += probe
+            continue
+        future = futures[probe]
+        if not future.done():
+            logs.append(f"⏱ No result within the {deadline:.0f} s deadline.")
+            continue
+        if future.exception():
+            logs.append(f"⚠ Error: {future.exception()}")
+            continue
+        outcome = future.result()
+        logs += outcome.pop("logs")
+        result.update(outcome)
+
+    chart_path = None
+    if result["latencies"] and charts_enabled():
         try:
-            res = subprocess.run(["ipsec", "status"], capture_output=True, text=True)
-            if "INSTALLED" in res.stdout or "ESTABLISHED" in res.stdout:
-                logs.append("✔ IPsec connection is active.")
-            else:
-                logs.append("ℹ IPsec is installed but no active connection found.")
+            chart_path = _plot_latency(result["latencies"])
         except Exception as e:
-            logs.append(f"⚠ IPsec status error: {e}")
-    else:
-        logs.append("ℹ IPsec tool is not installed.")
-
-    return {
-        "logs": logs,
-        "chart_path": chart_path,
-        "traceroute": traceroute_output,
-        "firewall": firewall_status
-    }
+            logs.append(f"⚠ Chart error: {e}")
+    logs.append(f"⏱ IPv6 check finished in {time.monotonic() - start:.1f} s")
+
+    result.update({"logs": logs, "chart_path": chart_path, "supported": True})
+    return result
@@ -0,0 +1,226 @@
+import errno
+import selectors
+import socket
+import struct
+
+from utils.measure import SampleBuffer, now_ns
+
+# In-process ping engine. Echo requests go out on unprivileged ICMP datagram sockets
+# (Linux with net.ipv4.ping_group_range covering our group, macOS); where the kernel
+# refuses those, each probe is a non-blocking TCP connect instead, and a SYN-ACK or
+# RST counts as the reply. All targets share one selector loop, so pinging ten hosts
+# takes as long as pinging one.
+
+ICMP_ECHO = {socket.AF_INET: (8, 0), socket.AF_INET6: (128, 129)}  # family -> (request, reply) type
+ICMP_PROTO = {socket.AF_INET: socket.IPPROTO_ICMP, socket.AF_INET6: socket.IPPROTO_ICMPV6}
+_HEADER = struct.Struct("!BBHHH")
+_STAMP = struct.Struct("!Q")
+PAYLOAD_SIZE = 56
+TCP_PORT = 443
+
+_icmp_support = {}
+
+def icmp_available(family):
+    """True if this process may open an unprivileged ICMP socket for `family` (cached)"""
+    if family not in _icmp_support:
+        try:
+            socket.socket(family, socket.SOCK_DGRAM, ICMP_PROTO[family]).close()
+            _icmp_support[family] = True
+        except (OSError, AttributeError):
+            _icmp_support[family] = False
+    return _icmp_support[family]
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def _echo_request(family, seq, sent_ns):
+    payload = _STAMP.pack(sent_ns).ljust(PAYLOAD_SIZE, b"\x5a")
+    request_type = ICMP_ECHO[family][0]
+    # The kernel replaces the identifier with the socket's own and fills in the IPv6 checksum
+    checksum = _checksum(_HEADER.pack(request_type, 0, 0, 0, seq) + payload)
+    return _HEADER.pack(request_type, 0, checksum, 0, seq) + payload
+
+def _new_target(host, count):
+    return {"host": host, "address": None, "method": None, "error": None,
+            "packets": [{"seq": seq, "sent": None, "rtt": None} for seq in range(1, count + 1)]}
+
+def ping_hosts(hosts, count=5, interval=0.2, timeout=1.0, family=socket.AF_UNSPEC, method="auto", tcp_port=TCP_PORT):
+    """Send `count` probes, `interval` seconds apart, to every host at once.
+
+    method is "icmp", "tcp" or "auto" (ICMP if the kernel allows it, else TCP). Returns
+    {host: {"host", "address", "method", "error", "packets", "stats"}} where packets holds
+    the per-probe send time (perf_counter ns) and RTT in ms (None if lost), and stats is
+    the SampleBuffer summary.
+    """
+    targets = []
+    for host in hosts:
+        target = _new_target(host, count)
+        targets.append(target)
+        try:
+            info = socket.getaddrinfo(host, tcp_port, family, socket.SOCK_STREAM)[0]
+        except OSError as e:
+            target["error"] = f"resolve: {e}"
+            continue
+        target["family"], target["sockaddr"] = info[0], info[4]
+        target["address"] = info[4][0]
+        use_icmp = method == "icmp" or (method == "auto" and icmp_available(info[0]))
+        target["method"] = "icmp" if use_icmp else "tcp"
+
+    active = [t for t in targets if t["address"]]
+    if active:
+        _run(active, count, interval, timeout)
+    for target in targets:
+        buffer = SampleBuffer()
+        for packet in target["packets"]:
+            if packet["rtt"] is not None:
+                buffer.add(packet["rtt"])
+            else:
+                buffer.lost()
+        target["stats"] = buffer.stats()
+        target.pop("family", None)
+        target.pop("sockaddr", None)
+    return {target["host"]: target for target in targets}
+
+def ping(host, count=5, interval=0.2, timeout=1.0, family=socket.AF_UNSPEC, method="auto", tcp_port=TCP_PORT):
+    return ping_hosts([host], count, interval, timeout, family, method, tcp_port)[host]
+
+def _run(targets, count, interval, timeout):
+    selector = selectors.DefaultSelector()
+    sockets = {}  # target index -> ICMP socket
+    for index, target in enumerate(targets):
+        if target["method"] == "icmp":
+            try:
+                sock = socket.socket(target["family"], socket.SOCK_DGRAM, ICMP_PROTO[target["family"]])
+            except OSError as e:
+                target["error"] = f"icmp: {e}"
+                continue
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ, index)
+            sockets[index] = sock
+
+    # Stagger targets across the interval so their probes don't leave in bursts
+    start = now_ns()
+    interval_ns = int(interval * 1e9)
+    stagger_ns = interval_ns // len(targets)
+    schedule = sorted((start + seq * interval_ns + index * stagger_ns, index, seq)
+                      for index in range(len(targets)) for seq in range(count))
+    timeout_ns = int(timeout * 1e9)
+    pending = {}  # (index, seq) for ICMP or socket for TCP -> (index, seq, sent_ns), in send order
+    next_probe = 0
+    try:
+        while next_probe < len(schedule) or pending:
+            now = now_ns()
+            while next_probe < len(schedule) and schedule[next_probe][0] <= now:
+                _, index, seq = schedule[next_probe]
+                next_probe += 1
+                _send(targets[index], index, seq, sockets.get(index), selector, pending)
+                now = now_ns()
+
+            expired = []
+            for key, (_, _, sent_ns) in pending.items():
+                if now - sent_ns < timeout_ns:
+                    break
+                expired.append(key)
+            for key in expired:
+                del pending[key]
+                if isinstance(key, socket.socket):
+                    selector.unregister(key)
+                    key.close()
+
+            waits = [timeout_ns - (now - next(iter(pending.values()))[2])] if pending else []
+            if next_probe < len(schedule):
+                waits.append(schedule[next_probe][0] - now)
+            for key, _ in selector.select(max(0, min(waits, default=0)) / 1e9):
+                received_ns = now_ns()
+                if isinstance(key.data, int):
+                    _receive_icmp(key.fileobj, targets[key.data], key.data, pending, received_ns)
+                else:
+                    _receive_tcp(key.fileobj, targets, pending, selector, received_ns)
+    finally:
+        for key in pending:
+            if isinstance(key, socket.socket):
+                key.close()
+        for sock in sockets.values():
+            sock.close()
+        selector.close()
+
+def _send(target, index, seq, icmp_sock, selector, pending):
+    packet = target["packets"][seq]
+    if target["method"] == "icmp":
+        if icmp_sock is None:
+            return
+        sent_ns = now_ns()
+        try:
+            icmp_sock.sendto(_echo_request(target["family"], packet["seq"], sent_ns), target["sockaddr"])
+        except OSError:
+            packet["sent"] = sent_ns
+            return  # Counted as lost
+        pending[(index, packet["seq"])] = (index, seq, sent_ns)
+    else:
+        sock = socket.socket(target["family"], socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sent_ns = now_ns()
+        code = sock.connect_ex(target["sockaddr"])
+        if code in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+            selector.register(sock, selectors.EVENT_WRITE, (index, seq))
+            pending[sock] = (index, seq, sent_ns)
+        else:
+            if code in (0, errno.ECONNREFUSED):  # Loopback can answer before connect_ex returns
+                packet["rtt"] = (now_ns() - sent_ns) / 1e6
+            sock.close()
+    packet["sent"] = sent_ns
+
+# Linux matches replies to the socket by echo identifier, macOS hands every ICMP
+# datagram socket all echo replies, so the source address must match too
+def _receive_icmp(sock, target, index, pending, received_ns):
+    reply_type = ICMP_ECHO[target["family"]][1]
+    address = target["address"].split("%")[0]
+    while True:
+        try:
+            data, source = sock.recvfrom(2048)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            return  # ICMP errors (unreachable etc.) surface here; the probe times out
+        if source[0].split("%")[0] != address:
+            continue
+        if data and data[0] >> 4 == 4 and target["family"] == socket.AF_INET:
+            data = data[(data[0] & 0x0F) * 4:]  # macOS includes the IPv4 header
+        if len(data) < _HEADER.size:
+            continue
+        icmp_type, _, _, _, seq = _HEADER.unpack_from(data)
+        entry = pending.pop((index, seq), None) if icmp_type == reply_type else None
+        if entry is not None:
+            _, position, sent_ns = entry
+            target["packets"][position]["rtt"] = (received_ns - sent_ns) / 1e6
+
+def _receive_tcp(sock, targets, pending, selector, received_ns):
+    selector.unregister(sock)
+    entry = pending.pop(sock, None)
+    error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+    sock.close()
+    if entry is not None and error in (0, errno.ECONNREFUSED):
+        index, position, sent_ns = entry
+        targets[index]["packets"][position]["rtt"] = (received_ns - sent_ns) / 1e6
+
+def log_ping(log, result, packets=True):
+    """Per-packet lines (optional) and a summary line for one ping_hosts() entry"""
+    if result["error"] and not result["stats"]["received"]:
+        log(f"❌ {result['host']}: {result['error']}")
+        return
+    if packets:
+        for packet in result["packets"]:
+            if packet["rtt"] is not None:
+                log(f"✅ Reply from {result['address']}: seq={packet['seq']} time={packet['rtt']:.2f} ms")
+            else:
+                log(f"❌ No reply from {result['address']}: seq={packet['seq']}")
+    stats = result["stats"]
+    summary = (f"median {stats['median']:.2f} | p95 {stats['p95']:.2f} | jitter {stats['jitter']:.2f} ms"
+               if stats["received"] else "no replies")
+    log(f"📊 {result['host']} ({result['method']}): {summary} | loss {stats['loss']:.0f}% "
+        f"({stats['received']}/{stats['sent']})")
@@ -1,47 +1,104 @@
+import asyncio
+import errno
+import ipaddress
+import os
+import selectors
 import socket
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def run_port_scan(log, target_host="127.0.0.1", timeout=0.5):
+from config import SETTINGS
+from scanner.fingerprint import describe_service, fingerprint_ports_async
+from scanner.port_state import PortStateStore
+from scanner.targets import expand_targets, parse_ports
+from scanner.timing import TimingModel
+from utils.ip_intel import describe_ip
+from utils.measure import SampleBuffer, now_ns
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+OPEN = "open"
+CLOSED = "closed"
+FILTERED = "filtered"
+
+DEFAULT_PORTS = range(0, 1024)  # Use range(0, 65536) for a full scan
+DEFAULT_CONCURRENCY = 500
+LOOPBACK_CONCURRENCY = 100
+DEFAULT_RETRIES = 1  # Extra attempts for ports that did not answer
+DEFAULT_SLICE = 4096  # Ports of the wider range re-checked per incremental run
+CLOSED_ERRNOS = {errno.ECONNREFUSED, 10061}
+IN_PROGRESS_ERRNOS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN, 10035}
+EXACT_SLACK_NS = 500_000  # Timing uncertainty always tolerated for an RTT sample
+
+# Entry point for the GUI, CLI and scheduler. `targets` ("10.0.0.0/24, host.example") and
+# `ports` ("22,80,8000-8100") default to SETTINGS["port_scan"]; several hosts are swept
+# with run_multi_host_scan and come back as {"hosts": {host: scan}, "duration"}.
+# incremental=True re-checks each host's known-open ports plus a rotating slice instead.
+def run_configured_scan(log, targets=None, ports=None, incremental=None):
+    settings = SETTINGS.get("port_scan", {})
+    hosts = expand_targets(targets or settings.get("targets") or "127.0.0.1")
+    port_list = parse_ports(ports or settings.get("ports") or "0-1023")
+    if incremental is None:
+        incremental = settings.get("incremental", False)
+    if not hosts:
+        raise ValueError("No targets to scan")
+    if incremental:
+        store = PortStateStore()
+        scans = {}
+        for host in hosts:
+            try:
+                scans[host] = run_incremental_scan(log, host, port_list, store=store)
+            except OSError as e:
+                if len(hosts) == 1:
+                    raise
+                log(f"⚠ {host}: {e}")
+                scans[host] = {"host": host, "error": str(e), "duration": 0}
+    elif len(hosts) == 1:
+        return run_port_scan(log, hosts[0], ports=port_list)
+    else:
+        scans = run_multi_host_scan(log, hosts, ports=port_list)
+    if len(hosts) == 1:
+        return scans[hosts[0]]
+    return {"hosts": scans, "duration": max((scan["duration"] for scan in scans.values()), default=0)}
+
+def run_port_scan(log, target_host="127.0.0.1", timeout=None, ports=DEFAULT_PORTS,
+                  concurrency=DEFAULT_CONCURRENCY):
     log(f"🔍 Starting TCP port scan on {target_host}...")
 
-    open_ports = []
-    closed_ports = []
-    timeout_ports = []
-    banner_results = []
-    port_range = range(0, 1024)  # Can be extended to 65535
-
-    for port in port_range:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(timeout)
-            start_time = time.time()
-            result = sock.connect_ex((target_host, port))
-            response_time = (time.time() - start_time) * 1000  # milliseconds
-
-            if result == 0:
-                log(f"[OPEN] Port {port} is open (⏱ {response_time:.2f} ms)")
-                banner = grab_banner(sock)
-                open_ports.append((port, response_time, banner))
-                if banner:
-                    banner_results.append((port, banner.strip()))
-            elif result == 111 or result == 10061:
-                closed_ports.append(port)
-            else:
-                timeout_ports.append(port)
+    def on_result(result):
+        if result["state"] == OPEN:
+            log(f"[OPEN] Port {result['port']} is open (⏱ {result['rtt']:.2f} ms)")
+
+    scan = scan_ports(target_host, ports, timeout=timeout, concurrency=concurrency, on_result=on_result)
+    open_ports = [r for r in scan["results"] if r["state"] == OPEN]
+    banner_results = [(r["port"], r["banner"].strip()) for r in open_ports if r["banner"]]
 
     # 📊 Result Summary
     log("\n📊 Scan Summary:")
-    log(f" - Total ports scanned: {len(port_range)}")
+    log(f" - Total ports scanned: {len(scan['results'])}")
     log(f" - Open ports: {len(open_ports)}")
-    log(f" - Closed ports: {len(closed_ports)}")
-    log(f" - No response (timeout): {len(timeout_ports)}")
+    log(f" - Closed ports: {len(scan['closed'])}")
+    log(f" - No response (timeout): {len(scan['filtered'])}")
+    log(f" - Scan duration: {scan['duration']:.2f} s")
+    timing = scan["timing"]
+    if timing["srtt"] is not None:
+        log(f" - Smoothed RTT: {timing['srtt']:.2f} ms (±{timing['rttvar']:.2f}) | "
+            f"probe timeout {timing['timeout']:.0f} ms | drops {timing['drops']}")
+    if scan["rtt"]["received"]:
+        log(f" - Handshake RTT: min {scan['rtt']['min']:.2f} | median {scan['rtt']['median']:.2f} | "
+            f"p95 {scan['rtt']['p95']:.2f} | max {scan['rtt']['max']:.2f} ms ({scan['rtt']['received']} replies)")
 
     # 🔓 Open Port Details
     if open_ports:
         log("\n🔓 List of Open Ports:")
-        for port, resp_time, banner in open_ports:
-            log(f"  → Port {port} | Response in {resp_time:.2f} ms")
-            if banner:
-                log(f"     ⚡ Detected Service: {banner.strip()}")
+        for r in open_ports:
+            log(f"  → Port {r['port']} | Response in {r['rtt']:.2f} ms")
+            if r["banner"]:
+                log(f"     ⚡ Detected Service: {describe_service(r['service'])}")
             else:
                 log("     ⚠️ Unknown service (no banner received)")
     else:
@@ -55,11 +112,366 @@ def run_port_scan(log, target_host="127.0.0.1", timeout=0.5):
     else:
         log("\nℹ️ No service banners were captured.")
 
-def grab_banner(sock):
+    return scan
+
+# ---------------- INCREMENTAL ----------------
+def run_incremental_scan(log, target_host="127.0.0.1", ports=DEFAULT_PORTS, slice_size=DEFAULT_SLICE,
+                         timeout=None, concurrency=DEFAULT_CONCURRENCY, store=None):
+    """Re-check known-open ports plus a rotating slice of the range and report only what changed"""
+    store = store or PortStateStore()
+    ports = list(ports)
+    port_set = set(ports)
+    known_open = [p for p in store.known_open(target_host) if p in port_set]
+    rotating = store.next_slice(target_host, ports, slice_size)
+    log(f"🔁 Incremental scan on {target_host}: {len(known_open)} known-open ports + "
+        f"{len(rotating)}/{len(ports)} rotating ports...")
+
+    scan = scan_ports(target_host, sorted(known_open + rotating), timeout=timeout, concurrency=concurrency)
+    changes = store.apply(target_host, scan["results"])
+    store.save()
+
+    for r in changes["opened"]:
+        log(f"🆕 Port {r['port']} is newly open ({describe_service(r['service']) or 'unknown service'})")
+    for r in changes["closed"]:
+        log(f"🔒 Port {r['port']} is no longer open (was {r['previous_service'] or 'unknown service'})")
+    for r in changes["changed"]:
+        log(f"🔄 Port {r['port']} service changed: {r['previous_service'] or 'unknown'} → "
+            f"{describe_service(r['service']) or 'unknown'}")
+    if not any(changes.values()):
+        log("✅ No changes since the last scan.")
+    log(f"📊 Probed {len(scan['results'])} ports in {scan['duration']:.2f} s | "
+        f"{len(store.known_open(target_host))} ports currently known open")
+
+    scan["changes"] = changes
+    return scan
+
+# Synchronous entry point for the async engine (safe to call from worker threads)
+def scan_ports(target_host, ports=DEFAULT_PORTS, timeout=None, concurrency=DEFAULT_CONCURRENCY,
+               on_result=None, fingerprint=True):
+    return _run_loop(scan_ports_async(target_host, ports, timeout, concurrency, on_result, fingerprint))
+
+async def scan_ports_async(target_host, ports=DEFAULT_PORTS, timeout=None, concurrency=DEFAULT_CONCURRENCY,
+                           on_result=None, fingerprint=True):
+    scans = await scan_hosts_async([target_host], ports, timeout, concurrency, on_result, fingerprint)
+    scan = scans[target_host]
+    if scan.get("error"):
+        raise OSError(scan["error"])
+    return scan
+
+async def scan_hosts_async(hosts, ports=DEFAULT_PORTS, timeout=None, concurrency=DEFAULT_CONCURRENCY,
+                           on_result=None, fingerprint=True, max_retries=DEFAULT_RETRIES):
+    """Keep up to `concurrency` non-blocking connects in flight over every host x port pair.
+
+    With timeout=None each host gets an adaptive TimingModel; a number pins the probe timeout.
+    Ports that stay silent are retried up to `max_retries` times before being marked filtered.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    scans = {}
+    resolved = []
+    for host in hosts:
+        scans[host] = {"host": host, "address": None, "results": [], "error": None}
+        try:
+            infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+            family, _, _, _, sockaddr = infos[0]
+            scans[host]["address"] = sockaddr[0]
+            resolved.append((host, family, sockaddr))
+        except OSError as e:
+            scans[host]["error"] = f"Could not resolve {host}: {e}"
+
+    # Loopback answers in microseconds, so a deep queue only adds event-loop overhead
+    if resolved and all(ipaddress.ip_address(sockaddr[0].split("%")[0]).is_loopback for _, _, sockaddr in resolved):
+        concurrency = min(concurrency, LOOPBACK_CONCURRENCY)
+    concurrency = max(1, min(concurrency, _available_sockets(), len(ports) * max(1, len(hosts))))
+    targets = []
+    for host, family, sockaddr in resolved:
+        timing = TimingModel(concurrency) if timeout is None else \
+            TimingModel(concurrency, initial_timeout=timeout, min_timeout=timeout, max_timeout=timeout)
+        targets.append((host, family, sockaddr, timing))
+
+    # Port-major order spreads the load over all hosts instead of hammering one at a time
+    pairs = ((target, port, 0) for port in ports for target in targets)
+    retries = deque()
+    pending = 0
+    idle = 0
+    probe_done = asyncio.Condition()
+
+    def next_probe():
+        if retries:
+            return retries.popleft()
+        return next(pairs, None)
+
+    async def worker():
+        nonlocal pending, idle
+        while True:
+            probe = next_probe()
+            if probe is None:
+                if not pending:
+                    return
+                # Probes still in flight may schedule retries; wait for one to finish
+                idle += 1
+                try:
+                    async with probe_done:
+                        await probe_done.wait_for(lambda: retries or not pending)
+                finally:
+                    idle -= 1
+                continue
+
+            (host, family, sockaddr, timing), port, attempt = probe
+            pending += 1
+            await timing.acquire()
+            try:
+                result = await _probe_port(loop, family, sockaddr, port, timing, attempt)
+            finally:
+                await timing.release()
+                pending -= 1
+
+            if result["state"] == FILTERED and attempt < max_retries:
+                retries.append(((host, family, sockaddr, timing), port, attempt + 1))
+            else:
+                result["host"] = host
+                result["attempts"] = attempt + 1
+                scans[host]["results"].append(result)
+                if on_result:
+                    on_result(result)
+            if idle:
+                async with probe_done:
+                    probe_done.notify_all()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    # Second stage: identify services on every open port found by the sweep
+    if fingerprint:
+        await asyncio.gather(*(_fingerprint_host(scans[host], sockaddr[0], timing)
+                               for host, _, sockaddr, timing in targets))
+
+    duration = time.perf_counter() - start
+    for host, _, _, timing in targets:
+        scans[host]["timing"] = timing.summary()
+    for scan in scans.values():
+        _summarize(scan, duration)
+    return scans
+
+async def _fingerprint_host(scan, address, timing):
+    open_results = {r["port"]: r for r in scan["results"] if r["state"] == OPEN}
+    if not open_results:
+        return
+    services = await fingerprint_ports_async(address, list(open_results), timing.banner_timeout())
+    for port, fp in services.items():
+        open_results[port]["banner"] = fp["banner"]
+        open_results[port]["service"] = fp
+
+def _summarize(scan, duration):
+    scan["results"].sort(key=lambda r: r["port"])
+    scan["open"] = [r["port"] for r in scan["results"] if r["state"] == OPEN]
+    scan["closed"] = [r["port"] for r in scan["results"] if r["state"] == CLOSED]
+    scan["filtered"] = [r["port"] for r in scan["results"] if r["state"] == FILTERED]
+    scan["services"] = {r["port"]: r["service"] for r in scan["results"] if r["service"]}
+    scan["duration"] = duration
+    # Open (SYN-ACK) and closed (RST) answers are both handshake round trips; only
+    # the ones timed without event-loop lag are comparable with the other tests
+    rtts = SampleBuffer()
+    for r in scan["results"]:
+        if r["rtt"] is not None and r.get("exact"):
+            rtts.add(r["rtt"])
+    scan["rtt"] = rtts.stats()
+    return scan
+
+# ---------------- MULTI-HOST ----------------
+def run_multi_host_scan(log, targets, ports=DEFAULT_PORTS, timeout=None, concurrency=DEFAULT_CONCURRENCY,
+                        workers=None):
+    hosts = expand_targets(targets)
+    log(f"🌐 Starting TCP port scan on {len(hosts)} hosts x {len(ports)} ports...")
+    if not hosts:
+        log("⚠ No valid targets to scan.")
+        return {}
+
+    def on_shard(shard_scans):
+        for scan in shard_scans.values():
+            for r in scan["results"]:
+                if r["state"] == OPEN:
+                    log(f"[OPEN] {r['host']}:{r['port']} is open (⏱ {r['rtt']:.2f} ms)")
+
+    scans = scan_hosts_sharded(hosts, ports, timeout, concurrency, workers, on_shard=on_shard)
+
+    log("\n📊 Scan Summary:")
+    for host, scan in scans.items():
+        if scan["error"]:
+            log(f" - {host}: ⚠ {scan['error']}")
+        elif scan["open"]:
+            network = describe_ip(scan["address"] or host)
+            log(f" - {host}{f' [{network}]' if network else ''}: open {scan['open']} | closed {len(scan['closed'])} | "
+                f"no response {len(scan['filtered'])}")
+    responsive = sum(1 for scan in scans.values() if scan["open"] or scan["closed"])
+    log(f" - Hosts scanned: {len(scans)} ({responsive} responded)")
+    log(f" - Open ports: {sum(len(scan['open']) for scan in scans.values())}")
+    return scans
+
+def scan_hosts_sharded(hosts, ports=DEFAULT_PORTS, timeout=None, concurrency=DEFAULT_CONCURRENCY,
+                       workers=None, fingerprint=True, on_shard=None):
+    """Split the host x port work across worker processes, each with its own event loop"""
+    workers = max(1, min(workers or os.cpu_count() or 1, len(hosts) * len(ports)))
+    shards = _make_shards(hosts, ports, workers)
+    per_worker = max(1, concurrency // min(workers, len(shards)))
+
+    scans = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+        futures = [pool.submit(_scan_shard, shard_hosts, shard_ports, timeout, per_worker, fingerprint)
+                   for shard_hosts, shard_ports in shards]
+        for future in as_completed(futures):
+            shard_scans = future.result()
+            if on_shard:
+                on_shard(shard_scans)
+            for host, scan in shard_scans.items():
+                merged = scans.setdefault(host, {"host": host, "address": scan["address"], "results": [],
+                                                 "error": None, "duration": 0})
+                merged["results"].extend(scan["results"])
+                merged["error"] = merged["error"] or scan["error"]
+                merged["duration"] = max(merged["duration"], scan["duration"])
+                merged["timing"] = scan.get("timing") or merged.get("timing")
+
+    for host in hosts:
+        _summarize(scans[host], scans[host]["duration"])
+    return {host: scans[host] for host in hosts}
+
+# Enough shards to keep every worker busy; split the port range when there are few hosts
+def _make_shards(hosts, ports, workers):
+    if len(hosts) >= workers:
+        return [(hosts[i::workers], ports) for i in range(workers)]
+    port_slices = max(1, workers // len(hosts))
+    step = -(-len(ports) // port_slices)
+    return [([host], ports[i:i + step]) for host in hosts for i in range(0, len(ports), step)]
+
+def _scan_shard(hosts, ports, timeout, concurrency, fingerprint):
+    return _run_loop(scan_hosts_async(hosts, ports, timeout, concurrency, None, fingerprint))
+
+async def _probe_port(loop, family, sockaddr, port, timing, attempt):
+    result = {"port": port, "state": FILTERED, "rtt": None, "exact": False, "banner": None, "service": None}
+    address = (sockaddr[0], port) + tuple(sockaddr[2:])
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
     try:
-        sock.settimeout(0.7)
-        sock.sendall(b"HEAD / HTTP/1.0\r\n\r\n")
-        banner = sock.recv(1024)
-        return banner.decode(errors='ignore')
-    except:
-        return None
+        # `_selector` is a private attribute of CPython's BaseSelectorEventLoop (there is no
+        # public way to reach a loop's selector). Other loops (uvloop, Proactor) or a
+        # future CPython without it fall back to the sock_connect timing below.
+        if isinstance(getattr(loop, "_selector", None), _StampedSelector):
+            rtt, error, exact = await _timed_connect(loop, sock, address, timing.timeout(attempt))
+        else:
+            rtt, error, exact = await _timed_sock_connect(loop, sock, address, timing.timeout(attempt))
+    finally:
+        sock.close()
+    if rtt is None:
+        return result
+    if error == 0:
+        result["state"] = OPEN
+    elif error in CLOSED_ERRNOS:
+        result["state"] = CLOSED
+    else:
+        return result  # Unreachable and similar errors stay filtered
+    result["rtt"] = rtt * 1000  # milliseconds
+    result["exact"] = exact
+    if exact:
+        timing.on_response(rtt, attempt)
+    elif attempt:
+        timing.on_drop()  # Answered only on a retry, even if we can't say how fast
+    return result
+
+class _StampedSelector(selectors.DefaultSelector):
+    """Brackets when the sockets reported by each select() became ready.
+
+    Every select() first polls without waiting. Sockets it reports were ready when it
+    was called but not when the previous select() was called - with a busy loop that
+    window can be long. Only if nothing was ready does it block, and sockets reported
+    then became ready just before it returned.
+    """
+
+    called_ns = previous_called_ns = returned_ns = 0
+    waited = False
+
+    def select(self, timeout=None):
+        self.previous_called_ns = self.called_ns
+        self.called_ns = now_ns()
+        events = super().select(0)
+        self.waited = not events and (timeout is None or timeout > 0)
+        if self.waited:
+            events = super().select(timeout)
+        self.returned_ns = now_ns()
+        return events
+
+    def answer_window(self, start_ns):
+        """(earliest, latest) time a socket reported by the last select() can have become ready"""
+        if self.waited:
+            return max(start_ns, self.returned_ns - EXACT_SLACK_NS), self.returned_ns
+        return max(start_ns, self.previous_called_ns), self.called_ns
+
+# asyncio.run() with a stamped selector where the platform's loop is selector based
+def _run_loop(coro):
+    if os.name == "nt":
+        return asyncio.run(coro)
+    loop = asyncio.SelectorEventLoop(_StampedSelector())
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+# The clock starts right before the connect() syscall and stops at the select() that
+# saw the answer, so neither the wait for a worker nor the other callbacks run in the
+# same loop iteration count as network time. Returns (rtt seconds or None on timeout,
+# socket error, exact); exact is False when the loop was too busy to pin the answer
+# down to within a quarter of the RTT, and such samples stay out of the timing model.
+async def _timed_connect(loop, sock, address, timeout):
+    selector = loop._selector  # CPython internal; _probe_port has checked it is ours
+    start_ns = now_ns()
+    error = sock.connect_ex(address)
+    if error not in IN_PROGRESS_ERRNOS:
+        return (now_ns() - start_ns) / 1e9, error, True
+    answered = loop.create_future()
+
+    def on_writable():
+        if not answered.done():
+            answered.set_result(selector.answer_window(start_ns))
+
+    fd = sock.fileno()
+    loop.add_writer(fd, on_writable)
+    try:
+        earliest, latest = await asyncio.wait_for(answered, timeout)
+    except asyncio.TimeoutError:
+        earliest = latest = None
+    finally:
+        loop.remove_writer(fd)
+    error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+    if latest is None:
+        # The answer may have been sitting there while the loop was busy: that is a
+        # response of unknown RTT, not a drop
+        if not error:
+            try:
+                sock.getpeername()
+            except OSError:
+                return None, None, False
+        earliest, latest = start_ns, now_ns()
+    rtt_ns = latest - start_ns
+    exact = latest - earliest <= max(EXACT_SLACK_NS, rtt_ns // 4)
+    return rtt_ns / 1e9, error, exact
+
+# Proactor loops (Windows) have no add_writer; fall back to sock_connect there
+async def _timed_sock_connect(loop, sock, address, timeout):
+    start_ns = now_ns()
+    try:
+        await asyncio.wait_for(loop.sock_connect(sock, address), timeout)
+    except asyncio.TimeoutError:
+        return None, None, False
+    except OSError as e:
+        error = errno.ECONNREFUSED if isinstance(e, ConnectionRefusedError) else e.errno
+        return (now_ns() - start_ns) / 1e9, error, True
+    return (now_ns() - start_ns) / 1e9, 0, True
+
+# Leave headroom below the process file-descriptor limit for everything else. The
+# limit is only read: raising it is the caller's decision, not the scanner's.
+def _available_sockets():
+    if resource is None:
+        return 500  # select() based loops on Windows cap out at 512 sockets
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return 65536
+    return max(1, soft - 64)
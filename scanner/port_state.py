@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from scanner.fingerprint import describe_service
+
+# Last known port state per host, used by incremental rescans
+STATE_FILE = "port_state.json"
+
+class PortStateStore:
+    """Persisted open-port map and rotation cursor for every scanned host.
+
+    Only open ports are stored; anything else in a host's range is assumed
+    closed until a rotating slice of the range proves otherwise.
+    """
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.hosts = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.hosts = json.load(f)
+            except (OSError, ValueError):
+                self.hosts = {}  # Unreadable or truncated state: start over with a full pass
+
+    def host(self, host):
+        return self.hosts.setdefault(host, {"open": {}, "cursor": 0, "full_pass": None, "updated": None})
+
+    def known_open(self, host):
+        return sorted(int(p) for p in self.host(host)["open"])
+
+    def next_slice(self, host, ports, size):
+        """The next `size` ports of `ports` (known-open excluded), wrapping around the range"""
+        known = set(self.known_open(host))
+        rest = [p for p in ports if p not in known]
+        if not rest:
+            return []
+        state = self.host(host)
+        start = state["cursor"] % len(rest)
+        chunk = rest[start:start + size]
+        if len(chunk) < size:
+            chunk += rest[:min(size - len(chunk), start)]
+        state["cursor"] = (start + len(chunk)) % len(rest)
+        if start + size >= len(rest):
+            state["full_pass"] = datetime.now().isoformat()
+        return chunk
+
+    def apply(self, host, results):
+        """Record probe results and return the differences to the stored state
+
+        Only a refused connection closes a known-open port; a filtered (unanswered)
+        probe may just be loss, so the port stays open until it is refused.
+        """
+        state = self.host(host)
+        changes = {"opened": [], "closed": [], "changed": []}
+        for r in results:
+            key = str(r["port"])
+            previous = state["open"].get(key)
+            if r["state"] == "open":
+                # Compare identified services rather than raw banners, which often carry dates
+                service = describe_service(r.get("service"))
+                if previous is None:
+                    changes["opened"].append(r)
+                elif previous["service"] != service:
+                    changes["changed"].append(dict(r, previous_service=previous["service"]))
+                state["open"][key] = {"service": service, "since": (previous or {}).get("since")
+                                      or datetime.now().isoformat()}
+            elif previous is not None and r["state"] == "closed":
+                changes["closed"].append(dict(r, previous_service=previous["service"]))
+                del state["open"][key]
+        state["updated"] = datetime.now().isoformat()
+        return changes
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.hosts, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,84 @@
+import ipaddress
+import re
+import socket
+
+MAX_TARGETS = 1 << 20  # Refuse to expand anything larger than a /12 in one go
+
+# Expand CIDRs, address ranges, hostnames and lists of them into a flat host list
+def expand_targets(targets):
+    if isinstance(targets, str):
+        targets = re.split(r"[,\s]+", targets)
+
+    hosts = []
+    seen = set()
+    for spec in targets:
+        spec = spec.strip()
+        if not spec:
+            continue
+        for host in _expand_spec(spec):
+            if host not in seen:
+                seen.add(host)
+                hosts.append(host)
+            if len(hosts) > MAX_TARGETS:
+                raise ValueError(f"Target list exceeds {MAX_TARGETS} hosts")
+    return hosts
+
+def _expand_spec(spec):
+    # 192.168.1.0/24, 2001:db8::/120
+    if "/" in spec:
+        network = ipaddress.ip_network(spec, strict=False)
+        if network.num_addresses > MAX_TARGETS:
+            raise ValueError(f"Network {spec} is too large to scan")
+        if network.num_addresses <= 2:
+            return [str(ip) for ip in network]
+        return [str(ip) for ip in network.hosts()]
+
+    # 10.0.0.1-10.0.0.50 or the short form 10.0.0.1-50
+    if "-" in spec:
+        first, _, last = spec.partition("-")
+        try:
+            start = ipaddress.ip_address(first)
+        except ValueError:
+            return [spec]  # Hostname that happens to contain a dash
+        if last.isdigit() and start.version == 4:
+            end = ipaddress.ip_address(first.rsplit(".", 1)[0] + "." + last)
+        else:
+            end = ipaddress.ip_address(last)
+        if end < start:
+            raise ValueError(f"Invalid address range: {spec}")
+        if int(end) - int(start) >= MAX_TARGETS:
+            raise ValueError(f"Address range {spec} is too large to scan")
+        return [str(start + i) for i in range(int(end) - int(start) + 1)]
+
+    return [spec]
+
+# Parse "22,80,443,8000-8100" into a sorted list of ports
+def parse_ports(spec):
+    ports = set()
+    for part in re.split(r"[,\s]+", str(spec)):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            if int(last) < int(first):
+                raise ValueError(f"Invalid port range {part}")
+            ports.update(range(int(first), int(last) + 1))
+        else:
+            ports.add(int(part))
+    if any(p < 0 or p > 65535 for p in ports):
+        raise ValueError(f"Port out of range in: {spec}")
+    return sorted(ports)
+
+# True for loopback/unspecified addresses and the addresses this machine's hostname resolves to
+def is_local_address(address):
+    try:
+        ip = ipaddress.ip_address(str(address).split("%")[0])
+    except ValueError:
+        return False
+    if ip.is_loopback or ip.is_unspecified:
+        return True
+    try:
+        local = {info[4][0].split("%")[0] for info in socket.getaddrinfo(socket.gethostname(), None)}
+    except OSError:
+        return False
+    return str(ip) in local
@@ -0,0 +1,92 @@
+import asyncio
+
+# RFC 6298 style constants (seconds)
+INITIAL_TIMEOUT = 1.0
+MIN_TIMEOUT = 0.1
+MAX_TIMEOUT = 3.0
+MIN_WINDOW = 8
+ALPHA = 1 / 8
+BETA = 1 / 4
+
+class TimingModel:
+    """Per-target RTT estimator and congestion window for the port scanner.
+
+    Every completed handshake (or RST) feeds a smoothed RTT and RTT variance,
+    from which probe timeouts are derived. A probe that only answered on a
+    retry is treated as a drop and halves the in-flight window; clean answers
+    grow it back one probe at a time.
+    """
+
+    def __init__(self, max_window, initial_timeout=INITIAL_TIMEOUT, min_timeout=MIN_TIMEOUT,
+                 max_timeout=MAX_TIMEOUT):
+        self.srtt = None
+        self.rttvar = None
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.max_window = max(1, max_window)
+        self.window = float(self.max_window)
+        self.in_flight = 0
+        self.samples = 0
+        self.drops = 0
+        self._waiting = 0
+        self._slot_freed = asyncio.Condition()
+
+    def timeout(self, attempt=0):
+        if self.srtt is None:
+            base = self.initial_timeout
+        else:
+            base = self.srtt + 4 * self.rttvar
+        return min(self.max_timeout, max(self.min_timeout, base) * (2 ** attempt))
+
+    def banner_timeout(self):
+        return min(self.max_timeout, max(0.3, 2 * self.timeout()))
+
+    def on_response(self, rtt, attempt=0):
+        # Karn's algorithm: an answer to a retransmitted probe is ambiguous, so skip the sample
+        if attempt == 0:
+            self._add_sample(rtt)
+            self.window = min(self.max_window, self.window + 1)
+        else:
+            self.on_drop()
+
+    def on_drop(self):
+        self.drops += 1
+        self.window = max(MIN_WINDOW, self.window / 2)
+
+    def _add_sample(self, rtt):
+        self.samples += 1
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+
+    async def acquire(self):
+        # Fast path: the scanner runs on a single event loop, so no lock is needed while under the window
+        if self.in_flight < int(self.window) and not self._waiting:
+            self.in_flight += 1
+            return
+        self._waiting += 1
+        try:
+            async with self._slot_freed:
+                await self._slot_freed.wait_for(lambda: self.in_flight < int(self.window))
+                self.in_flight += 1
+        finally:
+            self._waiting -= 1
+
+    async def release(self):
+        self.in_flight -= 1
+        if self._waiting:
+            async with self._slot_freed:
+                self._slot_freed.notify(max(0, int(self.window) - self.in_flight))
+
+    def summary(self):
+        return {
+            "srtt": None if self.srtt is None else self.srtt * 1000,
+            "rttvar": None if self.rttvar is None else self.rttvar * 1000,
+            "timeout": self.timeout() * 1000,
+            "window": int(self.window),
+            "drops": self.drops
+        }
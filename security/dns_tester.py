@@ -1,6 +1,7 @@
+import secrets
 import socket
-import subprocess
 import requests
+from scanner.dns_wire import NOERROR, NXDOMAIN, RCODES, run_queries
 
 def test_dns_hijacking(log):
     log("🤪 Testing DNS Hijacking...")
@@ -11,27 +12,75 @@ def test_dns_hijacking(log):
     except socket.gaierror:
         log("✅ DNS Hijacking does not seem to be active.")
 
-def test_dns_hijacking_advanced(log):
+HIJACK_RESOLVERS = {
+    "Google": "8.8.8.8",
+    "Cloudflare": "1.1.1.1",
+    "OpenDNS": "208.67.222.222",
+    "Quad9": "9.9.9.9",
+    "AdGuard": "94.140.14.14"
+}
+
+def test_dns_hijacking_advanced(log, resolvers=HIJACK_RESOLVERS):
     log("🧠 Advanced DNS Hijacking Test using multiple DNS resolvers...")
     try:
-        test_domain = "test.nonexistentdomain1234.com"
-        resolvers = {
-            "Google": "8.8.8.8",
-            "Cloudflare": "1.1.1.1",
-            "OpenDNS": "208.67.222.222"
-        }
-        for name, dns_ip in resolvers.items():
-            result = subprocess.run([
-                "nslookup", test_domain, dns_ip
-            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=3)
-            output = result.stdout.strip()
-            if "Name:" in output and "Address:" in output:
-                log(f"⚠ Possible Hijacking from {name} DNS:\n{output}")
-            else:
-                log(f"✅ {name} DNS did not return a result — good sign.")
+        for name, verdict in probe_nxdomain(resolvers).items():
+            log_nxdomain_verdict(log, name, verdict)
     except Exception as e:
         log(f"⚠ General error during advanced Hijacking test: {e}")
 
+# Random names under real TLDs: NXDOMAIN rewriting usually targets .com/.net, not .invalid
+def random_fake_names(count=3):
+    tlds = ("com", "net", "org")
+    return [f"isp-tester-{secrets.token_hex(8)}.{tlds[i % len(tlds)]}" for i in range(count)]
+
+def probe_nxdomain(resolvers, names=None, timeout=3.0):
+    """Ask every resolver for names that cannot exist, all in parallel, and judge each resolver.
+
+    Verdicts come from the reply header and answer section: any A/AAAA answer means the
+    NXDOMAIN was rewritten ("hijacked"), NXDOMAIN for every name is "clean", NOERROR with
+    an empty answer is "suspicious", and no usable reply at all is "error".
+    """
+    names = names or random_fake_names()
+    queries = [(ip, fake, "A") for ip in resolvers.values() for fake in names]
+    replies = run_queries(queries, timeout=timeout)
+
+    verdicts = {}
+    for name, ip in resolvers.items():
+        mine = [r for r in replies if r["server"] == ip]
+        answered = [r for r in mine if r["rcode"] is not None]
+        addresses = sorted({value for r in answered for kind, value, _ in r["answers"] if kind in ("A", "AAAA")})
+        if addresses:
+            status = "hijacked"
+        elif answered and all(r["rcode"] == NXDOMAIN for r in answered):
+            status = "clean"
+        elif any(r["rcode"] == NOERROR for r in answered):
+            status = "suspicious"
+        else:
+            status = "error"
+        verdicts[name] = {
+            "ip": ip,
+            "status": status,
+            "addresses": addresses,
+            "rcodes": [RCODES.get(r["rcode"], str(r["rcode"])) for r in answered],
+            "errors": sorted({r["error"] for r in mine if r["error"]}),
+            "answered": len(answered),
+            "sent": len(mine)
+        }
+    return verdicts
+
+def log_nxdomain_verdict(log, name, verdict):
+    ip = verdict["ip"]
+    if verdict["status"] == "hijacked":
+        log(f"⚠ Possible Hijacking from {name} DNS ({ip}): fake domains resolved to {', '.join(verdict['addresses'])}")
+    elif verdict["status"] == "clean":
+        log(f"✅ {name} DNS ({ip}) returned NXDOMAIN for {verdict['answered']}/{verdict['sent']} fake domains — good sign.")
+    elif verdict["status"] == "suspicious":
+        log(f"⚠ {name} DNS ({ip}) answered fake domains with {', '.join(sorted(set(verdict['rcodes'])))} "
+            f"instead of NXDOMAIN.")
+    else:
+        reason = ", ".join(verdict["errors"] + sorted(set(verdict["rcodes"]))) or "no reply"
+        log(f"⚠ DNS test failed for {name} ({ip}): {reason}")
+
 def test_dns_leak(log):
     log("🔍 Testing DNS Leak...")
     try:
@@ -1,9 +1,11 @@
 import platform
 import subprocess
 import shutil
-import socket
+from scanner.fingerprint import describe_service, fingerprint_ports
 
-def test_firewall_and_ports_full(open_ports, log):
+# `services` is the port -> fingerprint map from a port scan (scan["services"]);
+# when it is missing the open ports are fingerprinted here, concurrently.
+def test_firewall_and_ports_full(open_ports, log, services=None, host="127.0.0.1"):
     log("🧱 Firewall and open ports security analysis...")
 
     # 1. High-risk ports
@@ -24,31 +26,22 @@ def test_firewall_and_ports_full(open_ports, log):
         log("⚠ Unknown operating system. Firewall test skipped.")
 
     # 3. Attempt to identify services on open ports
-    for port in open_ports:
+    if services is None:
         try:
-            banner = simulate_syn_probe(port)
-            if banner:
-                log(f"🔍 Port {port} → Service response: {banner}")
-            else:
-                log(f"⚠ Port {port} is open but no identifiable service was detected.")
-        except Exception:
-            log(f"⚠ Error analyzing port {port}")
+            services = fingerprint_ports(host, open_ports)
+        except Exception as e:
+            log(f"⚠ Error fingerprinting open ports: {e}")
+            services = {}
+    for port in open_ports:
+        service = describe_service(services.get(port))
+        if service:
+            log(f"🔍 Port {port} → Service response: {service}")
+        else:
+            log(f"⚠ Port {port} is open but no identifiable service was detected.")
 
     log("📌 Completed firewall and port security analysis.")
 
 # ---------------------------
-def simulate_syn_probe(port, host="127.0.0.1", timeout=1.5):
-    """Basic TCP probe to detect banner or initial response"""
-    try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(timeout)
-            sock.connect((host, port))
-            sock.sendall(b"HEAD / HTTP/1.0\r\n\r\n")
-            response = sock.recv(1024)
-            return response.decode(errors='ignore').strip()
-    except:
-        return None
-
 def check_windows_firewall_status(log):
     try:
         log("🛡 Checking Windows Firewall status...")
@@ -4,11 +4,13 @@ import ssl
 import subprocess
 import platform
 import shutil
+from scanner.fingerprint import describe_service
+from security.dns_tester import HIJACK_RESOLVERS, log_nxdomain_verdict, probe_nxdomain
 
 
-def run_security_tests(log, open_ports=[]):
+def run_security_tests(log, open_ports=[], services=None):
     log("\U0001f512 Starting full security assessment...")
-    check_firewall_and_ports(open_ports, log)
+    check_firewall_and_ports(open_ports, log, services)
     check_dns_integrity(log)
     check_proxy_headers(log)
     check_https_support(log)
@@ -17,7 +19,7 @@ def run_security_tests(log, open_ports=[]):
 
 
 # ---------------- FIREWALL ----------------
-def check_firewall_and_ports(open_ports, log):
+def check_firewall_and_ports(open_ports, log, services=None):
     risky_ports = [21, 23, 445, 139, 3389]
     dangerous = [p for p in open_ports if p in risky_ports]
     log("\U0001f6e1 Checking firewall and open ports...")
@@ -26,6 +28,12 @@ def check_firewall_and_ports(open_ports, log):
     else:
         log("\u2705 No risky ports are open.")
 
+    # Services identified by the port scan's fingerprinting stage
+    for port in open_ports:
+        service = describe_service((services or {}).get(port))
+        if service:
+            log(f"\U0001f50d Port {port} \u2192 {service}")
+
     os_name = platform.system().lower()
     if os_name == "windows":
         check_windows_firewall_status(log)
@@ -70,22 +78,11 @@ def analyze_linux_firewall_rules(log):
 # ---------------- DNS ----------------
 def check_dns_integrity(log):
     log("\U0001f9ea Checking DNS integrity...")
-    test_domain = "nonexistent.example.dns"
-    resolvers = {
-        "Google": "8.8.8.8",
-        "Cloudflare": "1.1.1.1",
-        "OpenDNS": "208.67.222.222"
-    }
-    for name, ip in resolvers.items():
-        try:
-            res = subprocess.run(["nslookup", test_domain, ip], capture_output=True, text=True, timeout=3)
-            out = res.stdout.strip()
-            if "Address:" in out:
-                log(f"\u26a0 Potential DNS Hijacking via {name}: {out}")
-            else:
-                log(f"\u2705 {name} did not resolve fake domain.")
-        except Exception as e:
-            log(f"\u26a0 DNS test failed for {name}: {e}")
+    try:
+        for name, verdict in probe_nxdomain(HIJACK_RESOLVERS).items():
+            log_nxdomain_verdict(log, name, verdict)
+    except Exception as e:
+        log(f"\u26a0 DNS integrity test failed: {e}")
 
     # DNS Leak Test (Advanced)
     try:
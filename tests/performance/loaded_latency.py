@@ -0,0 +1,231 @@
+import errno
+import selectors
+import socket
+import struct
+import threading
+import time
+
+from tests.performance.throughput import DEFAULT_STREAMS, measure_phase
+from utils.measure import summarize
+
+# Latency under load ("bufferbloat"): a steady stream of small probes runs while the
+# link is idle, saturated by the download and upload phases, and idle again. Probes
+# are UDP echoes (the throughput server answers them on its own port) or, where UDP
+# is not available, TCP connects whose SYN-ACK/RST is the reply.
+
+PROBE_INTERVAL = 0.02
+PROBE_TIMEOUT = 1.0
+IDLE_SECONDS = 2.0
+_PROBE = struct.Struct("!4sI")
+_MAGIC = b"ISPL"
+
+# Added latency (median loaded minus median idle, ms) -> grade
+BUFFERBLOAT_GRADES = ((5, "A+"), (30, "A"), (60, "B"), (200, "C"), (400, "D"))
+
+def start_udp_echo(host="0.0.0.0", port=5201):
+    """Echo latency probes back to their sender in a daemon thread; returns the socket (close() stops it)
+
+    Only datagrams shaped like our own probes (magic prefix, exact size) get an answer,
+    so the port can't be used to reflect arbitrary traffic at a spoofed address.
+    """
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+
+    def serve():
+        buffer = bytearray(2048)
+        while True:
+            try:
+                size, addr = sock.recvfrom_into(buffer)
+                if size == _PROBE.size and buffer[:len(_MAGIC)] == _MAGIC:
+                    sock.sendto(memoryview(buffer)[:size], addr)
+            except OSError:
+                if sock.fileno() == -1:
+                    return
+
+    threading.Thread(target=serve, daemon=True).start()
+    return sock
+
+class LatencyProbe:
+    """Background probe stream; every reply's RTT is filed under the phase it was sent in.
+
+    mode "udp" sends sequence-numbered datagrams to an echo service, mode "tcp" times
+    non-blocking connects (a refused connection still answers, so it counts).
+    """
+
+    def __init__(self, host, port, mode="udp", interval=PROBE_INTERVAL, timeout=PROBE_TIMEOUT):
+        self.address = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM if mode == "udp" else socket.SOCK_STREAM)[0]
+        self.mode = mode
+        self.interval = interval
+        self.timeout = timeout
+        self.phase = "idle"
+        self.outcomes = {}  # phase -> [rtt ms or "timeout"]
+        self.sent = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def set_phase(self, phase):
+        self.phase = phase
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        return {phase: summarize(outcomes, self.sent[phase]) for phase, outcomes in self.outcomes.items()}
+
+    def _record(self, phase, outcome):
+        self.outcomes.setdefault(phase, []).append(outcome)
+
+    def _run(self):
+        family, _, _, _, sockaddr = self.address
+        selector = selectors.DefaultSelector()
+        pending = {}  # seq (udp) or socket (tcp) -> (phase, sent_ns)
+        udp = None
+        if self.mode == "udp":
+            udp = socket.socket(family, socket.SOCK_DGRAM)
+            udp.setblocking(False)
+            selector.register(udp, selectors.EVENT_READ)
+        timeout_ns = int(self.timeout * 1e9)
+        interval_ns = int(self.interval * 1e9)
+        seq = 0
+        next_send = time.perf_counter_ns()
+        try:
+            while not self._stop.is_set() or pending:
+                now = time.perf_counter_ns()
+                if not self._stop.is_set() and now >= next_send:
+                    phase = self.phase
+                    self.sent[phase] = self.sent.get(phase, 0) + 1
+                    seq += 1
+                    if udp is not None:
+                        pending[seq] = (phase, time.perf_counter_ns())
+                        try:
+                            udp.sendto(_PROBE.pack(_MAGIC, seq), sockaddr)
+                        except OSError:
+                            pass  # Counted as a timeout
+                    else:
+                        sock = socket.socket(family, socket.SOCK_STREAM)
+                        sock.setblocking(False)
+                        sent_ns = time.perf_counter_ns()
+                        if sock.connect_ex(sockaddr) in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                            selector.register(sock, selectors.EVENT_WRITE)
+                            pending[sock] = (phase, sent_ns)
+                        else:
+                            sock.close()
+                            self._record(phase, "error")
+                    next_send += interval_ns
+                    if next_send < now:
+                        next_send = now + interval_ns  # Fell behind; don't burst to catch up
+
+                for key in [k for k, (_, sent_ns) in pending.items() if now - sent_ns >= timeout_ns]:
+                    phase, _ = pending.pop(key)
+                    self._record(phase, "timeout")
+                    if udp is None:
+                        selector.unregister(key)
+                        key.close()
+
+                wait = (next_send - time.perf_counter_ns()) / 1e9 if not self._stop.is_set() else 0.05
+                for key, _ in selector.select(max(0.0, min(wait, self.timeout))):
+                    received_ns = time.perf_counter_ns()
+                    if udp is not None:
+                        self._receive_udp(udp, pending, received_ns)
+                    else:
+                        sock = key.fileobj
+                        selector.unregister(sock)
+                        error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                        phase, sent_ns = pending.pop(sock)
+                        sock.close()
+                        if error in (0, errno.ECONNREFUSED):
+                            self._record(phase, (received_ns - sent_ns) / 1e6)
+                        else:
+                            self._record(phase, "error")
+        finally:
+            for key in list(pending):
+                if udp is None:
+                    key.close()
+            if udp is not None:
+                udp.close()
+            selector.close()
+
+    def _receive_udp(self, sock, pending, received_ns):
+        while True:
+            try:
+                data = sock.recv(64)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            if len(data) != _PROBE.size:
+                continue
+            magic, seq = _PROBE.unpack(data)
+            entry = pending.pop(seq, None) if magic == _MAGIC else None
+            if entry is not None:
+                phase, sent_ns = entry
+                self._record(phase, (received_ns - sent_ns) / 1e6)
+
+def bufferbloat_grade(added_ms):
+    for limit, grade in BUFFERBLOAT_GRADES:
+        if added_ms < limit:
+            return grade
+    return "F"
+
+def log_loaded_latency(log, summary):
+    idle = summary.get("idle", {})
+    log("\n📶 Latency under load:")
+    for phase in ("idle", "download", "upload", "after"):
+        stats = summary.get(phase)
+        if not stats:
+            continue
+        if not stats["received"]:
+            log(f" - {phase}: no replies ({stats['sent']} probes)")
+            continue
+        increase = ""
+        if phase in ("download", "upload") and idle.get("received"):
+            added = stats["median"] - idle["median"]
+            increase = f" | {added:+.1f} ms over idle (grade {bufferbloat_grade(added)})"
+        log(f" - {phase}: median {stats['median']:.1f} | p95 {stats['p95']:.1f} | p99 {stats['p99']:.1f} ms | "
+            f"loss {stats['loss']:.0f}%{increase}")
+
+def loaded_latency_result(summary):
+    """Flat numbers for the speed-test result: per-phase median/p95 and the added latency"""
+    result = {}
+    idle = summary.get("idle", {})
+    for phase, stats in summary.items():
+        if stats["received"]:
+            result[f"latency_{phase}"] = round(stats["median"], 2)
+            result[f"latency_{phase}_p95"] = round(stats["p95"], 2)
+    for phase in ("download", "upload"):
+        stats = summary.get(phase)
+        if stats and stats["received"] and idle.get("received"):
+            result[f"bufferbloat_{phase}"] = round(stats["median"] - idle["median"], 2)
+    if "bufferbloat_download" in result or "bufferbloat_upload" in result:
+        worst = max(result.get("bufferbloat_download", 0), result.get("bufferbloat_upload", 0))
+        result["bufferbloat_grade"] = bufferbloat_grade(worst)
+    return result
+
+def run_loaded_latency_test(log, host, port, streams=DEFAULT_STREAMS, duration=10.0, warmup=2.0, mode="udp",
+                            idle_seconds=IDLE_SECONDS):
+    """Throughput phases against our own server with a latency probe running throughout"""
+    probe = LatencyProbe(host, port, mode=mode).start()
+    result = {}
+    try:
+        log(f"⏳ Measuring idle latency ({mode} probes every {PROBE_INTERVAL * 1000:.0f} ms)...")
+        time.sleep(idle_seconds)
+        for direction, key in (("DOWN", "download"), ("UP", "upload")):
+            log(f"⏳ Measuring {key} speed under latency probing...")
+            probe.set_phase(key)
+            phase = measure_phase(host, port, direction, streams, duration, warmup)
+            result[key] = round(phase["mbps"], 2)
+            log(f"{'⬇ Download' if key == 'download' else '⬆ Upload'} speed: {phase['mbps']:.2f} Mbps")
+        probe.set_phase("after")
+        time.sleep(idle_seconds)
+    finally:
+        probe.stop()
+    summary = probe.summary()
+    log_loaded_latency(log, summary)
+    result.update(loaded_latency_result(summary))
+    return result
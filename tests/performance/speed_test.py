@@ -0,0 +1,88 @@
+import time
+
+from config import SETTINGS
+from tests.performance.loaded_latency import (IDLE_SECONDS, LatencyProbe, log_loaded_latency, loaded_latency_result,
+                                              run_loaded_latency_test)
+from tests.performance.throughput import DEFAULT_STREAMS, parse_server, run_throughput_test
+from utils.measure import measure, tcp_connect_probe
+
+def run_speed_test(log):
+    # A configured throughput server ("host" or "host:port") replaces speedtest.net
+    settings = SETTINGS.get("speed_test", {})
+    if settings.get("server"):
+        return run_native_speed_test(log, settings)
+
+    log("🔄 Running internet speed test using speedtest.net...")
+    probe = None
+    try:
+        import speedtest
+        st = speedtest.Speedtest()
+        st.get_best_server()
+        if settings.get("loaded_latency"):
+            # TCP connect probes to the test server itself, before/while/after loading the link
+            host, port = parse_server(st.best["host"])
+            probe = LatencyProbe(host, port, mode="tcp", interval=0.1).start()
+            time.sleep(IDLE_SECONDS)
+            probe.set_phase("download")
+
+        log("⏳ Measuring download speed...")
+        download_speed = st.download() / 1_000_000  # Mbps
+
+        if probe:
+            probe.set_phase("upload")
+        log("⏳ Measuring upload speed...")
+        upload_speed = st.upload() / 1_000_000  # Mbps
+
+        ping_result = st.results.ping
+
+        log(f"⬇ Download speed: {download_speed:.2f} Mbps")
+        log(f"⬆ Upload speed: {upload_speed:.2f} Mbps")
+        log(f"📡 Latency (Ping): {ping_result:.1f} ms")
+
+        result = {
+            "download": round(download_speed, 2),
+            "upload": round(upload_speed, 2),
+            "latency": round(ping_result, 1)
+        }
+        if probe:
+            probe.set_phase("after")
+            time.sleep(IDLE_SECONDS)
+            probe.stop()
+            summary = probe.summary()
+            log_loaded_latency(log, summary)
+            result.update(loaded_latency_result(summary))
+        return result
+
+    except Exception as e:
+        if probe:
+            probe.stop()
+        log(f"[!] Error during speed test: {e}")
+        return {
+            "download": 0,
+            "upload": 0,
+            "latency": -1
+        }
+
+def run_native_speed_test(log, settings):
+    host, port = parse_server(settings["server"])
+    try:
+        connects = measure(tcp_connect_probe(host, port), count=5, spacing=0.1, timeout=settings.get("timeout", 10))
+        stats = connects.stats(outliers="iqr")
+        if not stats["received"]:
+            raise ConnectionError(f"no answer from {host}:{port} ({', '.join(connects.errors)})")
+        latency = stats["median"]
+        streams, duration = settings.get("streams", DEFAULT_STREAMS), settings.get("duration", 10)
+        if settings.get("loaded_latency"):
+            result = run_loaded_latency_test(log, host, port, streams=streams, duration=duration)
+        else:
+            result = run_throughput_test(log, host, port, streams=streams, duration=duration)
+        log(f"📡 Latency (TCP connect): {latency:.1f} ms (p95 {stats['p95']:.1f}, jitter {stats['jitter']:.1f} ms)")
+        result["latency"] = round(latency, 1)
+        return result
+    except Exception as e:
+        log(f"[!] Error during speed test: {e}")
+        return {
+            "download": 0,
+            "upload": 0,
+            "latency": -1
+        }
@@ -0,0 +1,185 @@
+import socket
+import socketserver
+import threading
+import time
+
+# Native multi-stream TCP throughput test. The client opens `streams` connections to a
+# throughput server (run_throughput_server, e.g. on one of our own machines or on
+# loopback) and asks for a download or upload phase of `duration` seconds. Bytes are
+# counted per stream and sampled every `interval` seconds; the first `warmup` seconds
+# (TCP slow start) are left out of the reported rate.
+
+DEFAULT_PORT = 5201
+DEFAULT_STREAMS = 4
+BUFFER_SIZE = 256 * 1024
+SOCKET_BUFFER = 4 * 1024 * 1024
+
+def _tune(sock):
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    for option in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, option, SOCKET_BUFFER)
+        except OSError:
+            pass
+
+# "host", "host:port", "[v6addr]:port" or a bare IPv6 address
+def parse_server(server):
+    if server.startswith("["):
+        host, _, port = server[1:].partition("]")
+        return host, int(port.lstrip(":") or DEFAULT_PORT)
+    if server.count(":") == 1:
+        host, port = server.split(":")
+        return host, int(port)
+    return server, DEFAULT_PORT
+
+# ---------------- SERVER ----------------
+class _ThroughputHandler(socketserver.BaseRequestHandler):
+    """One stream: a "DOWN <seconds>" or "UP <seconds>" line, then bulk data until the time is up"""
+
+    def handle(self):
+        sock = self.request
+        _tune(sock)
+        header = b""
+        while not header.endswith(b"\n") and len(header) < 64:
+            chunk = sock.recv(1)
+            if not chunk:
+                return
+            header += chunk
+        try:
+            direction, seconds = header.decode().split()
+            deadline = time.monotonic() + min(float(seconds), self.server.max_duration) + 1.0
+        except ValueError:
+            return
+
+        buffer = self.server.buffer
+        view = memoryview(bytearray(BUFFER_SIZE))
+        sock.settimeout(2.0)
+        try:
+            if direction == "DOWN":
+                while time.monotonic() < deadline:
+                    sock.sendall(buffer)
+            elif direction == "UP":
+                while time.monotonic() < deadline and sock.recv_into(view):
+                    pass
+        except OSError:
+            pass  # Client closed the stream at the end of its phase
+
+class ThroughputServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, max_duration=60.0):
+        self.address_family = socket.AF_INET6 if ":" in address[0] else socket.AF_INET
+        self.max_duration = max_duration
+        self.buffer = memoryview(bytes(BUFFER_SIZE))  # Shared, read-only payload for every stream
+        super().__init__(address, _ThroughputHandler)
+        # UDP echo on the same port answers the latency-under-load probes
+        from tests.performance.loaded_latency import start_udp_echo
+        self.echo = start_udp_echo(address[0], self.server_address[1])
+
+    def server_close(self):
+        super().server_close()
+        self.echo.close()
+
+def run_throughput_server(host="0.0.0.0", port=DEFAULT_PORT, log=print, background=False):
+    """Serve throughput tests; with background=True returns the started server (shutdown() stops it)"""
+    server = ThroughputServer((host, port))
+    log(f"📡 Throughput server listening on {host}:{server.server_address[1]} (TCP data, UDP echo)")
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+# ---------------- CLIENT ----------------
+def measure_phase(host, port, direction, streams=DEFAULT_STREAMS, duration=10.0, warmup=2.0, interval=0.5,
+                  timeout=5.0):
+    """Run one download ("DOWN") or upload ("UP") phase; returns its summary and interval samples"""
+    counters = [0] * streams
+    errors = []
+    stop = threading.Event()
+    connected = threading.Barrier(streams + 1)
+
+    def stream(index):
+        sock = None
+        try:
+            sock = socket.create_connection((host, port), timeout=timeout)
+            _tune(sock)
+            sock.sendall(f"{direction} {duration + warmup}\n".encode())
+        except OSError as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        try:
+            connected.wait()
+        except threading.BrokenBarrierError:
+            pass
+        if sock is None:
+            return
+        try:
+            if direction == "DOWN":
+                view = memoryview(bytearray(BUFFER_SIZE))  # Reused for every read
+                while not stop.is_set():
+                    received = sock.recv_into(view)
+                    if not received:
+                        break
+                    counters[index] += received
+            else:
+                payload = memoryview(bytes(BUFFER_SIZE))
+                while not stop.is_set():
+                    counters[index] += sock.send(payload)
+        except OSError as e:
+            if not stop.is_set():
+                errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            sock.close()
+
+    threads = [threading.Thread(target=stream, args=(i,), daemon=True) for i in range(streams)]
+    for thread in threads:
+        thread.start()
+    connected.wait()
+
+    start = time.perf_counter()
+    samples = []  # (seconds since start, total bytes so far)
+    while True:
+        elapsed = time.perf_counter() - start
+        samples.append((elapsed, sum(counters)))
+        if elapsed >= warmup + duration or not any(t.is_alive() for t in threads):
+            break
+        time.sleep(min(interval, warmup + duration - elapsed))
+    stop.set()
+    for thread in threads:
+        thread.join(timeout)
+
+    intervals = [{"start": t0, "end": t1, "mbps": (b1 - b0) * 8 / (t1 - t0) / 1e6 if t1 > t0 else 0.0}
+                 for (t0, b0), (t1, b1) in zip(samples, samples[1:])]
+    # Rate over the samples after warm-up; if the phase ended early, over everything
+    measured = [s for s in samples if s[0] >= warmup] or samples
+    (t0, b0), (t1, b1) = measured[0], measured[-1]
+    if t1 <= t0:
+        (t0, b0), (t1, b1) = samples[0], samples[-1]
+    return {
+        "direction": direction,
+        "mbps": (b1 - b0) * 8 / (t1 - t0) / 1e6 if t1 > t0 else 0.0,
+        "bytes": samples[-1][1],
+        "streams": streams,
+        "intervals": intervals,
+        "errors": sorted(set(errors))
+    }
+
+def run_throughput_test(log, host, port=DEFAULT_PORT, streams=DEFAULT_STREAMS, duration=10.0, warmup=2.0,
+                        interval=0.5):
+    """Download then upload phase against a throughput server; returns the speed-test result dict"""
+    log(f"🔄 Measuring throughput against {host}:{port} with {streams} streams...")
+    result = {}
+    for direction, key, label in (("DOWN", "download", "⬇ Download"), ("UP", "upload", "⬆ Upload")):
+        log(f"⏳ Measuring {key} speed...")
+        phase = measure_phase(host, port, direction, streams, duration, warmup, interval)
+        for error in phase["errors"]:
+            log(f"⚠ {key} stream error: {error}")
+        rates = [i["mbps"] for i in phase["intervals"] if i["start"] >= warmup]
+        spread = f" (intervals {min(rates):.1f}-{max(rates):.1f})" if rates else ""
+        log(f"{label} speed: {phase['mbps']:.2f} Mbps{spread}")
+        result[key] = round(phase["mbps"], 2)
+        result[f"{key}_intervals"] = [round(i["mbps"], 2) for i in phase["intervals"]]
+    return result
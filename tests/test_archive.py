@@ -0,0 +1,39 @@
+import os
+
+from utils.storage import SegmentedArchive
+
+DAY = 24 * 3600
+
+def _entries(start, count, step, category="dns"):
+    return [{"timestamp": start + i * step, "category": category, "value": i} for i in range(count)]
+
+def test_entries_land_in_their_segments_and_come_back_in_order(tmp_path):
+    archive = SegmentedArchive(str(tmp_path), segment_seconds=DAY)
+    start = 100 * DAY
+    written = archive.append(list(reversed(_entries(start, 6, DAY // 2))))
+    assert written == 6
+    assert len(archive.segments) == 3
+    assert [e["value"] for e in archive.query()] == [0, 1, 2, 3, 4, 5]
+
+def test_queries_only_open_the_segments_they_need(tmp_path):
+    archive = SegmentedArchive(str(tmp_path), segment_seconds=DAY)
+    start = 100 * DAY
+    archive.append(_entries(start, 4, DAY) + _entries(start + DAY, 1, 10, category="speed"))
+    assert len(archive.segments_for(since=start + 2 * DAY)) == 2
+    assert len(archive.segments_for(category="speed")) == 1
+
+    # A segment outside the window may even be gone without the query noticing
+    os.remove(tmp_path / archive.segments[str(start)]["file"])
+    assert [e["value"] for e in archive.query(since=start + DAY, until=start + 3 * DAY)] == [1, 0, 2]
+    assert [e["category"] for e in archive.query(since=start + DAY, category="speed")] == ["speed"]
+
+def test_appends_to_an_existing_segment_survive_a_reopen(tmp_path):
+    start = 100 * DAY
+    SegmentedArchive(str(tmp_path), segment_seconds=DAY).append(_entries(start, 2, 60))
+    reopened = SegmentedArchive(str(tmp_path), segment_seconds=DAY)
+    reopened.append(_entries(start + 600, 2, 60, category="ports"))
+    segment, = reopened.segments.values()
+    assert segment["count"] == 4
+    assert segment["categories"] == {"dns": 2, "ports": 2}
+    assert segment["start"] == start and segment["end"] == start + 660
+    assert len(SegmentedArchive(str(tmp_path), segment_seconds=DAY).query()) == 4
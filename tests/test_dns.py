@@ -0,0 +1,70 @@
+import struct
+
+import pytest
+
+from scanner.dns_benchmark import benchmark_resolvers, profile_cache_latency
+from scanner.dns_wire import NXDOMAIN, build_query, encode_question, parse_response, run_queries
+from security.dns_tester import probe_nxdomain
+
+def test_question_round_trip():
+    question = encode_question("www.example.com", "AAAA")
+    assert question == b"\x03www\x07example\x03com\x00" + struct.pack("!HH", 28, 1)
+    reply = parse_response(build_query(question, 0x1234))
+    assert reply["txid"] == 0x1234
+    assert reply["answers"] == []
+
+@pytest.mark.parametrize("name, rdtype", [("a" * 64 + ".com", "A"), ("x." * 130, "A"), ("bad..name", "A"),
+                                          ("example.com", "BOGUS")])
+def test_invalid_questions_raise_value_error(name, rdtype):
+    with pytest.raises(ValueError):
+        encode_question(name, rdtype)
+
+def test_truncated_reply_is_rejected():
+    with pytest.raises(ValueError):
+        parse_response(b"\x00\x01")
+
+def test_queries_are_matched_and_bad_names_fail_alone(fake_dns):
+    fake_dns("127.0.0.1", lambda name: (0, ["192.0.2.7"]) if name == "ok.test" else (NXDOMAIN, []))
+    replies = run_queries([("127.0.0.1", "ok.test", "A"), ("127.0.0.1", "a" * 70 + ".test", "A"),
+                           ("127.0.0.1", "missing.test", "A")], timeout=1.0)
+    assert replies[0]["rcode"] == 0 and replies[0]["answers"] == [("A", "192.0.2.7", 60)]
+    assert replies[0]["rtt"] > 0
+    assert replies[1]["error"].startswith("Invalid query") and replies[1]["rtt"] is None
+    assert replies[2]["rcode"] == NXDOMAIN
+
+def test_silent_resolver_times_out(fake_dns):
+    fake_dns("127.0.0.1", lambda name: None)
+    reply, = run_queries([("127.0.0.1", "ok.test", "A")], timeout=0.2)
+    assert reply["rtt"] is None and reply["error"] == "timeout"
+
+def test_benchmark_counts_servfail_as_loss(fake_dns):
+    good = fake_dns("127.0.0.1", lambda name: (0, ["192.0.2.1"]))
+    broken = fake_dns("127.0.0.2", lambda name: (2, []))
+    results = benchmark_resolvers([(good, "good"), (broken, "broken")], domains=("a.test", "b.test"),
+                                  samples=2, timeout=1.0, deadline=3.0, spacing=0.0)
+    assert results[good]["received"] == 8 and results[good]["loss"] == 0
+    assert results[good]["median"] is not None
+    assert results[broken]["received"] == 0 and results[broken]["loss"] == 100
+    assert results[broken]["errors"] == ["SERVFAIL"]
+
+def test_cache_profile_splits_cold_and_warm(fake_dns):
+    names = []
+    server = fake_dns("127.0.0.1", lambda name: names.append(name) or (0 if name == "zone.test" else NXDOMAIN, []))
+    profile = profile_cache_latency([(server, "fake")], zone="zone.test", samples=3, timeout=1.0, spacing=0.0)[server]
+    assert profile["cold"]["received"] == 3 and profile["warm"]["received"] == 3
+    cold_names = [n for n in names if n != "zone.test"]
+    assert len(set(cold_names)) == 3 and all(n.endswith(".zone.test") for n in cold_names)
+
+def test_nxdomain_verdicts(fake_dns):
+    resolvers = {
+        "clean": fake_dns("127.0.0.1", lambda name: (NXDOMAIN, [])),
+        "hijacked": fake_dns("127.0.0.2", lambda name: (0, ["198.51.100.9"])),
+        "suspicious": fake_dns("127.0.0.3", lambda name: (0, [])),
+        "silent": fake_dns("127.0.0.4", lambda name: None)
+    }
+    verdicts = probe_nxdomain(resolvers, names=["nope-1.test", "nope-2.test"], timeout=0.3)
+    assert {name: v["status"] for name, v in verdicts.items()} == {
+        "clean": "clean", "hijacked": "hijacked", "suspicious": "suspicious", "silent": "error"}
+    assert verdicts["hijacked"]["addresses"] == ["198.51.100.9"]
+    assert verdicts["clean"]["answered"] == verdicts["clean"]["sent"] == 2
+    assert verdicts["silent"]["errors"] == ["timeout"]
@@ -0,0 +1,42 @@
+import re
+
+from scanner.fingerprint import DEFAULT_INDEX, SIGNATURES, SignatureIndex, describe_service, fingerprint_ports
+
+def test_index_matches_products_and_versions():
+    assert DEFAULT_INDEX.match("SSH-2.0-OpenSSH_9.6p1 Ubuntu-3") == {
+        "service": "ssh", "product": "OpenSSH", "version": "9.6p1"}
+    assert DEFAULT_INDEX.match("HTTP/1.1 200 OK\r\nServer: nginx/1.25.3\r\n\r\n") == {
+        "service": "http", "product": "nginx", "version": "1.25.3"}
+    assert DEFAULT_INDEX.match("+PONG\r\n")["service"] == "redis"
+    assert DEFAULT_INDEX.match("hello there") is None
+
+def test_specific_signatures_win_over_generic_ones():
+    match = DEFAULT_INDEX.match("220 (vsFTPd 3.0.5)\r\n")
+    assert match == {"service": "ftp", "product": "vsFTPd", "version": "3.0.5"}
+    assert DEFAULT_INDEX.match("220 files.example.com FTP server ready")["service"] == "ftp"
+
+def test_index_agrees_with_a_linear_scan():
+    banners = ["SSH-1.99-Cisco-1.25", "220 mail ESMTP Postfix", "* OK [CAPABILITY IMAP4rev1] Dovecot ready.",
+               "RFB 003.008\n", "HTTP/1.0 404 Not Found\r\nServer: Apache/2.4.58\r\n", "VERSION 1.6.21\r\n",
+               "-NOAUTH Authentication required.", "random text"]
+    for banner in banners:
+        linear = next((service for service, pattern, _ in SIGNATURES if re.search(pattern, banner, re.DOTALL)), None)
+        assert (DEFAULT_INDEX.match(banner) or {}).get("service") == linear, banner
+
+def test_custom_signatures():
+    index = SignatureIndex([("gopher", r"^iWelcome", None), ("custom", r"Powered by Widget", "widget")])
+    assert index.match("iWelcome to gopher")["service"] == "gopher"
+    assert index.match("x Powered by Widget")["service"] == "custom"
+    assert index.size == 2
+
+def test_fingerprint_talk_first_and_http_services(tcp_service):
+    ssh = tcp_service(greeting=b"SSH-2.0-OpenSSH_9.6\r\n")
+    web = tcp_service(reply=b"HTTP/1.0 200 OK\r\nServer: nginx/1.24.0\r\n\r\n")
+    silent = tcp_service()
+    results = fingerprint_ports("127.0.0.1", [ssh, web, silent], timeout=1.0)
+
+    assert results[ssh]["service"] == "ssh" and results[ssh]["probe"] == "null"
+    assert results[web]["service"] == "http" and results[web]["product"] == "nginx"
+    assert results[web]["probe"] == "http"
+    assert results[silent]["service"] is None and results[silent]["banner"] is None
+    assert describe_service(results[silent]) is None
@@ -0,0 +1,88 @@
+import math
+import time
+
+import pytest
+
+from analyzer.history import HOUR, Sketch, history_rows, query_history, refresh_rollups
+from analyzer.result_store import ResultStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    yield store
+    store.close()
+
+def _add(store, timestamp, value, target="1.1.1.1"):
+    run = store.start_run("dns")
+    store.add_probes(run, [{"category": "dns", "target": target, "timestamp": timestamp, "data": {"median": value}}])
+
+def _all(store, since, **kwargs):
+    return query_history("dns_latency", since=since, group="all", aggregates=("count", "mean", "max"),
+                         store=store, **kwargs)
+
+def test_store_filters_by_target_and_time(store):
+    now = time.time()
+    _add(store, now - 50, 10.0, "1.1.1.1")
+    _add(store, now - 10, 20.0, "8.8.8.8")
+    assert [v for _, _, v in store.samples("median", category="dns")] == [10.0, 20.0]
+    assert [p["target"] for p in store.probes(target="8.8.8.8")] == ["8.8.8.8"]
+    assert len(store.probes(since=now - 30)) == 1
+
+def test_rollups_and_raw_samples_agree(store):
+    hour = math.floor(time.time() / HOUR) * HOUR
+    for offset, value in ((-5, 10.0), (-3, 20.0), (-3, 30.0), (0, 40.0)):
+        _add(store, hour + offset * HOUR + 1, value)
+    assert refresh_rollups(store) == hour
+    rolled, = _all(store, hour - 24 * HOUR)
+    assert rolled == {"group": "all", "count": 4, "mean": 25.0, "max": 40.0}
+    hourly = query_history("dns_latency", since=hour - 24 * HOUR, group="hour", aggregates=("count",), store=store)
+    assert [row["count"] for row in hourly] == [1, 2, 1]
+
+def test_late_samples_are_merged_into_their_hour(store):
+    hour = math.floor(time.time() / HOUR) * HOUR
+    _add(store, hour - 3 * HOUR + 1, 10.0)
+    refresh_rollups(store)
+    _add(store, hour - 3 * HOUR + 2, 30.0)  # Saved after its hour was rolled up
+    _add(store, hour - 6 * HOUR + 1, 50.0)  # Older than anything rolled up so far
+    assert _all(store, hour - 24 * HOUR)[0]["count"] == 3
+    assert _all(store, hour - 24 * HOUR)[0]["mean"] == 30.0  # Repeated refreshes don't double count
+
+def test_rollups_outlive_archived_samples(store):
+    hour = math.floor(time.time() / HOUR) * HOUR
+    _add(store, hour - 2 * HOUR + 1, 10.0)
+    _add(store, hour - 2 * HOUR + 2, 20.0)
+    refresh_rollups(store)
+    store.delete_probes(hour)
+    assert store.samples("median") == []
+    assert _all(store, hour - 24 * HOUR)[0]["count"] == 2
+
+def test_target_filter_and_grouping(store):
+    hour = math.floor(time.time() / HOUR) * HOUR
+    _add(store, hour - HOUR + 1, 10.0, "1.1.1.1")
+    _add(store, hour - HOUR + 2, 30.0, "8.8.8.8")
+    by_resolver = query_history("dns_latency", since=hour - 2 * HOUR, group="resolver", aggregates=("mean",),
+                                store=store)
+    assert {row["group"]: row["mean"] for row in by_resolver} == {"1.1.1.1": 10.0, "8.8.8.8": 30.0}
+    assert _all(store, hour - 2 * HOUR, target="8.8.8.8")[0]["count"] == 1
+    with pytest.raises(ValueError):
+        query_history("dns_latency", group="week", store=store)
+
+def test_sketch_quantiles_stay_within_two_percent():
+    values = [0.5 + i * 0.37 for i in range(2000)]
+    sketch, half = Sketch(), Sketch()
+    for i, value in enumerate(values):
+        (sketch if i % 2 else half).add(value)
+    sketch.merge(half)
+    ordered = sorted(values)
+    for q in (0.5, 0.95, 0.99):
+        exact = ordered[round(q * (len(ordered) - 1))]
+        assert abs(sketch.quantile(q) - exact) / exact <= 0.02
+    assert sketch.aggregate("count") == 2000 and sketch.aggregate("min") == 0.5
+
+def test_history_rows_of_a_multi_host_scan():
+    scan = {"host": "10.0.0.1", "open": [22], "closed": [23], "filtered": [], "duration": 1.5, "error": None}
+    rows = history_rows("ports", {"hosts": {"10.0.0.1": scan, "10.0.0.2": {"host": "10.0.0.2", "error": "down"}},
+                                  "duration": 2.0})
+    assert rows == [({"host": "10.0.0.1", "open": [22], "open_count": 1, "closed_count": 1, "filtered_count": 0,
+                      "duration": 1.5}, "Port scan of 10.0.0.1")]
+    assert history_rows("speed", {"latency": -1}) == []
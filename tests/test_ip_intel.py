@@ -0,0 +1,44 @@
+import gzip
+
+from utils.ip_intel import RangeIndex, load_index, read_rows
+
+ROWS = [
+    ("range_start", "range_end", "AS_number", "country_code", "AS_description"),
+    ("1.0.0.0", "1.0.0.255", "13335", "us", "CLOUDFLARENET"),
+    ("1.0.0.128", "1.0.1.255", "64500", "ZZ", "Overlaps the first range"),
+    ("8.8.8.0", "8.8.8.255", "AS15169", "US", "GOOGLE"),
+    ("9.0.0.0", "9.255.255.255", "0", "None", "Not routed"),
+    ("2606:4700::", "2606:4700:ffff:ffff:ffff:ffff:ffff:ffff", "13335", "US", "CLOUDFLARENET")
+]
+
+def test_lookup_finds_the_enclosing_range():
+    index = RangeIndex.from_rows(ROWS)
+    assert index.lookup("1.0.0.1") == {"asn": 13335, "country": "US", "org": "CLOUDFLARENET",
+                                       "range": "1.0.0.0-1.0.0.255"}
+    assert index.lookup("1.0.0.255")["asn"] == 13335
+    assert index.lookup("1.0.1.0") is None  # An overlapping range is dropped; the first one wins
+    assert index.lookup("8.8.8.8")["asn"] == 15169
+    assert index.lookup("::ffff:8.8.4.4") is None
+    assert index.lookup("::ffff:8.8.8.4")["asn"] == 15169
+    assert index.lookup("2606:4700::1111")["country"] == "US"
+    assert index.lookup("9.9.9.9") is None  # ASN 0 rows are skipped
+    assert index.lookup("not an ip") is None
+    assert len(index) == 3
+
+def test_cache_round_trip(tmp_path):
+    index = RangeIndex.from_rows(ROWS)
+    path = str(tmp_path / "ranges.idx")
+    index.save(path)
+    cached = RangeIndex.load_cache(path)
+    for ip in ("1.0.0.1", "8.8.8.8", "2606:4700::1", "2001:db8::1"):
+        assert cached.lookup(ip) == index.lookup(ip)
+    assert cached.lookup("2606:4700::1")["asn"] == 13335
+
+def test_load_index_reads_gzipped_tsv_and_writes_a_cache(tmp_path):
+    path = tmp_path / "ip2asn.tsv.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.writelines("\t".join(row) + "\n" for row in ROWS)
+    assert list(read_rows(str(path)))[1] == ROWS[1]
+    assert load_index(str(path)).lookup("8.8.8.8")["org"] == "GOOGLE"
+    assert (tmp_path / "ip2asn.tsv.gz.idx").exists()
+    assert load_index(str(path)).lookup("8.8.8.8")["org"] == "GOOGLE"
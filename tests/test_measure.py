@@ -0,0 +1,40 @@
+import socket
+
+import pytest
+
+from utils.measure import SampleBuffer, jitter, measure, percentile, summarize, tcp_connect_probe
+
+def test_jitter_is_the_mean_successive_difference():
+    assert jitter([0.10, 0.27, 1.36]) == pytest.approx(0.63)
+    assert jitter([5.0, 5.0, 5.0]) == 0.0
+    assert jitter([3.0]) == 0.0
+
+def test_percentile_interpolates():
+    values = [1.0, 2.0, 3.0, 4.0]
+    assert percentile(values, 50) == 2.5
+    assert percentile(values, 100) == 4.0
+    assert percentile([], 50) is None
+
+def test_stats_count_losses_and_fence_outliers():
+    stats = summarize([10.0, 11.0, 10.0, 12.0, 11.0, 500.0, "timeout", "ConnectionRefusedError"], outliers="iqr")
+    assert stats["sent"] == 8 and stats["received"] == 6
+    assert stats["loss"] == 25.0
+    assert stats["outliers"] == 1
+    assert stats["max"] == 500.0  # Fenced values still count for min/percentiles/max
+    assert stats["mean"] == pytest.approx(10.8)
+
+def test_empty_buffer():
+    stats = SampleBuffer().stats()
+    assert stats["received"] == 0 and stats["loss"] == 0.0 and stats["median"] is None
+
+def test_measure_times_probes_and_records_failures(tcp_service, closed_port):
+    port = tcp_service()
+    buffer = measure(tcp_connect_probe("127.0.0.1", port), count=3, spacing=0.01)
+    assert buffer.received == 3 and all(v > 0 for v in buffer.values)
+
+    failed = measure(tcp_connect_probe("127.0.0.1", closed_port), count=2, spacing=0.01)
+    assert failed.received == 0 and failed.errors == {"ConnectionRefusedError": 2}
+
+    def timeout(seconds):
+        raise socket.timeout()
+    assert measure(timeout, count=1).errors == {"timeout": 1}
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from scanner.port_scanner import run_configured_scan, run_incremental_scan, scan_ports
+from scanner.port_state import PortStateStore
+from scanner.targets import expand_targets, parse_ports
+
+def test_scan_sorts_open_and_closed_ports(tcp_service, closed_port):
+    port = tcp_service(greeting=b"SSH-2.0-OpenSSH_9.6\r\n")
+    scan = scan_ports("127.0.0.1", [port, closed_port])
+    assert scan["open"] == [port]
+    assert scan["closed"] == [closed_port]
+    assert scan["filtered"] == []
+    assert scan["services"][port]["service"] == "ssh"
+    assert all(r["rtt"] is not None for r in scan["results"])
+
+def test_scan_of_many_ports_loses_nothing(tcp_service):
+    port = tcp_service()
+    ports = list(range(max(1, port - 1000), port + 1))
+    scan = scan_ports("127.0.0.1", ports, fingerprint=False)
+    assert len(scan["results"]) == len(ports)
+    assert port in scan["open"]
+    assert scan["filtered"] == []
+
+def test_unresolvable_host_raises():
+    with pytest.raises(OSError):
+        scan_ports("no-such-host.invalid", [80])
+
+def test_configured_scan_of_several_hosts(tcp_service):
+    port = tcp_service()
+    result = run_configured_scan(lambda text: None, targets="127.0.0.1,no-such-host.invalid", ports=str(port))
+    assert set(result["hosts"]) == {"127.0.0.1", "no-such-host.invalid"}
+    assert result["hosts"]["127.0.0.1"]["open"] == [port]
+    assert result["hosts"]["no-such-host.invalid"]["error"]
+
+def test_incremental_scan_reports_only_changes(tcp_service, tmp_path):
+    port = tcp_service()
+    store = PortStateStore(str(tmp_path / "state.json"))
+    log = lambda text: None
+
+    first = run_incremental_scan(log, "127.0.0.1", [port], store=store)
+    assert [r["port"] for r in first["changes"]["opened"]] == [port]
+    second = run_incremental_scan(log, "127.0.0.1", [port], store=store)
+    assert not any(second["changes"].values())
+
+    tcp_service.stop(port)
+    third = run_incremental_scan(log, "127.0.0.1", [port], store=PortStateStore(store.path))
+    assert [r["port"] for r in third["changes"]["closed"]] == [port]
+
+def test_filtered_probe_does_not_close_a_known_port(tmp_path):
+    store = PortStateStore(str(tmp_path / "state.json"))
+    store.apply("host", [{"port": 22, "state": "open", "service": None}])
+    changes = store.apply("host", [{"port": 22, "state": "filtered", "service": None}])
+    assert not any(changes.values())
+    assert store.known_open("host") == [22]
+    changes = store.apply("host", [{"port": 22, "state": "closed", "service": None}])
+    assert [r["port"] for r in changes["closed"]] == [22]
+    assert store.known_open("host") == []
+
+def test_corrupt_state_file_starts_empty(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text('{"127.0.0.1": {"open": {"22"', encoding="utf-8")
+    store = PortStateStore(str(path))
+    assert store.known_open("127.0.0.1") == []
+    store.save()
+    assert "127.0.0.1" in json.loads(path.read_text(encoding="utf-8"))
+
+def test_rotating_slice_covers_the_range():
+    store = PortStateStore("unused.json")
+    ports = list(range(10))
+    seen = store.next_slice("host", ports, 4) + store.next_slice("host", ports, 4) + store.next_slice("host", ports, 4)
+    assert set(seen) == set(ports)
+    assert store.host("host")["full_pass"] is not None
+
+def test_parse_ports():
+    assert parse_ports("443, 22,80-82") == [22, 80, 81, 82, 443]
+    with pytest.raises(ValueError, match="Invalid port range 100-80"):
+        parse_ports("100-80")
+    with pytest.raises(ValueError):
+        parse_ports("65536")
+
+def test_expand_targets():
+    assert expand_targets("10.0.0.1-3, 10.0.0.2") == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    assert expand_targets("192.168.1.0/30") == ["192.168.1.1", "192.168.1.2"]
+    assert expand_targets("my-host.example") == ["my-host.example"]
+    with pytest.raises(ValueError):
+        expand_targets("10.0.0.9-10.0.0.1")
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+# test_tasks is reached through the module so pytest does not collect it as a test
+from utils import scheduler
+from utils.scheduler import EXCLUSIVE, SHARED, critical_path, make_task, run_scheduled
+
+def _sleeper(seconds, value=None):
+    def run(log, results):
+        time.sleep(seconds)
+        return value
+    return run
+
+def _overlaps(timings, a, b):
+    return timings[a]["start"] < timings[b]["end"] and timings[b]["start"] < timings[a]["end"]
+
+def test_independent_tasks_run_in_parallel():
+    tasks = [make_task(name, _sleeper(0.2, name), resources={"link": SHARED}) for name in ("a", "b", "c")]
+    schedule = run_scheduled(tasks, lambda text: None, max_parallel=3)
+    assert schedule["results"] == {"a": "a", "b": "b", "c": "c"}
+    assert schedule["duration"] < 0.5
+
+def test_exclusive_resources_never_overlap():
+    tasks = [make_task("speed", _sleeper(0.1), resources={"link": EXCLUSIVE}),
+             make_task("dns", _sleeper(0.1), resources={"link": SHARED}),
+             make_task("ipv6", _sleeper(0.1), resources={"link": SHARED})]
+    timings = run_scheduled(tasks, lambda text: None, max_parallel=3)["timings"]
+    assert not _overlaps(timings, "speed", "dns")
+    assert not _overlaps(timings, "speed", "ipv6")
+    assert _overlaps(timings, "dns", "ipv6")
+
+def test_port_sweep_does_not_overlap_latency_tests():
+    tasks = [make_task(name, _sleeper(0.1)) for name in ("ports", "dns", "ipv6", "security")]
+    timings = run_scheduled(tasks, lambda text: None, max_parallel=4)["timings"]
+    assert not _overlaps(timings, "ports", "dns")
+    assert not _overlaps(timings, "ports", "ipv6")
+
+def test_dependencies_see_results_and_survive_failures():
+    seen = {}
+
+    def fail(log, results):
+        raise RuntimeError("boom")
+
+    def after(log, results):
+        seen.update(results)
+        return "done"
+
+    lines = []
+    tasks = [make_task("first", fail), make_task("second", after, after=["first"])]
+    schedule = run_scheduled(tasks, lines.append)
+    assert seen == {"first": None}
+    assert schedule["results"]["second"] == "done"
+    assert schedule["timings"]["first"]["error"] == "boom"
+    assert any("first failed: boom" in line for line in lines)
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError):
+        run_scheduled([make_task("a", _sleeper(0), after=["missing"])], lambda text: None)
+
+def test_critical_path_follows_the_gating_tasks():
+    tasks = [make_task("a", _sleeper(0.05)), make_task("b", _sleeper(0.1), after=["a"]),
+             make_task("c", _sleeper(0.01))]
+    schedule = run_scheduled(tasks, lambda text: None, max_parallel=3)
+    assert schedule["critical_path"] == ["a", "b"]
+    assert critical_path({}) == []
+
+@pytest.fixture
+def security_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scheduler, "load_test", lambda test_type: lambda log, **kwargs: calls.append(kwargs))
+    return calls
+
+def _run_security(ports_result):
+    task = next(t for t in scheduler.test_tasks(["ports", "security"]) if t["name"] == "security")
+    assert task["after"] == ["ports"]
+    task["run"](lambda text: None, {"ports": ports_result})
+
+def test_security_uses_only_a_local_scan(security_calls):
+    local = {"host": "127.0.0.1", "address": "127.0.0.1", "open": [22], "services": {22: None}, "error": None}
+    remote = {"host": "192.0.2.1", "address": "192.0.2.1", "open": [23], "services": {}, "error": None}
+    _run_security(local)
+    _run_security(remote)
+    _run_security({"hosts": {"192.0.2.1": remote, "127.0.0.1": local}, "duration": 1.0})
+    _run_security(None)
+    assert security_calls == [{"open_ports": [22], "services": {22: None}}, {},
+                              {"open_ports": [22], "services": {22: None}}, {}]
+
+def test_test_options_reach_the_entry_point(monkeypatch):
+    received = threading.Event()
+    monkeypatch.setattr(scheduler, "load_test",
+                        lambda test_type: lambda log, **kwargs: received.set() if kwargs == {"ports": "22"} else None)
+    tasks = scheduler.test_tasks(["ports"], {"ports": {"ports": "22"}})
+    run_scheduled(tasks, lambda text: None)
+    assert received.is_set()
@@ -0,0 +1,193 @@
+import bisect
+import csv
+import gzip
+import ipaddress
+import json
+import os
+import socket
+import threading
+from array import array
+
+from config import SETTINGS
+
+# Offline IP -> ASN / country lookups. The range database is a CSV or TSV with
+# start, end, asn, country and (optional) description columns, e.g. iptoasn.com's
+# ip2asn-combined.tsv.gz. It is loaded once into sorted arrays and searched with
+# bisect; a binary cache next to it makes later loads a few array reads.
+
+CACHE_SUFFIX = ".idx"
+
+class RangeIndex:
+    """Sorted, non-overlapping address ranges with ASN, country and org per range.
+
+    IPv4 bounds are kept in array("I"); IPv6 bounds as packed 16-byte big-endian
+    strings in one bytes object each, so a million ranges stay a few tens of MB.
+    """
+
+    def __init__(self):
+        self.v4_starts, self.v4_ends, self.v4_info = array("I"), array("I"), array("I")
+        self.v6_starts, self.v6_ends, self.v6_info = b"", b"", array("I")
+        self.infos = []  # (asn, country, org) tuples shared between ranges
+
+    def __len__(self):
+        return len(self.v4_starts) + len(self.v6_info)
+
+    def lookup(self, ip):
+        """{"asn", "country", "org", "range"} for the range containing ip, or None"""
+        packed = _pack(ip)
+        if packed is None:
+            return None
+        if len(packed) == 4:
+            value = int.from_bytes(packed, "big")
+            i = bisect.bisect_right(self.v4_starts, value) - 1
+            if i < 0 or value > self.v4_ends[i]:
+                return None
+            bounds = (self.v4_starts[i].to_bytes(4, "big"), self.v4_ends[i].to_bytes(4, "big"))
+            return self._entry(self.v4_info[i], socket.AF_INET, bounds)
+
+        i = _bisect_packed(self.v6_starts, packed) - 1
+        if i < 0 or packed > self.v6_ends[i * 16:i * 16 + 16]:
+            return None
+        bounds = (self.v6_starts[i * 16:i * 16 + 16], self.v6_ends[i * 16:i * 16 + 16])
+        return self._entry(self.v6_info[i], socket.AF_INET6, bounds)
+
+    def _entry(self, info, family, bounds):
+        asn, country, org = self.infos[info]
+        return {"asn": asn, "country": country, "org": org,
+                "range": f"{socket.inet_ntop(family, bounds[0])}-{socket.inet_ntop(family, bounds[1])}"}
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        header = json.dumps({"v4": len(self.v4_starts), "v6": len(self.v6_info), "infos": self.infos}).encode()
+        with open(tmp_path, "wb") as f:
+            f.write(len(header).to_bytes(8, "little") + header)
+            for values in (self.v4_starts, self.v4_ends, self.v4_info, self.v6_info):
+                values.tofile(f)
+            f.write(self.v6_starts + self.v6_ends)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load_cache(cls, path):
+        index = cls()
+        with open(path, "rb") as f:
+            header = json.loads(f.read(int.from_bytes(f.read(8), "little")))
+            for values, count in ((index.v4_starts, header["v4"]), (index.v4_ends, header["v4"]),
+                                  (index.v4_info, header["v4"]), (index.v6_info, header["v6"])):
+                values.fromfile(f, count)
+            index.v6_starts = f.read(16 * header["v6"])
+            index.v6_ends = f.read(16 * header["v6"])
+        index.infos = [tuple(info) for info in header["infos"]]
+        return index
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (start, end, asn, country, org) rows; overlapping ranges keep the first"""
+        index = cls()
+        info_ids = {}
+        v4, v6 = [], []
+        for start, end, asn, country, org in rows:
+            try:
+                start, end = ipaddress.ip_address(start.strip()), ipaddress.ip_address(end.strip())
+                asn = int(str(asn).strip().upper().removeprefix("AS") or 0)
+            except ValueError:
+                continue  # Header line or malformed row
+            if start.version != end.version or end < start or asn == 0:
+                continue  # "Not routed" rows carry ASN 0
+            info = (asn, country.strip().upper(), org.strip())
+            info_id = info_ids.setdefault(info, len(info_ids))
+            (v4 if start.version == 4 else v6).append((int(start), int(end), info_id))
+
+        index.infos = [None] * len(info_ids)
+        for info, info_id in info_ids.items():
+            index.infos[info_id] = info
+        for start, end, info_id in _disjoint(v4):
+            index.v4_starts.append(start)
+            index.v4_ends.append(end)
+            index.v4_info.append(info_id)
+        starts, ends = bytearray(), bytearray()
+        for start, end, info_id in _disjoint(v6):
+            starts += start.to_bytes(16, "big")
+            ends += end.to_bytes(16, "big")
+            index.v6_info.append(info_id)
+        index.v6_starts, index.v6_ends = bytes(starts), bytes(ends)
+        return index
+
+# Packed address (4 bytes for IPv4 and IPv4-mapped IPv6, else 16), or None if invalid
+def _pack(ip):
+    ip = str(ip).split("%", 1)[0]
+    try:
+        return socket.inet_pton(socket.AF_INET, ip)
+    except OSError:
+        pass
+    try:
+        packed = socket.inet_pton(socket.AF_INET6, ip)
+    except OSError:
+        return None
+    return packed[12:] if packed.startswith(b"\0" * 10 + b"\xff\xff") else packed
+
+def _disjoint(ranges):
+    last_end = -1
+    for start, end, info_id in sorted(ranges):
+        if start > last_end:
+            yield start, end, info_id
+            last_end = end
+
+def _bisect_packed(packed, key):
+    # bisect_right over the 16-byte records of `packed`
+    low, high = 0, len(packed) // 16
+    while low < high:
+        mid = (low + high) // 2
+        if key < packed[mid * 16:mid * 16 + 16]:
+            high = mid
+        else:
+            low = mid + 1
+    return low
+
+def read_rows(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", errors="replace", newline="") as f:
+        sample = f.readline()
+        f.seek(0)
+        delimiter = "\t" if "\t" in sample else ","
+        for row in csv.reader(f, delimiter=delimiter):
+            if len(row) >= 4:
+                yield row[0], row[1], row[2], row[3], row[4] if len(row) > 4 else ""
+
+def load_index(path):
+    """Index for the range file at `path`, using (and refreshing) its binary cache"""
+    cache_path = path + CACHE_SUFFIX
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        try:
+            return RangeIndex.load_cache(cache_path)
+        except (OSError, ValueError, EOFError):
+            pass
+    index = RangeIndex.from_rows(read_rows(path))
+    try:
+        index.save(cache_path)
+    except OSError:
+        pass
+    return index
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """Process-wide index from SETTINGS["ip_intel"]["path"]; None if no database is installed"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            path = SETTINGS.get("ip_intel", {}).get("path")
+            _index = load_index(path) if path and os.path.exists(path) else False
+        return _index or None
+
+def lookup_ip(ip):
+    index = get_index()
+    return index.lookup(ip) if index else None
+
+# Short "AS13335 Cloudflare (US)" label for log lines; empty when unknown
+def describe_ip(ip):
+    info = lookup_ip(ip)
+    if not info:
+        return ""
+    org = f" {info['org']}" if info["org"] else ""
+    return f"AS{info['asn']}{org} ({info['country']})"
@@ -0,0 +1,143 @@
+import math
+import socket
+import time
+from array import array
+from statistics import median
+
+# Shared latency measurement: every RTT in the project is taken with the monotonic
+# nanosecond clock and summarized by SampleBuffer, so the numbers from the port
+# scanner, DNS, IPv6 and speed tests are directly comparable.
+
+now_ns = time.perf_counter_ns
+
+# Linear-interpolated percentile over an already sorted list
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100
+    low = int(k)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (k - low)
+
+class SampleBuffer:
+    """RTTs in milliseconds (array("d"), in arrival order) plus a count of lost probes.
+
+    stats(outliers="iqr") leaves out far-out high values (above Q3 + 3 * IQR) from the
+    mean, stdev and jitter; min/percentiles/max always cover every sample. Jitter is the
+    mean absolute difference between successive RTTs (see jitter()).
+    """
+
+    def __init__(self):
+        self.values = array("d")
+        self.sent = 0
+        self.errors = {}
+
+    @classmethod
+    def from_outcomes(cls, outcomes, sent=None):
+        """From a list of RTTs (floats) and failure reasons (strings)"""
+        buffer = cls()
+        for outcome in outcomes:
+            if isinstance(outcome, float):
+                buffer.add(outcome)
+            else:
+                buffer.lost(outcome)
+        if sent is not None:
+            buffer.sent = sent
+        return buffer
+
+    @property
+    def received(self):
+        return len(self.values)
+
+    def add(self, rtt_ms):
+        self.sent += 1
+        self.values.append(rtt_ms)
+
+    def add_ns(self, start_ns, end_ns):
+        self.add((end_ns - start_ns) / 1e6)
+
+    def lost(self, reason="timeout"):
+        self.sent += 1
+        self.errors[reason] = self.errors.get(reason, 0) + 1
+
+    def stats(self, outliers=None):
+        received = len(self.values)
+        stats = {
+            "sent": self.sent,
+            "received": received,
+            "loss": (self.sent - received) / self.sent * 100 if self.sent else 0.0,
+            "min": None, "median": None, "mean": None, "p95": None, "p99": None, "max": None,
+            "stdev": None, "jitter": None, "outliers": 0
+        }
+        if not received:
+            return stats
+        ordered = sorted(self.values)
+        kept = list(self.values)
+        if outliers == "iqr" and received >= 4:
+            q1, q3 = percentile(ordered, 25), percentile(ordered, 75)
+            fence = q3 + 3 * (q3 - q1)
+            kept = [v for v in self.values if v <= fence]
+            stats["outliers"] = received - len(kept)
+        mean = sum(kept) / len(kept)
+        stats.update({
+            "min": ordered[0],
+            "median": median(ordered),
+            "mean": mean,
+            "p95": percentile(ordered, 95),
+            "p99": percentile(ordered, 99),
+            "max": ordered[-1],
+            "stdev": math.sqrt(sum((v - mean) ** 2 for v in kept) / len(kept)),
+            "jitter": jitter(kept)
+        })
+        return stats
+
+# Jitter as the mean absolute difference between successive RTTs (in arrival order).
+# RFC 3550's smoothed J += (|D| - J) / 16 starts from 0 and needs dozens of samples to
+# converge, so on the 3-20 probe series used here it would badly under-report.
+def jitter(values):
+    if len(values) < 2:
+        return 0.0
+    return sum(abs(current - previous) for previous, current in zip(values, values[1:])) / (len(values) - 1)
+
+def summarize(outcomes, sent=None, outliers=None):
+    return SampleBuffer.from_outcomes(outcomes, sent).stats(outliers)
+
+def measure(probe, count=5, spacing=0.2, timeout=2.0):
+    """Time `count` calls of probe(timeout), started `spacing` seconds apart; returns a SampleBuffer.
+
+    A probe that raises OSError (including timeouts) counts as lost.
+    """
+    buffer = SampleBuffer()
+    start = now_ns()
+    for i in range(count):
+        delay = (start + int(i * spacing * 1e9) - now_ns()) / 1e9
+        if delay > 0:
+            time.sleep(delay)
+        begin = now_ns()
+        try:
+            probe(timeout)
+        except OSError as e:
+            buffer.lost("timeout" if isinstance(e, socket.timeout) else type(e).__name__)
+            continue
+        buffer.add_ns(begin, now_ns())
+    return buffer
+
+# One TCP handshake; the connect() call is what gets timed
+def tcp_connect_probe(host, port):
+    address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+
+    def probe(timeout):
+        sock = socket.socket(address[0], socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(address[4])
+        finally:
+            sock.close()
+    return probe
+
+def format_stats(stats, unit="ms"):
+    if not stats["received"]:
+        return f"no replies ({stats['sent']} sent)"
+    return (f"min {stats['min']:.2f} | median {stats['median']:.2f} | p95 {stats['p95']:.2f} | "
+            f"max {stats['max']:.2f} {unit} | jitter {stats['jitter']:.2f} {unit} | "
+            f"loss {stats['loss']:.0f}% ({stats['received']}/{stats['sent']})")
@@ -0,0 +1,130 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latest probe results in Prometheus text exposition format. Probes call
+# record_result() when they finish; that re-renders the page once, and scrapes
+# only ever copy the pre-rendered bytes, so a scrape never starts a probe.
+
+METRICS_PORT = 9105
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HELP = {
+    "isp_probe_up": ("gauge", "1 if the last run of the test finished without error"),
+    "isp_probe_duration_seconds": ("gauge", "Wall time of the last run of the test"),
+    "isp_probe_last_run_timestamp_seconds": ("gauge", "Unix time the last run of the test finished"),
+    "isp_dns_latency_ms": ("gauge", "DNS resolver latency percentiles from the last benchmark"),
+    "isp_dns_jitter_ms": ("gauge", "DNS resolver jitter from the last benchmark"),
+    "isp_dns_loss_ratio": ("gauge", "Share of DNS queries without an answer in the last benchmark"),
+    "isp_throughput_mbps": ("gauge", "Throughput measured by the last speed test"),
+    "isp_speed_latency_ms": ("gauge", "Latency reported by the last speed test"),
+    "isp_loaded_latency_ms": ("gauge", "Median probe latency per phase of the last speed test"),
+    "isp_bufferbloat_ms": ("gauge", "Median latency added by saturating the link in the last speed test"),
+    "isp_ports": ("gauge", "Ports per state found by the last port scan"),
+    "isp_ipv6_supported": ("gauge", "1 if the last IPv6 check reached the internet over IPv6"),
+    "isp_ipv6_latency_ms": ("gauge", "Median IPv6 ping latency from the last IPv6 check")
+}
+
+class MetricsSnapshot:
+    """Thread-safe {(metric, labels): value} map with a cached text rendering"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.page = b""
+
+    def update(self, samples, replace=()):
+        """Set (metric, labels dict, value) samples; series of metrics in `replace` are dropped first"""
+        with self.lock:
+            if replace:
+                self.values = {key: value for key, value in self.values.items() if key[0] not in replace}
+            for metric, labels, value in samples:
+                if value is not None:
+                    self.values[(metric, tuple(sorted(labels.items())))] = float(value)
+            self.page = self._render().encode("utf-8")
+
+    def _render(self):
+        lines = []
+        last = None
+        for (metric, labels), value in sorted(self.values.items()):
+            if metric != last:
+                kind, text = HELP.get(metric, ("gauge", metric))
+                lines += [f"# HELP {metric} {text}", f"# TYPE {metric} {kind}"]
+                last = metric
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_text}}} {value!r}" if label_text else f"{metric} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def render(self):
+        return self.page
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+SNAPSHOT = MetricsSnapshot()
+
+def record_result(test_type, result, duration=None, failed=False, snapshot=SNAPSHOT):
+    """Fold a finished test's result into the snapshot"""
+    test = {"test": test_type}
+    samples = [("isp_probe_up", test, 0 if failed else 1),
+               ("isp_probe_last_run_timestamp_seconds", test, time.time()),
+               ("isp_probe_duration_seconds", test, duration)]
+    replace = ()
+
+    if test_type == "dns" and result:
+        replace = ("isp_dns_latency_ms", "isp_dns_jitter_ms", "isp_dns_loss_ratio")
+        for ip, stats in result.get("resolvers", {}).items():
+            resolver = {"resolver": ip, "name": stats["name"]}
+            for quantile, key in (("0.5", "median"), ("0.95", "p95"), ("0.99", "p99")):
+                samples.append(("isp_dns_latency_ms", dict(resolver, quantile=quantile), stats[key]))
+            samples.append(("isp_dns_jitter_ms", resolver, stats["jitter"]))
+            samples.append(("isp_dns_loss_ratio", resolver, stats["loss"] / 100))
+    elif test_type == "speed" and result and result.get("latency", -1) >= 0:
+        samples.append(("isp_throughput_mbps", {"direction": "download"}, result["download"]))
+        samples.append(("isp_throughput_mbps", {"direction": "upload"}, result["upload"]))
+        samples.append(("isp_speed_latency_ms", {}, result["latency"]))
+        for phase in ("idle", "download", "upload", "after"):
+            samples.append(("isp_loaded_latency_ms", {"phase": phase}, result.get(f"latency_{phase}")))
+        for direction in ("download", "upload"):
+            samples.append(("isp_bufferbloat_ms", {"direction": direction}, result.get(f"bufferbloat_{direction}")))
+    elif test_type == "ports" and result:
+        replace = ("isp_ports",)
+        for scan in (result["hosts"].values() if "hosts" in result else [result]):
+            if scan.get("error"):
+                continue
+            for state in ("open", "closed", "filtered"):
+                samples.append(("isp_ports", {"host": scan["host"], "state": state}, len(scan[state])))
+    elif test_type == "ipv6" and result:
+        samples.append(("isp_ipv6_supported", {}, 1 if result.get("supported") else 0))
+        samples.append(("isp_ipv6_latency_ms", {}, (result.get("latency") or {}).get("median")))
+
+    snapshot.update(samples, replace=replace)
+
+# run_scheduled on_done hook: (name, result, timing)
+def record_task(name, result, timing):
+    record_result(name, result, timing["end"] - timing["start"], failed="error" in timing)
+
+class _Handler(BaseHTTPRequestHandler):
+    snapshot = SNAPSHOT
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.snapshot.render()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the console
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1", snapshot=SNAPSHOT):
+    """Serve /metrics from `snapshot` in a daemon thread; returns the server (call shutdown() to stop)"""
+    handler = type("MetricsHandler", (_Handler,), {"snapshot": snapshot})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,13 +1,20 @@
-import time
-import socket
+from utils.measure import SampleBuffer, measure, tcp_connect_probe
 
-def measure_latency(host, port=53, timeout=2):
-    start = time.time()
+# TCP handshake time to host:port in ms (median of `count` connects), or None if none succeeded
+def measure_latency(host, port=53, timeout=2, count=1, spacing=0.2):
+    stats = measure_latency_stats(host, port, timeout, count, spacing)
+    return stats["median"]
+
+def measure_latency_stats(host, port=53, timeout=2, count=5, spacing=0.2, outliers="iqr"):
+    """Full SampleBuffer stats (min/median/p95/jitter/loss...) for repeated TCP connects"""
     try:
-        with socket.create_connection((host, port), timeout=timeout):
-            return round((time.time() - start) * 1000, 2)  # milliseconds
-    except Exception:
-        return None
+        probe = tcp_connect_probe(host, port)
+    except OSError:
+        buffer = SampleBuffer()
+        for _ in range(count):
+            buffer.lost("resolve")
+        return buffer.stats(outliers)
+    return measure(probe, count, spacing, timeout).stats(outliers)
 
 def detect_dns_hijacking(fake_domain="example.invalid", dns_server="8.8.8.8"):
     import dns.resolver
@@ -0,0 +1,112 @@
+import socket
+import threading
+import time
+
+import requests
+
+from utils.ip_intel import lookup_ip
+
+# Public IP and location change rarely; results are stamped from this in-memory copy
+CONTEXT_TTL_SECONDS = 15 * 60
+RETRY_SECONDS = 30  # After a failed lookup, so "Unknown" is not kept for a whole TTL
+INTERFACE_POLL_SECONDS = 5
+LOOKUP_TIMEOUT = 5
+
+def fetch_public_ip(timeout=LOOKUP_TIMEOUT):
+    try:
+        return requests.get("https://api.ipify.org", timeout=timeout).text.strip() or "Unknown"
+    except Exception:
+        return "Unknown"
+
+def fetch_geolocation(ip, timeout=LOOKUP_TIMEOUT):
+    if ip == "Unknown":
+        return "Unknown"
+    # The offline range database answers without a rate-limited HTTP call when installed
+    info = lookup_ip(ip)
+    if info:
+        return f"{info['country']} - AS{info['asn']} {info['org']}".rstrip()
+    try:
+        geo = requests.get(f"https://ipapi.co/{ip}/json", timeout=timeout).json()
+        return f"{geo.get('country_name', '')} - {geo.get('city', '')}"
+    except Exception:
+        return "Unknown"
+
+# Interface names plus the source address of the default route; changes on VPN up/down,
+# Wi-Fi roaming, new DHCP lease and the like. connect() on UDP sends no packets.
+def interface_signature():
+    try:
+        names = tuple(name for _, name in socket.if_nameindex())
+    except (OSError, AttributeError):
+        names = ()
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("192.0.2.1", 9))
+            source = s.getsockname()[0]
+    except OSError:
+        source = None
+    return names, source
+
+class NetworkContext:
+    """Public IP and geolocation for the session, refreshed in a background thread.
+
+    snapshot() never touches the network: it returns the last resolved values (or
+    "Unknown" until the first lookup finishes). A refresh happens every `ttl` seconds
+    (`retry` seconds after a lookup that failed) and whenever interface_signature() changes.
+    """
+
+    def __init__(self, ttl=CONTEXT_TTL_SECONDS, poll_interval=INTERFACE_POLL_SECONDS, retry=RETRY_SECONDS):
+        self.ttl = ttl
+        self.retry = retry
+        self.poll_interval = poll_interval
+        self.context = {"ip": "Unknown", "location": "Unknown", "resolved": None}
+        self.ready = threading.Event()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def refresh(self):
+        """Ask the background thread for a new lookup now"""
+        self._wake.set()
+
+    def snapshot(self):
+        return dict(self.context)
+
+    def _resolve(self):
+        ip = fetch_public_ip()
+        self.context = {"ip": ip, "location": fetch_geolocation(ip), "resolved": time.time()}
+        self.ready.set()
+
+    def _run(self):
+        signature = interface_signature()
+        self._resolve()
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            forced = self._wake.is_set()
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            current = interface_signature()
+            failed = "Unknown" in (self.context["ip"], self.context["location"])
+            expired = time.time() - self.context["resolved"] >= (self.retry if failed else self.ttl)
+            if forced or expired or current != signature:
+                signature = current
+                self._resolve()
+
+_context = None
+_context_lock = threading.Lock()
+
+def get_network_context():
+    """Session-wide NetworkContext, started on first use"""
+    global _context
+    with _context_lock:
+        if _context is None:
+            _context = NetworkContext().start()
+        return _context
@@ -1,6 +1,15 @@
+import json
+import os
 import socket
 import subprocess
 import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Last known status, shown immediately at startup while a fresh one is measured
+STATUS_CACHE_FILE = "status_cache.json"
+STATUS_REFRESH_SECONDS = 60
 
 def check_internet():
     try:
@@ -29,8 +38,57 @@ def detect_dns_hijack():
         return False
 
 def get_status_summary():
-    return {
-        "internet": check_internet(),
-        "ipv6": check_ipv6(),
-        "dns_hijack": detect_dns_hijack()
-    }
+    # The three checks are independent; run them side by side
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        internet = pool.submit(check_internet)
+        ipv6 = pool.submit(check_ipv6)
+        dns_hijack = pool.submit(detect_dns_hijack)
+        return {
+            "internet": internet.result(),
+            "ipv6": ipv6.result(),
+            "dns_hijack": dns_hijack.result()
+        }
+
+def load_cached_status(path=STATUS_CACHE_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class StatusRefresher:
+    """Re-measures the network status in a background thread and keeps the latest value.
+
+    `status` starts as the last value cached on disk (or None) and is replaced after
+    every refresh, so readers never block on the network.
+    """
+
+    def __init__(self, interval=STATUS_REFRESH_SECONDS, cache_file=STATUS_CACHE_FILE):
+        self.interval = interval
+        self.cache_file = cache_file
+        self.status = load_cached_status(cache_file)
+        self.fresh = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                status = get_status_summary()
+                status["checked"] = time.strftime("%H:%M:%S")
+                self.status = status
+                self.fresh = True
+                tmp_path = self.cache_file + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(status, f)
+                os.replace(tmp_path, self.cache_file)
+            except Exception:
+                pass
+            self._stop.wait(self.interval)
@@ -1,16 +1,37 @@
-import matplotlib.pyplot as plt
-
-def plot_dns_latency(dns_results, save_path=None):
-    names = [r["name"] for r in dns_results if r["latency"] is not None]
-    latencies = [r["latency"] for r in dns_results if r["latency"] is not None]
-
-    plt.figure(figsize=(10, 5))
-    plt.barh(names, latencies, color="skyblue")
-    plt.xlabel("Latency (ms)")
-    plt.title("DNS Server Latency Comparison")
-    plt.tight_layout()
-
-    if save_path:
-        plt.savefig(save_path)
-    else:
-        plt.show()
+# Headless runs (CLI / daemon) turn charts off so matplotlib is never imported
+CHARTS_ENABLED = True
+
+def disable_charts():
+    global CHARTS_ENABLED
+    CHARTS_ENABLED = False
+
+def charts_enabled():
+    return CHARTS_ENABLED
+
+# matplotlib is only imported when a chart is actually drawn; it dominates startup time otherwise
+def pyplot():
+    import matplotlib.pyplot as plt
+    return plt
+
+# Chart for saving to a file, safe to draw from worker threads: the Figure is not
+# registered with pyplot, so it shares no global state and never switches the
+# process-wide backend that plt.show() in the GUI relies on
+def new_figure(**kwargs):
+    from matplotlib.figure import Figure
+    return Figure(**kwargs)
+
+def plot_dns_latency(dns_results, save_path=None):
+    names = [r["name"] for r in dns_results if r["latency"] is not None]
+    latencies = [r["latency"] for r in dns_results if r["latency"] is not None]
+    # Only an on-screen chart needs pyplot (and the GUI thread)
+    fig = new_figure(figsize=(10, 5)) if save_path else pyplot().figure(figsize=(10, 5))
+    ax = fig.subplots()
+    ax.barh(names, latencies, color="skyblue")
+    ax.set_xlabel("Latency (ms)")
+    ax.set_title("DNS Server Latency Comparison")
+    fig.tight_layout()
+
+    if save_path:
+        fig.savefig(save_path)
+    else:
+        pyplot().show()
@@ -0,0 +1,162 @@
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+EXCLUSIVE = "exclusive"
+SHARED = "shared"
+
+# Resource declarations for the built-in tests: the speed test needs the link to
+# itself, everything else only reads from it and can overlap. The DNS benchmark and
+# IPv6 pings measure latency, which hundreds of in-flight scan connections would skew,
+# so the port sweep holds "latency" exclusively.
+TEST_RESOURCES = {
+    "speed": {"link": EXCLUSIVE},
+    "ports": {"link": SHARED, "latency": EXCLUSIVE},
+    "ipv6": {"link": SHARED, "latency": SHARED},
+    "dns": {"link": SHARED, "latency": SHARED},
+    "security": {"link": SHARED}
+}
+
+# Test modules pull in dnspython, requests, ...; they are imported on first use (from the
+# worker thread) so neither the GUI nor the CLI pays for tests it does not run.
+TEST_ENTRY_POINTS = {
+    "speed": ("tests.performance.speed_test", "run_speed_test"),
+    "ports": ("scanner.port_scanner", "run_configured_scan"),
+    "ipv6": ("scanner.ipv6_checker", "check_ipv6"),
+    "dns": ("scanner.dns_tester", "run_all_dns_tests"),
+    "security": ("security.security_tester", "run_security_tests")
+}
+
+def load_test(test_type):
+    module_name, func_name = TEST_ENTRY_POINTS[test_type]
+    return getattr(importlib.import_module(module_name), func_name)
+
+def make_task(name, run, resources=None, after=()):
+    """A schedulable test: run(log, results) gets a prefixed log and the results of finished tasks"""
+    return {"name": name, "run": run, "resources": dict(resources or TEST_RESOURCES.get(name, {})),
+            "after": list(after)}
+
+def test_tasks(test_types, options=None):
+    """Tasks for the built-in tests; security reuses the port scan's findings for this machine.
+
+    options maps a test type to keyword arguments for its entry point, e.g.
+    {"ports": {"targets": "10.0.0.0/24", "ports": "22,443"}}.
+    """
+    options = options or {}
+    tasks = []
+    for test_type in test_types:
+        if test_type == "security" and "ports" in test_types:
+            tasks.append(make_task("security", _security_after_scan, after=["ports"]))
+        else:
+            tasks.append(make_task(test_type, lambda log, results, test_type=test_type: load_test(test_type)(
+                log, **options.get(test_type, {}))))
+    return tasks
+
+# The security checks audit this machine, so they only take the open ports and services
+# of a scan of a local address (one host of a multi-host sweep, or a single-host scan)
+def _security_after_scan(log, results):
+    from scanner.targets import is_local_address
+    scan = results["ports"] or {}
+    scans = scan["hosts"].values() if "hosts" in scan else [scan] if scan else []
+    local = next((s for s in scans if not s.get("error") and is_local_address(s.get("address"))), None)
+    if local is None:
+        if scan:
+            log("ℹ️ The port scan did not cover this machine; its findings are not used here.")
+        return load_test("security")(log)
+    return load_test("security")(log, open_ports=local["open"], services=local.get("services"))
+
+def conflicts(a, b):
+    for resource, mode in a["resources"].items():
+        other = b["resources"].get(resource)
+        if other and EXCLUSIVE in (mode, other):
+            return True
+    return False
+
+def run_scheduled(tasks, log, max_parallel=3, on_done=None):
+    """Run tasks as soon as their dependencies are done and no running task conflicts with them.
+
+    Returns {"results", "timings", "critical_path", "duration"}. A failed task is logged and
+    leaves None in results; tasks that depend on it still run and must cope with that.
+    on_done(name, result, timing) is called as each task finishes.
+    """
+    by_name = {t["name"]: t for t in tasks}
+    for task in tasks:
+        missing = [dep for dep in task["after"] if dep not in by_name]
+        if missing:
+            raise ValueError(f"Task {task['name']} depends on unknown tasks: {missing}")
+
+    results = {}
+    timings = {}
+    lock = threading.Lock()
+    waiting = list(tasks)
+    running = {}
+    start = time.perf_counter()
+
+    def execute(task):
+        task_log = lambda text: log(f"[{task['name']}] {text}")
+        with lock:
+            timings[task["name"]] = {"start": time.perf_counter() - start, "end": None, "gate": _gate(task)}
+        try:
+            return task["run"](task_log, results)
+        finally:
+            with lock:
+                timings[task["name"]]["end"] = time.perf_counter() - start
+
+    def _gate(task):
+        # The finished dependency or conflicting task that released this one last
+        blockers = [name for name, t in timings.items() if t["end"] is not None and
+                    (name in task["after"] or conflicts(task, by_name[name]))]
+        return max(blockers, key=lambda name: timings[name]["end"], default=None)
+
+    def ready(task):
+        if any(dep not in results for dep in task["after"]):
+            return False
+        return not any(conflicts(task, other) for other in running.values())
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        while waiting or running:
+            for task in list(waiting):
+                if len(running) >= max_parallel:
+                    break
+                if ready(task):
+                    waiting.remove(task)
+                    running[pool.submit(execute, task)] = task
+            if not running:
+                raise RuntimeError(f"Tasks can never start: {[t['name'] for t in waiting]}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                try:
+                    results[task["name"]] = future.result()
+                except Exception as e:
+                    log(f"[!] {task['name']} failed: {e}")
+                    results[task["name"]] = None
+                    timings[task["name"]]["error"] = str(e)
+                if on_done:
+                    on_done(task["name"], results[task["name"]], timings[task["name"]])
+
+    duration = time.perf_counter() - start
+    return {"results": results, "timings": timings, "critical_path": critical_path(timings),
+            "duration": duration}
+
+def critical_path(timings):
+    """Chain of gating tasks ending with the task that finished last"""
+    if not timings:
+        return []
+    name = max(timings, key=lambda n: timings[n]["end"])
+    path = []
+    while name is not None:
+        path.append(name)
+        name = timings[name]["gate"]
+    return list(reversed(path))
+
+def log_schedule(log, schedule):
+    timings = schedule["timings"]
+    log("\n⏱ Test timeline:")
+    for name, t in sorted(timings.items(), key=lambda item: item[1]["start"]):
+        log(f" - {name}: {t['start']:.2f} s → {t['end']:.2f} s ({t['end'] - t['start']:.2f} s)")
+    serial = sum(t["end"] - t["start"] for t in timings.values())
+    log(f"🧭 Critical path: {' → '.join(schedule['critical_path'])}")
+    log(f"⚡ Wall time {schedule['duration']:.2f} s vs {serial:.2f} s if run one after another")
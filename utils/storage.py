@@ -1,15 +1,89 @@
 import gzip
-import shutil
+import json
+import math
 import os
+import threading
 
-def compress_file(filepath):
-    if not os.path.exists(filepath):
-        return False
-    compressed_path = filepath + ".gz"
-    with open(filepath, 'rb') as f_in:
-        with gzip.open(compressed_path, 'wb') as f_out:
-            shutil.copyfileobj(f_in, f_out)
-    return compressed_path
+# Time-segmented archive: every entry lands in the segment covering its timestamp
+# (one file per `segment_seconds`), written as an independent gzip member appended
+# to that file, so writing never recompresses anything already archived. A small
+# JSON index records each segment's time range and categories, and queries only
+# decompress the segments that can contain matches.
+
+ARCHIVE_DIR = "archive"
+SEGMENT_SECONDS = 24 * 3600
+INDEX_FILE = "index.json"
+
+class SegmentedArchive:
+    def __init__(self, directory=ARCHIVE_DIR, segment_seconds=SEGMENT_SECONDS):
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.segments = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)["segments"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segment_seconds": self.segment_seconds, "segments": self.segments}, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def append(self, entries):
+        """Archive entries (dicts with an epoch "timestamp" and a "category"); returns how many were written"""
+        by_segment = {}
+        for entry in entries:
+            key = math.floor(entry["timestamp"] / self.segment_seconds) * self.segment_seconds
+            by_segment.setdefault(key, []).append(entry)
+
+        with self.lock:
+            for key, batch in sorted(by_segment.items()):
+                name = str(int(key))
+                segment = self.segments.setdefault(name, {
+                    "file": f"segment_{int(key)}.jsonl.gz", "start": None, "end": None, "count": 0, "categories": {}
+                })
+                lines = "".join(json.dumps(entry, ensure_ascii=False, default=str) + "\n" for entry in batch)
+                # Appending a new gzip member; readers see the concatenation as one stream
+                with gzip.open(os.path.join(self.directory, segment["file"]), "ab") as f:
+                    f.write(lines.encode("utf-8"))
+                stamps = [entry["timestamp"] for entry in batch]
+                segment["start"] = min(stamps + ([segment["start"]] if segment["start"] is not None else []))
+                segment["end"] = max(stamps + ([segment["end"]] if segment["end"] is not None else []))
+                segment["count"] += len(batch)
+                for entry in batch:
+                    category = entry.get("category", "general")
+                    segment["categories"][category] = segment["categories"].get(category, 0) + 1
+            self._save_index()
+        return sum(len(batch) for batch in by_segment.values())
+
+    def segments_for(self, since=None, until=None, category=None):
+        """Index entries of the segments that may hold matches, oldest first"""
+        with self.lock:
+            segments = [dict(s) for _, s in sorted(self.segments.items(), key=lambda item: int(item[0]))]
+        return [s for s in segments
+                if (since is None or s["end"] >= since) and (until is None or s["start"] < until)
+                and (category is None or category in s["categories"])]
+
+    def query(self, since=None, until=None, category=None):
+        """Archived entries in [since, until) (optionally of one category), oldest first"""
+        matches = []
+        for segment in self.segments_for(since, until, category):
+            with gzip.open(os.path.join(self.directory, segment["file"]), "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if category is not None and entry.get("category") != category:
+                        continue
+                    if (since is None or entry["timestamp"] >= since) and (until is None or entry["timestamp"] < until):
+                        matches.append(entry)
+        matches.sort(key=lambda entry: entry["timestamp"])
+        return matches
 
 def delete_old_file(filepath):
     if os.path.exists(filepath):